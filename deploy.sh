@@ -147,6 +147,8 @@ gcloud run deploy worker-renombrador \
   --cpu 2 \
   --timeout 900s \
   --max-instances 10 \
+  --min-instances 1 \
+  --no-cpu-throttling \
   --no-allow-unauthenticated \
   --project=$GCP_PROJECT_ID
 
@@ -9,17 +9,29 @@ versión 2.3.9 con las APIs correctas documentadas.
 NOTA: Este factory no hardcodea ninguna configuración.
 Todo se lee del job config desde database.
 
+Built agents are pooled by a hash of the job's agent config and the model
+location. ``lease_agent`` lends an idle Agent from the pool (or builds one)
+and takes it back when the call ends, so repeated runs of a job on a warm
+instance reuse agents while no Agent is ever run by two threads at once.
+Los agentes construidos se reutilizan (pool LRU) mientras el config del job no cambie.
+
 :created:   2025-12-03
+:updated:   2026-10-17
 :filename:  agent_factory.py
 :author:    amBotHs + CENF
-:version:   2.1.0
+:version:   2.2.0
 :license:   MIT
 :copyright: Copyright (c) 2025 CENF
 """
 
 import os
+import json
+import hashlib
 import logging
-from typing import Dict, Any, List, Callable, Union, Optional
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Callable, Union, Optional
 
 # Agno 2.3.9 imports - using correct module paths from documentation
 from agno.agent import Agent
@@ -50,7 +62,8 @@ class AgentFactory:
     def __init__(
         self,
         database_manager: Optional[Any] = None,
-        config_manager: Optional[Any] = None
+        config_manager: Optional[Any] = None,
+        max_cached_agents: int = 32
     ):
         """
         Initialize AgentFactory.
@@ -58,15 +71,59 @@ class AgentFactory:
         Args:
             database_manager: DatabaseManager instance for loading agent configs.
             config_manager: ConfigManager instance for default settings.
+            max_cached_agents: Max idle agents kept in the pool (0 disables pooling).
         """
         self.database_manager = database_manager
         self.config_manager = config_manager
+        self.max_cached_agents = max(0, int(max_cached_agents))
+        self._agents: "OrderedDict[str, List[Agent]]" = OrderedDict()  # agent key -> idle agents (LRU)
+        self._job_keys: Dict[tuple, str] = {}  # (job_id, schema name) -> agent key
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _config_key(payload: Dict[str, Any]) -> str:
+        """Stable hash of a JSON-serializable config."""
+        data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+    def agent_cache_key(self, job_config: Dict[str, Any], output_schema: Optional[type] = None) -> str:
+        """
+        Cache key of the agent built for a job config.
+        Clave de caché del agente construido para un job.
+
+        Covers everything that goes into the Agent: agent_config, the job
+        name/description and the Vertex AI project/location.
+        """
+        return self._config_key({
+            "agent_config": job_config.get("agent_config", {}),
+            "name": job_config.get("name"),
+            "description": job_config.get("description"),
+            "project_id": os.environ.get("GCP_PROJECT"),
+            "location": os.environ.get("GCP_LOCATION", "us-central1"),
+            "output_schema": getattr(output_schema, "__name__", None),
+        })
+
+    def invalidate(self, job_id: Optional[str] = None) -> None:
+        """
+        Drops the pooled agents of a job (or every pooled agent).
+        Elimina los agentes del pool de un job (o todo el pool).
+        """
+        with self._cache_lock:
+            if job_id is None:
+                self._agents.clear()
+                self._job_keys.clear()
+                return
+            for job_ref in [ref for ref in self._job_keys if ref[0] == job_id]:
+                key = self._job_keys.pop(job_ref)
+                if key not in self._job_keys.values():
+                    self._agents.pop(key, None)
 
     def create_agent_from_job_config(
         self,
         job_config: Dict[str, Any],
         db: Optional[Any] = None,  # Agno db instance (e.g., SqliteDb)
-        tools: Optional[List[Union[Toolkit, callable]]] = None
+        tools: Optional[List[Union[Toolkit, callable]]] = None,
+        output_schema: Optional[type] = None
     ) -> Agent:
         """
         Creates an Agno Agent from a job configuration.
@@ -79,10 +136,91 @@ class AgentFactory:
                Base de datos opcional para persistir sesiones.
             tools: Optional list of tools/toolkits to add to the agent.
                   Lista opcional de herramientas para el agente.
+            output_schema: Pydantic model overriding the job's output schema
+                           (e.g. the multi-document batch schema).
+                           Modelo Pydantic que reemplaza el schema de salida.
 
         Returns:
-            Configured Agno Agent instance.
+            Configured Agno Agent instance, owned by the caller.
             Instancia de Agente Agno configurada.
+
+        Always builds a new Agent; use ``lease_agent`` to reuse pooled ones.
+        """
+        return self._build_agent(job_config, db, tools, output_schema)
+
+    @contextmanager
+    def lease_agent(self, job_config: Dict[str, Any], output_schema: Optional[type] = None) -> Iterator[Agent]:
+        """
+        Lends an Agent for a job that no other thread is using.
+        Presta un agente del job que ningún otro hilo está usando.
+
+        An Agno Agent keeps the state of its current run on the instance, so
+        concurrent ``run`` calls on one Agent overwrite each other's messages
+        and response. The leased Agent goes back to the pool when the block
+        exits; a changed job config drops the job's pooled agents.
+
+        Usage:
+            with agent_factory.lease_agent(job_config) as agent:
+                response = agent.run(prompt)
+        """
+        if self.max_cached_agents == 0:
+            yield self._build_agent(job_config, None, None, output_schema)
+            return
+
+        job_id = job_config.get("id")
+        job_ref = (job_id, getattr(output_schema, "__name__", None))
+        key = self.agent_cache_key(job_config, output_schema)
+        agent = None
+        with self._cache_lock:
+            previous_key = self._job_keys.get(job_ref)
+            if job_id is not None and previous_key not in (None, key):
+                # The job's config changed: its old agents are stale
+                self._job_keys.pop(job_ref)
+                if previous_key not in self._job_keys.values():
+                    self._agents.pop(previous_key, None)
+                logger.info(f"Agent config of job '{job_id}' changed. Rebuilding agents.")
+            if job_id is not None:
+                self._job_keys[job_ref] = key
+            idle = self._agents.get(key)
+            if idle:
+                agent = idle.pop()
+                self._agents.move_to_end(key)
+
+        if agent is None:
+            agent = self._build_agent(job_config, None, None, output_schema)
+        else:
+            logger.debug(f"Reusing pooled agent '{agent.name}' (key {key})")
+        try:
+            yield agent
+        finally:
+            self._release(job_ref, key, agent)
+
+    def _release(self, job_ref: tuple, key: str, agent: Agent) -> None:
+        """Returns a leased Agent to the pool, evicting the least recently used idle agents."""
+        with self._cache_lock:
+            if job_ref[0] is not None and self._job_keys.get(job_ref) != key:
+                # The job was invalidated or its config changed while the agent was leased
+                return
+            self._agents.setdefault(key, []).append(agent)
+            self._agents.move_to_end(key)
+            idle = sum(len(agents) for agents in self._agents.values())
+            while idle > self.max_cached_agents:
+                oldest_key, agents = next(iter(self._agents.items()))
+                agents.pop(0)
+                idle -= 1
+                if not agents:
+                    del self._agents[oldest_key]
+
+    def _build_agent(
+        self,
+        job_config: Dict[str, Any],
+        db: Optional[Any] = None,
+        tools: Optional[List[Union[Toolkit, callable]]] = None,
+        output_schema_override: Optional[type] = None
+    ) -> Agent:
+        """
+        Builds a new Agno Agent (model, params and output schema) for a job config.
+        Construye un nuevo Agente Agno para un job.
         """
         agent_config = job_config.get("agent_config", {})
         
@@ -152,7 +290,9 @@ class AgentFactory:
         output_schema = agent_config.get("output_schema") or agent_config.get("response_model")
         
         # CENF 2026-01-04: Force FileAnalysis model if it's a file analysis task
-        if FileAnalysis is not None:
+        if output_schema_override is not None:
+            agent_params["output_schema"] = output_schema_override
+        elif FileAnalysis is not None:
              logger.info("Forcing FileAnalysis Pydantic model for structured outputs")
              agent_params["output_schema"] = FileAnalysis
         elif output_schema:
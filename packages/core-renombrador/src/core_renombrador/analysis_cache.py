@@ -0,0 +1,194 @@
+"""
+AnalysisCache - Caché de análisis por hash de contenido
+=======================================================
+
+Persistent cache of ``FileAnalysis`` results keyed by the Drive
+``md5Checksum`` of the file plus a hash of the job's ``agent_config``.
+The same PDF copied into several client folders is analyzed only once:
+a hit skips both the download and the agent call.
+Caché persistente de resultados de análisis indexada por el md5 de Drive
+y un hash de la configuración del agente.
+
+Storage follows DatabaseManager: a JSON blob in GCS (Cloud Run) or a local
+JSON file. Entries are evicted LRU-style once ``max_entries`` is exceeded.
+
+:created:   2026-10-17
+:filename:  analysis_cache.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+from .file_manager import FileManager
+
+logger = logging.getLogger(__name__)
+
+# agent_config keys that do not change the analysis itself
+NON_ANALYSIS_KEYS = ("filename_format", "llm_cache")
+
+
+def agent_config_hash(agent_config: Dict[str, Any], exclude: Iterable[str] = NON_ANALYSIS_KEYS) -> str:
+    """
+    Stable hash of the parts of agent_config that affect the analysis.
+    Hash estable de la parte de agent_config que afecta al análisis.
+    """
+    relevant = {k: v for k, v in (agent_config or {}).items() if k not in set(exclude)}
+    payload = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class AnalysisCache:
+    """
+    Size-bounded, persistent (md5, config hash) -> analysis cache.
+    Caché persistente y acotada (md5, hash de config) -> análisis.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 5000,
+        file_manager: Optional[FileManager] = None,
+        cache_path: Optional[Union[str, Path]] = None,
+        gcs_bucket_name: Optional[str] = None,
+        blob_name: str = "cache/analysis_cache.json"
+    ):
+        """
+        Initialize AnalysisCache.
+
+        Args:
+            max_entries: Max number of cached analyses (LRU eviction).
+            file_manager: FileManager for local JSON persistence.
+            cache_path: Local JSON file path (local mode).
+            gcs_bucket_name: Bucket for GCS persistence (takes priority).
+            blob_name: Blob name inside the bucket.
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.file_manager = file_manager
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.gcs_bucket_name = gcs_bucket_name
+        self.blob_name = blob_name
+        self.bucket = None
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._new_keys = set()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        if self.gcs_bucket_name:
+            try:
+                from google.cloud import storage
+                self.bucket = storage.Client().bucket(self.gcs_bucket_name)
+                logger.info(f"AnalysisCache persistence: gs://{self.gcs_bucket_name}/{self.blob_name}")
+            except Exception as e:
+                logger.warning(f"AnalysisCache could not initialize GCS ({e}). Cache will be in-memory only.")
+                self.bucket = None
+
+    @staticmethod
+    def make_key(md5: str, config_hash: str) -> str:
+        return f"{md5}:{config_hash}"
+
+    # --- Persistence ---
+
+    def _read_store(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.bucket is not None:
+                blob = self.bucket.blob(self.blob_name)
+                if not blob.exists():
+                    return {}
+                return json.loads(blob.download_as_text())
+            if self.cache_path and self.file_manager and self.cache_path.exists():
+                return self.file_manager.read_json_file(self.cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to load analysis cache: {e}")
+        return {}
+
+    def _write_store(self, data: Dict[str, Dict[str, Any]]) -> None:
+        if self.bucket is not None:
+            blob = self.bucket.blob(self.blob_name)
+            blob.upload_from_string(json.dumps(data), content_type="application/json")
+        elif self.cache_path and self.file_manager:
+            self.file_manager.write_json_file(self.cache_path, data)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        stored = self._read_store()
+        if isinstance(stored, dict):
+            for key, entry in stored.items():
+                self._entries[key] = entry
+            self._evict()
+        self._loaded = True
+        logger.info(f"AnalysisCache loaded with {len(self._entries)} entries")
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self._new_keys.discard(key)
+
+    def flush(self) -> None:
+        """
+        Persists new entries, merging with whatever other instances stored.
+        Persiste las entradas nuevas, combinándolas con lo ya almacenado.
+        """
+        with self._lock:
+            if not self._new_keys:
+                return
+            new_entries = {key: self._entries[key] for key in self._new_keys if key in self._entries}
+            merged = OrderedDict()
+            stored = self._read_store()
+            if isinstance(stored, dict):
+                merged.update(stored)
+            for key, entry in new_entries.items():
+                merged.pop(key, None)
+                merged[key] = entry
+            while len(merged) > self.max_entries:
+                merged.popitem(last=False)
+            try:
+                self._write_store(merged)
+                self._new_keys.clear()
+                logger.info(f"AnalysisCache flushed {len(new_entries)} new entries ({len(merged)} total)")
+            except Exception as e:
+                logger.error(f"Failed to persist analysis cache: {e}")
+
+    # --- Lookups ---
+
+    def get(self, md5: Optional[str], config_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached analysis or None. Files without md5 never hit.
+        Devuelve el análisis cacheado o None.
+        """
+        if not md5:
+            return None
+        key = self.make_key(md5, config_hash)
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry["analysis"])
+
+    def put(self, md5: Optional[str], config_hash: str, analysis: Dict[str, Any]) -> None:
+        """
+        Stores an analysis result.
+        Guarda un resultado de análisis.
+        """
+        if not md5 or not analysis:
+            return
+        key = self.make_key(md5, config_hash)
+        with self._lock:
+            self._ensure_loaded()
+            self._entries.pop(key, None)
+            self._entries[key] = {"analysis": analysis, "stored_at": int(time.time())}
+            self._new_keys.add(key)
+            self._evict()
@@ -0,0 +1,436 @@
+"""
+Category Model - Clasificador local de categorías (TF-IDF + lineal)
+===================================================================
+
+Lightweight, pure-Python text classifier that predicts
+``FileAnalysis.category`` on CPU in well under a millisecond, trained
+offline from past ``(extracted text, category)`` pairs produced by Gemini.
+Clasificador liviano en Python puro que predice la categoría del documento
+a partir de ejemplos ya analizados por Gemini.
+
+- Features: TF-IDF (sublinear tf, L2-normalized) of word unigrams and bigrams.
+- Model: multinomial logistic regression trained with SGD; the softmax
+  probability of the predicted class is the confidence.
+- Storage: one JSON file (local path or ``gs://bucket/blob``).
+
+Training samples are recorded by the worker with ``CategorySampleRecorder``
+(JSONL chunks in a local directory or a GCS prefix). Train with::
+
+    python -m core_renombrador.category_model train \\
+        --samples data/category_samples --output data/category_model.json
+
+:created:   2026-10-17
+:filename:  category_model.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION = 1
+
+# Characters of each document kept in a training sample
+SAMPLE_TEXT_CHARS = 4000
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased, accent-free word tokens; long numbers (amounts, IDs) are dropped.
+    Tokens en minúsculas y sin acentos; se descartan números largos.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in _TOKEN.findall(text) if len(token) > 1 and not (token.isdigit() and len(token) > 4)]
+
+
+def extract_terms(text: str) -> Counter:
+    """Unigram and bigram counts of a document."""
+    tokens = tokenize(text)
+    terms = Counter(tokens)
+    terms.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return terms
+
+
+def _split_gcs(path: str) -> Tuple[str, str]:
+    bucket, _, name = path[len("gs://"):].partition("/")
+    return bucket, name
+
+
+class CategoryModel:
+    """
+    TF-IDF + softmax regression category classifier.
+    Clasificador de categorías TF-IDF + regresión softmax.
+
+    Usage:
+        model = CategoryModel.load("data/category_model.json")
+        category, confidence, terms = model.predict(content)
+    """
+
+    def __init__(
+        self,
+        classes: List[str],
+        idf: Dict[str, float],
+        weights: Dict[str, Dict[str, float]],
+        bias: Dict[str, float],
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.classes = classes
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.metadata = metadata or {}
+
+    # --- Features ---
+
+    def vectorize(self, text: str) -> Dict[str, float]:
+        """TF-IDF vector (L2-normalized) over the model vocabulary."""
+        vector = {}
+        for term, count in extract_terms(text).items():
+            idf = self.idf.get(term)
+            if idf is not None:
+                vector[term] = (1.0 + math.log(count)) * idf
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            for term in vector:
+                vector[term] /= norm
+        return vector
+
+    def _probabilities(self, vector: Dict[str, float]) -> Dict[str, float]:
+        scores = {}
+        for label in self.classes:
+            weights = self.weights.get(label, {})
+            scores[label] = self.bias.get(label, 0.0) + sum(
+                value * weights.get(term, 0.0) for term, value in vector.items()
+            )
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    # --- Inference ---
+
+    def predict(self, text: str, top_terms: int = 3) -> Tuple[Optional[str], float, List[str]]:
+        """
+        Predicts the category of a document.
+        Predice la categoría de un documento.
+
+        Returns:
+            ``(category, confidence, terms)``: ``terms`` are the document terms
+            that weigh most for the predicted category. ``(None, 0.0, [])`` if
+            the text shares no vocabulary with the model.
+        """
+        vector = self.vectorize(text or "")
+        if not vector or not self.classes:
+            return None, 0.0, []
+        probabilities = self._probabilities(vector)
+        category = max(probabilities, key=probabilities.get)
+        weights = self.weights.get(category, {})
+        contributions = sorted(
+            ((value * weights.get(term, 0.0), term) for term, value in vector.items() if " " not in term),
+            reverse=True
+        )
+        terms = [term for contribution, term in contributions[:top_terms] if contribution > 0]
+        return category, probabilities[category], terms
+
+    # --- Training ---
+
+    @classmethod
+    def train(
+        cls,
+        samples: List[Tuple[str, str]],
+        min_df: int = 2,
+        max_features: int = 20000,
+        epochs: int = 8,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        seed: int = 13
+    ) -> "CategoryModel":
+        """
+        Trains a model from ``(text, category)`` pairs.
+        Entrena un modelo a partir de pares ``(texto, categoría)``.
+        """
+        documents = [(extract_terms(text), category) for text, category in samples if text and category]
+        if not documents:
+            raise ValueError("No training samples")
+
+        document_frequency = Counter()
+        for terms, _ in documents:
+            document_frequency.update(terms.keys())
+        vocabulary = [term for term, df in document_frequency.most_common(max_features) if df >= min_df]
+        total = len(documents)
+        idf = {term: math.log((1 + total) / (1 + document_frequency[term])) + 1.0 for term in vocabulary}
+        classes = sorted({category for _, category in documents})
+
+        model = cls(classes, idf, {label: {} for label in classes}, {label: 0.0 for label in classes})
+        vectors = []
+        for terms, category in documents:
+            vector = {term: (1.0 + math.log(count)) * idf[term] for term, count in terms.items() if term in idf}
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            vectors.append(({term: value / norm for term, value in vector.items()}, category))
+
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(vectors)
+            rate = learning_rate / (1 + epoch)
+            for vector, category in vectors:
+                probabilities = model._probabilities(vector)
+                for label in classes:
+                    gradient = probabilities[label] - (1.0 if label == category else 0.0)
+                    if abs(gradient) < 1e-6:
+                        continue
+                    weights = model.weights[label]
+                    for term, value in vector.items():
+                        weight = weights.get(term, 0.0)
+                        weights[term] = weight - rate * (gradient * value + l2 * weight)
+                    model.bias[label] -= rate * gradient
+
+        for label in classes:
+            model.weights[label] = {
+                term: round(weight, 6) for term, weight in model.weights[label].items() if abs(weight) > 1e-4
+            }
+        model.metadata = {
+            "version": MODEL_VERSION,
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "samples": total,
+            "features": len(idf),
+            "class_counts": dict(Counter(category for _, category in documents)),
+        }
+        return model
+
+    def accuracy(self, samples: List[Tuple[str, str]]) -> float:
+        """Share of samples whose predicted category matches."""
+        if not samples:
+            return 0.0
+        hits = sum(1 for text, category in samples if self.predict(text)[0] == category)
+        return hits / len(samples)
+
+    # --- Persistence ---
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "metadata": self.metadata,
+            "classes": self.classes,
+            "idf": self.idf,
+            "weights": self.weights,
+            "bias": self.bias,
+        }
+
+    def save(self, path: Union[str, Path], storage_client=None) -> None:
+        """
+        Saves the model as JSON to a local path or ``gs://bucket/blob``.
+        Guarda el modelo como JSON en una ruta local o en GCS.
+        """
+        data = json.dumps(self.to_dict(), ensure_ascii=False)
+        path = str(path)
+        if path.startswith("gs://"):
+            bucket_name, blob_name = _split_gcs(path)
+            if storage_client is None:
+                from google.cloud import storage
+                storage_client = storage.Client()
+            storage_client.bucket(bucket_name).blob(blob_name).upload_from_string(data, content_type="application/json")
+        else:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(data, encoding="utf-8")
+        logger.info(f"Category model saved to {path}")
+
+    @classmethod
+    def load(cls, path: Union[str, Path], storage_client=None) -> "CategoryModel":
+        """
+        Loads a model saved with ``save``.
+        Carga un modelo guardado con ``save``.
+        """
+        path = str(path)
+        if path.startswith("gs://"):
+            bucket_name, blob_name = _split_gcs(path)
+            if storage_client is None:
+                from google.cloud import storage
+                storage_client = storage.Client()
+            data = json.loads(storage_client.bucket(bucket_name).blob(blob_name).download_as_text())
+        else:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        model = cls(data["classes"], data["idf"], data["weights"], data["bias"], data.get("metadata"))
+        logger.info(f"Category model loaded from {path}: {len(model.classes)} classes, {len(model.idf)} features")
+        return model
+
+
+class CategorySampleRecorder:
+    """
+    Buffers ``(text, category)`` training samples and writes them as JSONL chunks.
+    Acumula ejemplos de entrenamiento y los escribe como archivos JSONL.
+
+    Each ``flush`` writes a new chunk (``<timestamp>-<id>.jsonl``) to a local
+    directory or a GCS prefix, so several instances never write the same file.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = "data/category_samples",
+        gcs_bucket_name: Optional[str] = None,
+        gcs_prefix: str = "samples/category/",
+        storage_client=None,
+        max_text_chars: int = SAMPLE_TEXT_CHARS
+    ):
+        """
+        Initialize CategorySampleRecorder.
+
+        Args:
+            directory: Local directory for the chunks (local mode).
+            gcs_bucket_name: Bucket for the chunks (takes priority).
+            gcs_prefix: Blob prefix inside the bucket.
+            storage_client: Cloud Storage client (built on demand if omitted).
+            max_text_chars: Characters of each document kept.
+        """
+        self.directory = Path(directory)
+        self.gcs_prefix = gcs_prefix
+        self.max_text_chars = max_text_chars
+        self.bucket = None
+        self._samples: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+        if gcs_bucket_name:
+            try:
+                if storage_client is None:
+                    from google.cloud import storage
+                    storage_client = storage.Client()
+                self.bucket = storage_client.bucket(gcs_bucket_name)
+                logger.info(f"Category samples stored in gs://{gcs_bucket_name}/{gcs_prefix}")
+            except Exception as e:
+                logger.warning(f"CategorySampleRecorder could not initialize GCS ({e}). Using {self.directory}.")
+                self.bucket = None
+
+    def record(self, text: str, category: Optional[str], job_id: Optional[str] = None) -> None:
+        """
+        Adds one sample (ignored without text or category).
+        Agrega un ejemplo (se ignora si falta texto o categoría).
+        """
+        if not text or not category:
+            return
+        with self._lock:
+            self._samples.append({"text": text[:self.max_text_chars], "category": category, "job_id": job_id})
+
+    def flush(self) -> None:
+        """
+        Writes the buffered samples as a new JSONL chunk.
+        Escribe los ejemplos acumulados como un nuevo archivo JSONL.
+        """
+        with self._lock:
+            samples, self._samples = self._samples, []
+        if not samples:
+            return
+        name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}.jsonl"
+        data = "\n".join(json.dumps(sample, ensure_ascii=False) for sample in samples) + "\n"
+        try:
+            if self.bucket is not None:
+                self.bucket.blob(f"{self.gcs_prefix}{name}").upload_from_string(data, content_type="application/jsonl")
+            else:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                (self.directory / name).write_text(data, encoding="utf-8")
+            logger.info(f"Recorded {len(samples)} category samples ({name})")
+        except Exception as e:
+            logger.error(f"Failed to store {len(samples)} category samples: {e}")
+
+
+def iter_samples(source: str, storage_client=None) -> Iterator[Tuple[str, str]]:
+    """
+    Yields ``(text, category)`` from JSONL chunks in a directory, a file or ``gs://bucket/prefix``.
+    Recorre los ejemplos de entrenamiento guardados.
+    """
+    def parse(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                sample = json.loads(line)
+            except ValueError:
+                continue
+            if sample.get("text") and sample.get("category"):
+                yield sample["text"], sample["category"]
+
+    if source.startswith("gs://"):
+        bucket_name, prefix = _split_gcs(source)
+        if storage_client is None:
+            from google.cloud import storage
+            storage_client = storage.Client()
+        for blob in storage_client.list_blobs(bucket_name, prefix=prefix):
+            if blob.name.endswith(".jsonl"):
+                yield from parse(blob.download_as_text().splitlines())
+        return
+
+    path = Path(source)
+    files = sorted(path.glob("*.jsonl")) if path.is_dir() else [path]
+    for file in files:
+        with file.open(encoding="utf-8") as handle:
+            yield from parse(handle)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m core_renombrador.category_model",
+        description="Train or evaluate the local category classifier."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="Train a model from recorded samples")
+    train.add_argument("--samples", required=True, help="JSONL file, directory or gs://bucket/prefix")
+    train.add_argument("--output", required=True, help="Model path (local or gs://bucket/blob)")
+    train.add_argument("--min-df", type=int, default=2, help="Min documents a term must appear in")
+    train.add_argument("--max-features", type=int, default=20000)
+    train.add_argument("--epochs", type=int, default=8)
+    train.add_argument("--min-class-samples", type=int, default=5, help="Drop rarer categories")
+    train.add_argument("--holdout", type=float, default=0.1, help="Share of samples held out for evaluation")
+
+    evaluate = commands.add_parser("evaluate", help="Accuracy of a model on recorded samples")
+    evaluate.add_argument("--model", required=True)
+    evaluate.add_argument("--samples", required=True)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    samples = list(iter_samples(args.samples))
+    if args.command == "evaluate":
+        model = CategoryModel.load(args.model)
+        print(f"Accuracy: {model.accuracy(samples):.3f} on {len(samples)} samples")
+        return 0
+
+    counts = Counter(category for _, category in samples)
+    samples = [(text, category) for text, category in samples if counts[category] >= args.min_class_samples]
+    if not samples:
+        print("Not enough samples to train")
+        return 1
+    random.Random(13).shuffle(samples)
+    holdout = int(len(samples) * args.holdout)
+    test, training = samples[:holdout], samples[holdout:]
+
+    started = time.perf_counter()
+    model = CategoryModel.train(training, min_df=args.min_df, max_features=args.max_features, epochs=args.epochs)
+    print(f"Trained on {len(training)} samples, {len(model.classes)} classes, "
+          f"{len(model.idf)} features in {time.perf_counter() - started:.1f}s")
+    if test:
+        model.metadata["holdout_accuracy"] = round(model.accuracy(test), 4)
+        print(f"Holdout accuracy: {model.metadata['holdout_accuracy']:.3f} on {len(test)} samples")
+    model.save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,204 @@
+"""
+Client Registry - Clientes de Google API reutilizables
+======================================================
+
+Process-wide cache of Google credentials and API clients:
+
+- Credentials are resolved once (``google.auth.default``) and refreshed by
+  google-auth as needed.
+- The Drive v3 discovery document is loaded and parsed once from the copy
+  bundled with googleapiclient (no network fetch, no file cache).
+- Drive requests go through the shared ``QuotaGovernor`` (QPS pacing,
+  Retry-After handling, optional ``quotaUser``).
+- Drive services are handed out per thread, because httplib2 is not
+  thread-safe. When a thread ends, its service returns to an idle pool and
+  the next thread reuses it, so HTTP connections stay alive across files
+  and pipeline runs.
+- Storage and Vision clients (thread-safe) are built once.
+
+Caché de credenciales y clientes de Google API: un servicio de Drive por
+thread (reutilizado entre runs para mantener las conexiones vivas) y
+clientes de Storage/Vision únicos.
+
+:created:   2026-10-17
+:filename:  client_registry.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import json
+import logging
+import threading
+import weakref
+from typing import Any, Callable, List, Optional, Sequence
+
+import google.auth
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from .quota_governor import QuotaGovernor, governed_http
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCOPES = (
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/cloud-platform",
+)
+
+
+class _DriveLease:
+    """Thread-local holder; when the thread ends it is collected and the service released."""
+
+    __slots__ = ("service", "__weakref__")
+
+    def __init__(self, service):
+        self.service = service
+
+
+class ClientRegistry:
+    """
+    Caches credentials and Google API clients for the whole process.
+    Cachea credenciales y clientes de Google API para todo el proceso.
+    """
+
+    def __init__(
+        self,
+        scopes: Sequence[str] = DEFAULT_SCOPES,
+        credentials=None,
+        http_timeout: int = 120,
+        max_idle_drive_services: int = 32,
+        quota_governor: Optional[QuotaGovernor] = None
+    ):
+        """
+        Initialize ClientRegistry.
+
+        Args:
+            scopes: OAuth scopes requested from Application Default Credentials.
+            credentials: Pre-built credentials (skips ``google.auth.default``).
+            http_timeout: Socket timeout in seconds for Drive HTTP connections.
+            max_idle_drive_services: Drive services kept for reuse once their thread ends.
+            quota_governor: Drive quota governor (default: the process-wide one).
+        """
+        self.scopes = list(scopes)
+        self.http_timeout = http_timeout
+        self.max_idle_drive_services = max_idle_drive_services
+        self.quota_governor = quota_governor
+        self._credentials = credentials
+        self._drive_document = None
+        self._idle_drive_services: List[Any] = []
+        self._storage_client = None
+        self._vision_client = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # --- Credentials ---
+
+    def get_credentials(self):
+        """
+        Returns the cached credentials, resolving ADC on first use.
+        Devuelve las credenciales cacheadas (ADC en el primer uso).
+        """
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    credentials, _ = google.auth.default(scopes=self.scopes)
+                    self._credentials = credentials
+                    logger.info("Using Application Default Credentials")
+        return self._credentials
+
+    # --- Drive ---
+
+    def _get_drive_document(self):
+        if self._drive_document is None:
+            with self._lock:
+                if self._drive_document is None:
+                    self._drive_document = json.loads(get_static_doc("drive", "v3"))
+        return self._drive_document
+
+    def _build_drive_service(self):
+        http = governed_http(self.get_credentials(), self.quota_governor, timeout=self.http_timeout)
+        return build_from_document(self._get_drive_document(), http=http)
+
+    def _release_drive_service(self, service) -> None:
+        with self._lock:
+            if len(self._idle_drive_services) < self.max_idle_drive_services:
+                self._idle_drive_services.append(service)
+
+    def drive_service(self):
+        """
+        Returns the Drive v3 service of the calling thread.
+        Devuelve el servicio de Drive v3 del thread que llama.
+
+        The service (and its open connections) is returned to an idle pool
+        when the thread ends and handed to the next thread that asks.
+        """
+        lease = getattr(self._local, "drive", None)
+        if lease is None:
+            with self._lock:
+                service = self._idle_drive_services.pop() if self._idle_drive_services else None
+            if service is None:
+                service = self._build_drive_service()
+                logger.debug(f"Built Drive service for thread {threading.current_thread().name}")
+            lease = _DriveLease(service)
+            weakref.finalize(lease, self._release_drive_service, service)
+            self._local.drive = lease
+        return lease.service
+
+    def drive_service_factory(self) -> Callable[[], Any]:
+        """
+        Callable returning the per-thread Drive service (for pipeline stages).
+        Callable que devuelve el servicio de Drive del thread.
+        """
+        return self.drive_service
+
+    # --- Storage / Vision ---
+
+    def storage_client(self):
+        """
+        Returns the shared Cloud Storage client.
+        Devuelve el cliente compartido de Cloud Storage.
+        """
+        if self._storage_client is None:
+            credentials = self.get_credentials()
+            with self._lock:
+                if self._storage_client is None:
+                    from google.cloud import storage
+                    self._storage_client = storage.Client(credentials=credentials)
+        return self._storage_client
+
+    def vision_client(self):
+        """
+        Returns the shared Vision client, or None if Vision is unavailable.
+        Devuelve el cliente compartido de Vision, o None si no está disponible.
+        """
+        if self._vision_client is None:
+            try:
+                credentials = self.get_credentials()
+                with self._lock:
+                    if self._vision_client is None:
+                        from google.cloud import vision
+                        self._vision_client = vision.ImageAnnotatorClient(credentials=credentials)
+            except Exception as e:
+                logger.warning(f"Could not initialize Vision API client: {e}")
+                return None
+        return self._vision_client
+
+
+_default_registry: Optional[ClientRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """
+    Returns the process-wide ClientRegistry.
+    Devuelve el ClientRegistry del proceso.
+    """
+    global _default_registry
+    if _default_registry is None:
+        with _default_lock:
+            if _default_registry is None:
+                _default_registry = ClientRegistry()
+    return _default_registry
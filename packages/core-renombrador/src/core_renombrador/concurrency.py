@@ -0,0 +1,218 @@
+"""
+Concurrency - Control adaptativo de concurrencia para Gemini
+============================================================
+
+AIMD (additive increase, multiplicative decrease) limiter around model
+calls. The number of calls allowed in flight grows slowly while responses
+come back within ``latency_target`` seconds and is halved when Vertex
+answers 429 / RESOURCE_EXHAUSTED. Throttled calls are retried with
+jittered exponential backoff until the per-call time budget runs out, so a
+quota spike delays a file instead of skipping it until the next run.
+Limitador AIMD alrededor de las llamadas al modelo: crece mientras la
+latencia es sana, se reduce a la mitad ante un 429 y reintenta con backoff.
+
+:created:   2026-10-17
+:filename:  concurrency.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_PATTERN = re.compile(
+    r"\b429\b|RESOURCE_EXHAUSTED|too many requests|quota exceeded|rate limit",
+    re.IGNORECASE
+)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """
+    True if an exception means the model quota/rate limit was hit.
+    True si la excepción indica que se alcanzó la cuota del modelo.
+    """
+    for attribute in ("status_code", "code", "status"):
+        value = getattr(error, attribute, None)
+        if value == 429 or (isinstance(value, str) and value in ("429", "RESOURCE_EXHAUSTED")):
+            return True
+    if RATE_LIMIT_PATTERN.search(str(error)):
+        return True
+    cause = error.__cause__ or error.__context__
+    return cause is not None and cause is not error and is_rate_limit_error(cause)
+
+
+class AdaptiveLimiter:
+    """
+    Thread-safe AIMD concurrency limiter with 429-aware retries.
+    Limitador de concurrencia AIMD thread-safe con reintentos ante 429.
+
+    Usage:
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=16)
+        response = limiter.call(agent.run, prompt)
+        limiter.metrics()["limit"]
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        latency_target: float = 20.0,
+        decrease_factor: float = 0.5,
+        retry_budget: float = 120.0,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 30.0,
+        name: str = "gemini"
+    ):
+        """
+        Initialize AdaptiveLimiter.
+
+        Args:
+            initial_limit: Calls allowed in flight at start.
+            min_limit: Lower bound of the limit.
+            max_limit: Upper bound of the limit.
+            latency_target: Calls slower than this (seconds) do not grow the limit.
+            decrease_factor: Multiplier applied to the limit on a 429.
+            retry_budget: Seconds a single call may spend retrying 429s.
+            backoff_base: First backoff ceiling in seconds (doubles per attempt).
+            backoff_cap: Max backoff ceiling in seconds.
+            name: Label used in logs.
+        """
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.retry_budget = retry_budget
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.name = name
+
+        self._limit = float(min(self.max_limit, max(self.min_limit, int(initial_limit))))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._latency_ewma: Optional[float] = None
+        self._counters = {"calls": 0, "throttled": 0, "retries": 0, "gave_up": 0}
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def average_latency(self) -> float:
+        """Moving average of successful call latency in seconds (0 before the first call)."""
+        return self._latency_ewma or 0.0
+
+    # --- Slots ---
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    # --- AIMD ---
+
+    def on_success(self, latency: float) -> None:
+        """Additive increase: about +1 per ``limit`` healthy calls."""
+        with self._condition:
+            self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+            if latency <= self.latency_target and self._limit < self.max_limit:
+                previous = int(self._limit)
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+                if int(self._limit) > previous:
+                    logger.info(f"[{self.name}] concurrency limit raised to {int(self._limit)}")
+                    self._condition.notify_all()
+
+    def on_throttled(self, latency: float = 0.0) -> None:
+        """
+        Multiplicative decrease. Calls that were already in flight when the
+        limit was cut report their 429 too; only one cut per latency window.
+        """
+        with self._condition:
+            self._counters["throttled"] += 1
+            now = time.monotonic()
+            if now - self._last_decrease < max(1.0, latency):
+                return
+            self._last_decrease = now
+            self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+            logger.warning(f"[{self.name}] rate limited: concurrency limit cut to {int(self._limit)}")
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(cap, base * 2^attempt)]."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    # --- Calls ---
+
+    def call(self, func: Callable[..., Any], *args, retry_budget: Optional[float] = None, **kwargs) -> Any:
+        """
+        Runs ``func`` within a concurrency slot, retrying rate-limit errors.
+        Ejecuta ``func`` dentro de un slot, reintentando los errores de cuota.
+
+        Raises:
+            The last error if it is not a rate-limit error or the retry budget ran out.
+        """
+        budget = self.retry_budget if retry_budget is None else retry_budget
+        deadline = time.monotonic() + budget
+        attempt = 0
+        while True:
+            self.acquire()
+            started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                latency = time.monotonic() - started
+                self.release()
+                if not is_rate_limit_error(e):
+                    raise
+                self.on_throttled(latency)
+                delay = self._backoff(attempt)
+                if time.monotonic() + delay > deadline:
+                    with self._condition:
+                        self._counters["gave_up"] += 1
+                    logger.error(f"[{self.name}] still rate limited after {attempt + 1} attempts, giving up")
+                    raise
+                with self._condition:
+                    self._counters["retries"] += 1
+                logger.info(f"[{self.name}] rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            latency = time.monotonic() - started
+            self.release()
+            with self._condition:
+                self._counters["calls"] += 1
+            self.on_success(latency)
+            return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Current limit, calls in flight and throttling counters.
+        Límite actual, llamadas en curso y contadores de throttling.
+        """
+        with self._condition:
+            view = dict(self._counters)
+            view.update({
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "average_latency": round(self.average_latency, 3),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+            })
+        return view
@@ -0,0 +1,236 @@
+"""
+Content Budget - Recorte de contenido por presupuesto de tokens
+===============================================================
+
+Fits extracted document text into a token budget before it is sent to the
+model. Instead of a blind ``content[:8000]`` cut, the text is normalized
+(whitespace runs, OCR noise lines and repeated lines removed) and, if it
+still does not fit, the budget is spent on:
+
+1. the head of the document (title, issuer, document type),
+2. the tail (totals, signatures, due dates),
+3. the blocks in between that contain dates, CUITs or amounts.
+
+Ajusta el texto extraído a un presupuesto de tokens: normaliza el texto y
+conserva el inicio, el final y los bloques con fechas, CUIT o importes.
+
+Token counts are estimated locally (about 4 characters per token), so no
+tokenizer call is needed.
+
+:created:   2026-10-17
+:filename:  content_budget.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import logging
+import re
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for Spanish/English text with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+DEFAULT_MAX_TOKENS = 2000
+
+# Marker inserted where content was left out
+GAP_MARKER = "\n[...]\n"
+
+# Target size of the blocks the text is split into
+BLOCK_CHARS = 300
+
+MONTHS = (
+    "enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre"
+)
+
+DATE_PATTERN = re.compile(
+    r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b"            # 31/12/2025, 31-12-25
+    r"|\b\d{4}-\d{2}-\d{2}\b"                          # 2025-12-31
+    rf"|\b(?:{MONTHS})\b\s*(?:de\s+|del\s+)?\d{{4}}"   # diciembre 2025, enero de 2025
+    r"|\b(?:per[ií]odo|vencimiento|fecha)\b",
+    re.IGNORECASE
+)
+CUIT_PATTERN = re.compile(r"\b(?:20|23|24|27|30|33|34)-?\d{8}-?\d\b")
+AMOUNT_PATTERN = re.compile(
+    r"\$\s?\d"                                         # $ 1.234
+    r"|\b\d{1,3}(?:\.\d{3})+,\d{2}\b"                  # 1.234.567,89
+    r"|\btotal\b",
+    re.IGNORECASE
+)
+
+# Lines with too few letters/digits are OCR noise or table rulers
+_MIN_ALNUM_RATIO = 0.3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the token count of a text locally.
+    Estima localmente la cantidad de tokens de un texto.
+    """
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize_content(text: str) -> str:
+    """
+    Removes whitespace padding, OCR noise lines and consecutive duplicate lines.
+    Elimina espacios de relleno, líneas de ruido OCR y líneas repetidas.
+    """
+    lines = []
+    previous = None
+    for raw_line in text.splitlines():
+        line = " ".join(raw_line.split())
+        if not line or line == previous:
+            continue
+        alnum = sum(1 for char in line if char.isalnum())
+        if alnum / len(line) < _MIN_ALNUM_RATIO:
+            continue
+        lines.append(line)
+        previous = line
+    return "\n".join(lines)
+
+
+def score_block(block: str) -> int:
+    """
+    Relevance of a block for naming: dates weigh most, then CUITs and amounts.
+    Relevancia de un bloque: fechas, CUIT e importes.
+    """
+    return (
+        3 * len(DATE_PATTERN.findall(block))
+        + 2 * len(CUIT_PATTERN.findall(block))
+        + len(AMOUNT_PATTERN.findall(block))
+    )
+
+
+def split_blocks(text: str, block_chars: int = BLOCK_CHARS) -> List[str]:
+    """Groups consecutive lines into blocks of about ``block_chars`` characters."""
+    blocks = []
+    current: List[str] = []
+    size = 0
+    lines = []
+    for line in text.split("\n"):
+        # Very long lines (no line breaks in the source) are cut into pieces
+        lines.extend(line[start:start + block_chars] for start in range(0, max(len(line), 1), block_chars))
+    for line in lines:
+        if current and size + len(line) > block_chars:
+            blocks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+class ContentBudgeter:
+    """
+    Fits document text into a token budget, keeping the most useful parts.
+    Ajusta el texto de un documento a un presupuesto de tokens.
+
+    Usage:
+        budgeter = ContentBudgeter(max_tokens=1500)
+        text, report = budgeter.fit(content)
+        report["tokens_saved"]
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        head_ratio: float = 0.4,
+        tail_ratio: float = 0.15
+    ):
+        """
+        Initialize ContentBudgeter.
+
+        Args:
+            max_tokens: Token budget for the content of one document.
+            head_ratio: Share of the budget reserved for the start of the document.
+            tail_ratio: Share of the budget reserved for the end of the document.
+        """
+        self.max_tokens = max(1, int(max_tokens))
+        self.head_ratio = head_ratio
+        self.tail_ratio = tail_ratio
+
+    def fit(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Returns the budgeted text and a report with the token counts.
+        Devuelve el texto ajustado y un reporte de tokens.
+
+        Report keys: ``original_tokens``, ``tokens`` (sent) and ``tokens_saved``.
+        """
+        original_tokens = estimate_tokens(text)
+        normalized = normalize_content(text or "")
+        if estimate_tokens(normalized) <= self.max_tokens:
+            result = normalized
+        else:
+            result = self._select(normalized)
+
+        tokens = estimate_tokens(result)
+        report = {
+            "original_tokens": original_tokens,
+            "tokens": tokens,
+            "tokens_saved": max(0, original_tokens - tokens),
+        }
+        return result, report
+
+    def _select(self, text: str) -> str:
+        budget = self.max_tokens * CHARS_PER_TOKEN
+        blocks = split_blocks(text)
+        chosen = set()
+        used = 0
+
+        def take(index: int, limit: float = budget) -> bool:
+            nonlocal used
+            size = len(blocks[index]) + len(GAP_MARKER)
+            if index in chosen or used + size > limit:
+                return False
+            chosen.add(index)
+            used += size
+            return True
+
+        # Head: title, issuer and document type usually come first
+        # (the first block is always kept if it fits the whole budget)
+        take(0)
+        head_limit = max(used, budget * self.head_ratio)
+        for index in range(1, len(blocks)):
+            if not take(index, head_limit):
+                break
+
+        # Tail: totals, due dates and signatures usually come last
+        tail_limit = used + budget * self.tail_ratio
+        for index in range(len(blocks) - 1, -1, -1):
+            if not take(index, tail_limit):
+                break
+
+        # Middle: blocks with dates, CUITs or amounts, best scored first
+        scored = sorted(
+            ((score_block(blocks[index]), index) for index in range(len(blocks)) if index not in chosen),
+            key=lambda pair: (-pair[0], pair[1])
+        )
+        for score, index in scored:
+            if score > 0:
+                take(index)
+
+        # Leftover budget: continue the head
+        for index in range(len(blocks)):
+            if index not in chosen and not take(index):
+                break
+
+        if not chosen:
+            return text[:budget]
+
+        parts = []
+        previous = None
+        for index in sorted(chosen):
+            if previous is not None and index != previous + 1:
+                parts.append(GAP_MARKER)
+            elif previous is not None:
+                parts.append("\n")
+            parts.append(blocks[index])
+            previous = index
+        return "".join(parts)[:budget]
@@ -20,18 +20,75 @@ Extrae contenido de archivos de diversos formatos, incluyendo:
 
 import logging
 import os
+import shutil
+import tempfile
+from concurrent.futures import Executor
 from io import BytesIO
-from typing import Optional, Tuple
+from typing import BinaryIO, List, Optional, Tuple, Union
 
 import docx
 import openpyxl
 from google.cloud import vision
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, convert_from_path
 from PIL import Image
 from pypdf import PdfReader
 
+from .content_budget import CHARS_PER_TOKEN
+
 logger = logging.getLogger(__name__)
 
+# Content accepted by the extractor: raw bytes or a seekable binary file-like
+FileSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+def _as_stream(source: FileSource) -> BinaryIO:
+    """
+    Returns a seekable stream over the source without copying it.
+    Devuelve un stream sobre la fuente sin copiarla.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # BytesIO shares the initial buffer until it is written to
+        return BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def _as_bytes(source: FileSource) -> bytes:
+    """
+    Returns the source as bytes (only for consumers that require bytes).
+    Devuelve la fuente como bytes (solo para consumidores que lo requieren).
+    """
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+def extract_pdf_pages(pdf_path: str, start: int, stop: int) -> List[str]:
+    """
+    Text of pages ``start..stop-1`` of a PDF file (runs in a worker process).
+    Texto de las páginas ``start..stop-1`` de un PDF (corre en otro proceso).
+
+    Module-level and fed only a path and a page range, so submitting it to a
+    ``ProcessPoolExecutor`` pickles a few bytes instead of the whole PDF.
+    """
+    reader = PdfReader(pdf_path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, min(stop, len(reader.pages)))]
+
+
+def _disk_path(source: FileSource) -> Optional[str]:
+    """
+    Path of the temp file backing a spooled buffer that rolled over to disk.
+    Ruta del archivo temporal de un buffer spooled que pasó a disco.
+
+    Only ``NamedSpooledTemporaryFile`` (drive_download) exposes one, already
+    flushed; in-memory sources have none.
+    """
+    path = getattr(source, "path", None)
+    return path if isinstance(path, str) and os.path.exists(path) else None
+
 
 class ContentExtractor:
     """
@@ -39,7 +96,19 @@ class ContentExtractor:
     Supports OCR for images and scanned PDFs using Google Cloud Vision.
     """
 
-    def __init__(self, enable_ocr: bool = True, min_text_threshold: int = 100):
+    def __init__(
+        self,
+        enable_ocr: bool = True,
+        min_text_threshold: int = 100,
+        max_chars: Optional[int] = None,
+        ocr_max_pages: Optional[int] = 2,
+        text_read_bytes: int = 64 * 1024,
+        vision_client=None,
+        page_pool: Optional[Executor] = None,
+        page_workers: int = 1,
+        parallel_min_pages: int = 16,
+        pages_per_task: int = 8
+    ):
         """
         Initialize ContentExtractor.
 
@@ -48,11 +117,41 @@ class ContentExtractor:
                         Habilitar OCR para imágenes y PDFs escaneados.
             min_text_threshold: Minimum text length to consider PDF as "text-based".
                                 Longitud mínima de texto para considerar un PDF como "con texto".
+            max_chars: Default character budget: extraction stops reading pages,
+                       sheets or paragraphs once reached (None = no limit).
+                       Presupuesto de caracteres por defecto (None = sin límite).
+            ocr_max_pages: Max PDF pages rasterized and sent to OCR (None = all).
+                           Máximo de páginas de PDF enviadas a OCR (None = todas).
+            text_read_bytes: Bytes requested by the first read of a text stream;
+                             each further read doubles it.
+                             Bytes pedidos en la primera lectura de un stream de texto.
+            vision_client: Shared Vision client (e.g. from ClientRegistry);
+                           one is created if not given.
+                           Cliente de Vision compartido (opcional).
+            page_pool: Process pool shared across files; PDF text pages are
+                       extracted in it by page ranges (None = serial).
+                       Pool de procesos compartido para extraer páginas de PDF.
+            page_workers: Worker count of ``page_pool``: the most page ranges
+                          of one file in flight at once.
+                          Cantidad de procesos de ``page_pool``.
+            parallel_min_pages: PDFs with fewer pages are read serially.
+                                PDFs con menos páginas se leen en serie.
+            pages_per_task: Pages per range sent to the pool.
+                            Páginas por rango enviado al pool.
         """
         self.enable_ocr = enable_ocr
         self.min_text_threshold = min_text_threshold
+        self.max_chars = max_chars
+        self.ocr_max_pages = ocr_max_pages
+        self.text_read_bytes = text_read_bytes
+        self.page_pool = page_pool
+        self.page_workers = max(1, page_workers)
+        self.parallel_min_pages = max(1, parallel_min_pages)
+        self.pages_per_task = max(1, pages_per_task)
         
-        if self.enable_ocr:
+        if self.enable_ocr and vision_client is not None:
+            self.vision_client = vision_client
+        elif self.enable_ocr:
             try:
                 self.vision_client = vision.ImageAnnotatorClient()
                 logger.info("Google Cloud Vision client initialized successfully")
@@ -61,7 +160,13 @@ class ContentExtractor:
                 self.vision_client = None
                 self.enable_ocr = False
 
-    def get_content(self, file_path: str, file_bytes: bytes) -> str:
+    def get_content(
+        self,
+        file_path: str,
+        file_bytes: FileSource,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
         """
         Extracts text content from a file based on its extension.
         Extrae contenido de texto de un archivo según su extensión.
@@ -69,70 +174,131 @@ class ContentExtractor:
         Args:
             file_path: File name or path.
                       Nombre o ruta del archivo.
-            file_bytes: File content as bytes.
-                       Contenido del archivo como bytes.
+            file_bytes: File content as bytes, memoryview or a seekable
+                        binary file-like (e.g. a spooled download buffer).
+                       Contenido del archivo como bytes o file-like.
+            max_chars: Character budget; reading stops once it is met.
+                       Presupuesto de caracteres; se deja de leer al alcanzarlo.
+            max_tokens: Token budget (converted with CHARS_PER_TOKEN). Used
+                        when ``max_chars`` is not given.
+                        Presupuesto de tokens (si no se indica ``max_chars``).
 
         Returns:
-            Extracted text content.
+            Extracted text content (may exceed the budget by up to one page/row).
             Contenido de texto extraído.
         """
         _, extension = os.path.splitext(file_path)
         extension = extension.lower()
+        budget = self._resolve_budget(max_chars, max_tokens)
 
         try:
             if extension == ".txt":
-                return file_bytes.decode("utf-8", errors="ignore")
+                return self._get_text_content(file_bytes, budget)
             elif extension == ".xlsx":
-                return self._get_xlsx_content(file_bytes)
+                return self._get_xlsx_content(file_bytes, budget)
             elif extension == ".docx":
-                return self._get_docx_content(file_bytes)
+                return self._get_docx_content(file_bytes, budget)
             elif extension == ".pdf":
-                return self._get_pdf_content(file_bytes)
+                return self._get_pdf_content(file_bytes, budget)
             elif extension in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff"]:
                 return self._get_image_content(file_bytes)
             else:
                 # Fallback: try to decode as text
                 try:
-                    return file_bytes.decode("utf-8", errors="ignore")
+                    return self._get_text_content(file_bytes, budget)
                 except Exception:
                     return "[Unsupported file type]"
         except Exception as e:
             logger.error(f"Error extracting content from {file_path}: {e}")
             return f"[Error extracting content: {str(e)}]"
 
-    def _get_xlsx_content(self, file_bytes: bytes) -> str:
-        """Extracts content from an XLSX file."""
-        workbook = openpyxl.load_workbook(BytesIO(file_bytes))
+    def _resolve_budget(self, max_chars: Optional[int], max_tokens: Optional[int]) -> Optional[int]:
+        """Character budget for one call: explicit chars > tokens > instance default."""
+        if max_chars is not None:
+            return max_chars
+        if max_tokens is not None:
+            return max_tokens * CHARS_PER_TOKEN
+        return self.max_chars
+
+    def _get_text_content(self, file_bytes: FileSource, budget: Optional[int] = None) -> str:
+        """
+        Decodes a text file. Streams (e.g. ranged Drive readers) are read
+        incrementally and reading stops once the budget is reached,
+        so only the needed bytes are fetched.
+        """
+        if budget is None or isinstance(file_bytes, (bytes, bytearray, memoryview)):
+            return _as_bytes(file_bytes).decode("utf-8", errors="ignore")
+
+        stream = _as_stream(file_bytes)
+        chunks = []
+        read_size = self.text_read_bytes
+        while True:
+            chunk = stream.read(read_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            text = b"".join(chunks).decode("utf-8", errors="ignore")
+            if len(text.strip()) >= budget:
+                return text
+            # Not enough text yet (binary noise, long headers): ask for more
+            read_size *= 2
+        return b"".join(chunks).decode("utf-8", errors="ignore")
+
+    def _get_xlsx_content(self, file_bytes: FileSource, budget: Optional[int] = None) -> str:
+        """Extracts content from an XLSX file, stopping once the budget is met."""
+        workbook = openpyxl.load_workbook(_as_stream(file_bytes), read_only=True, data_only=True)
         text = []
-        for sheet in workbook.worksheets:
-            for row in sheet.iter_rows():
-                for cell in row:
-                    if cell.value:
-                        text.append(str(cell.value))
-        return "\\n".join(text)
-
-    def _get_docx_content(self, file_bytes: bytes) -> str:
-        """Extracts content from a DOCX file."""
-        doc = docx.Document(BytesIO(file_bytes))
+        length = 0
+        try:
+            for sheet in workbook.worksheets:
+                for row in sheet.iter_rows():
+                    for cell in row:
+                        if cell.value:
+                            value = str(cell.value)
+                            text.append(value)
+                            length += len(value) + 1
+                    if budget is not None and length >= budget:
+                        return "\n".join(text)
+        finally:
+            workbook.close()
+        return "\n".join(text)
+
+    def _get_docx_content(self, file_bytes: FileSource, budget: Optional[int] = None) -> str:
+        """Extracts content from a DOCX file, stopping once the budget is met."""
+        doc = docx.Document(_as_stream(file_bytes))
         text = []
+        length = 0
         for para in doc.paragraphs:
             text.append(para.text)
-        return "\\n".join(text)
+            length += len(para.text) + 1
+            if budget is not None and length >= budget:
+                break
+        return "\n".join(text)
 
-    def _get_pdf_content(self, file_bytes: bytes) -> str:
+    def _get_pdf_content(self, file_bytes: FileSource, budget: Optional[int] = None) -> str:
         """
-        Extracts content from a PDF file.
+        Extracts content from a PDF file, stopping at the page where the budget is met.
         First tries text extraction. If insufficient text is found, uses OCR.
         """
         # Try text extraction first
         try:
-            reader = PdfReader(BytesIO(file_bytes))
-            text = []
-            for page in reader.pages:
-                page_text = page.extract_text() or ""
-                text.append(page_text)
+            reader = PdfReader(_as_stream(file_bytes))
+            total_pages = len(reader.pages)
+            if self.page_pool is not None and total_pages >= self.parallel_min_pages:
+                text = self._extract_pages_parallel(file_bytes, total_pages, budget)
+            else:
+                text = []
+                length = 0
+                for page in reader.pages:
+                    page_text = page.extract_text() or ""
+                    text.append(page_text)
+                    length += len(page_text.strip())
+                    if budget is not None and length >= budget:
+                        break
+            if len(text) < total_pages:
+                logger.debug(f"PDF budget of {budget} chars met after {len(text)}/{total_pages} pages")
             
-            combined_text = "\\n".join(text)
+            combined_text = "\n".join(text)
             
             # Check if we got enough text
             if len(combined_text.strip()) >= self.min_text_threshold:
@@ -142,7 +308,7 @@ class ContentExtractor:
             # If insufficient text and OCR is enabled, try OCR
             if self.enable_ocr and self.vision_client:
                 logger.info("PDF appears to be scanned. Attempting OCR...")
-                return self._ocr_pdf(file_bytes)
+                return self._ocr_pdf(file_bytes, budget, total_pages)
             else:
                 logger.warning("Insufficient text extracted from PDF and OCR is disabled")
                 return combined_text
@@ -151,7 +317,58 @@ class ContentExtractor:
             logger.error(f"Error extracting PDF content: {e}")
             return "[Error extracting PDF content]"
 
-    def _get_image_content(self, file_bytes: bytes) -> str:
+    def _extract_pages_parallel(self, file_bytes: FileSource, total_pages: int, budget: Optional[int]) -> List[str]:
+        """
+        Extracts PDF text by page ranges in the shared process pool, in page order.
+        Extrae el texto del PDF por rangos de páginas en el pool de procesos.
+
+        Workers read the PDF from disk: a buffer that spilled over is used in
+        place, otherwise it is written once to a temp file. One range is in
+        flight at first; the window widens (up to ``page_workers``) only while
+        the text read so far, plus what the ranges in flight are expected to
+        add, stays under the budget, so small budgets don't occupy the pool.
+        """
+        pdf_path = _disk_path(file_bytes)
+        temp_path = None
+        if pdf_path is None:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+                shutil.copyfileobj(_as_stream(file_bytes), temp_file)
+            pdf_path = temp_path = temp_file.name
+        ranges = [
+            (start, min(start + self.pages_per_task, total_pages))
+            for start in range(0, total_pages, self.pages_per_task)
+        ]
+        window = 1
+        pending = []
+        text: List[str] = []
+        length = 0
+        done = 0
+        next_range = 0
+        try:
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < window:
+                    start, stop = ranges[next_range]
+                    pending.append(self.page_pool.submit(extract_pdf_pages, pdf_path, start, stop))
+                    next_range += 1
+                # Ranges are consumed in submission order: page order is preserved
+                for page_text in pending.pop(0).result():
+                    text.append(page_text)
+                    length += len(page_text.strip())
+                    if budget is not None and length >= budget:
+                        return text
+                done += 1
+                expected = length + length / done * len(pending)
+                if window < self.page_workers and (budget is None or expected < budget):
+                    window += 1
+        finally:
+            for future in pending:
+                future.cancel()
+            if temp_path is not None:
+                # A range still running may fail to open it; its result is discarded
+                os.unlink(temp_path)
+        return text
+
+    def _get_image_content(self, file_bytes: FileSource) -> str:
         """
         Extracts text from image files using OCR.
         Extrae texto de archivos de imagen usando OCR.
@@ -161,34 +378,66 @@ class ContentExtractor:
             return "[OCR disabled - image content not extracted]"
         
         try:
-            return self._ocr_image_bytes(file_bytes)
+            return self._ocr_image_bytes(_as_bytes(file_bytes))
         except Exception as e:
             logger.error(f"Error extracting image content: {e}")
             return f"[Error extracting image content: {str(e)}]"
 
-    def _ocr_pdf(self, pdf_bytes: bytes) -> str:
+    def _ocr_pdf(
+        self,
+        pdf_bytes: FileSource,
+        budget: Optional[int] = None,
+        total_pages: Optional[int] = None
+    ) -> str:
         """
-        Converts PDF pages to images and performs OCR.
-        Convierte páginas PDF a imágenes y realiza OCR.
+        Converts PDF pages to images and performs OCR, one page at a time.
+        Only the first ``ocr_max_pages`` pages are rasterized, and OCR stops
+        as soon as the character budget is met.
+        Convierte páginas PDF a imágenes y realiza OCR, página por página,
+        hasta ``ocr_max_pages`` o hasta cubrir el presupuesto.
         """
         try:
-            # Convert PDF to images
-            images = convert_from_bytes(pdf_bytes, dpi=200, fmt="png")
-            logger.info(f"Converted PDF to {len(images)} images for OCR")
-            
+            last_page = total_pages
+            if self.ocr_max_pages is not None:
+                last_page = min(total_pages or self.ocr_max_pages, self.ocr_max_pages)
+
+            # Read straight from disk if the buffer spilled over
+            pdf_path = _disk_path(pdf_bytes)
+            if not pdf_path:
+                pdf_data = _as_bytes(pdf_bytes)
+
             texts = []
-            for i, image in enumerate(images):
+            length = 0
+            page_number = 1
+            while last_page is None or page_number <= last_page:
+                # Rasterize a single page so pages past the budget are never rendered
+                if pdf_path:
+                    images = convert_from_path(
+                        pdf_path, dpi=200, fmt="png", first_page=page_number, last_page=page_number
+                    )
+                else:
+                    images = convert_from_bytes(
+                        pdf_data, dpi=200, fmt="png", first_page=page_number, last_page=page_number
+                    )
+                if not images:
+                    break
+
                 # Convert PIL Image to bytes
                 img_byte_arr = BytesIO()
-                image.save(img_byte_arr, format="PNG")
+                images[0].save(img_byte_arr, format="PNG")
                 img_bytes = img_byte_arr.getvalue()
                 
                 # Perform OCR
                 page_text = self._ocr_image_bytes(img_bytes)
                 texts.append(page_text)
-                logger.debug(f"OCR completed for page {i+1}/{len(images)}")
-            
-            return "\\n".join(texts)
+                length += len(page_text.strip())
+                logger.debug(f"OCR completed for page {page_number}/{last_page or '?'}")
+                if budget is not None and length >= budget:
+                    break
+                page_number += 1
+
+            logger.info(f"OCR used {len(texts)} page(s) of {total_pages or '?'}")
+            return "\n".join(texts)
         
         except Exception as e:
             logger.error(f"Error performing OCR on PDF: {e}")
@@ -223,7 +472,7 @@ class ContentExtractor:
             raise
 
     def get_content_with_confidence(
-        self, file_path: str, file_bytes: bytes
+        self, file_path: str, file_bytes: FileSource
     ) -> Tuple[str, Optional[float]]:
         """
         Extrae contenido y devuelve también un índice de confianza (para OCR).
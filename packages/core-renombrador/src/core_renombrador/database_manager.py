@@ -8,7 +8,7 @@ Provides unified interface for data persistence using:
 - Supabase (production SQL)
 
 :created:   2025-12-05
-:updated:   2025-12-19
+:updated:   2026-10-17
 :filename:  database_manager.py
 :author:    amBotHs + CENF
 :version:   2.1.0
@@ -20,13 +20,17 @@ Provides unified interface for data persistence using:
 import json
 import logging
 import os
+import threading
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from .file_manager import FileManager
 
 logger = logging.getLogger(__name__)
 
+# Read-modify-write attempts when another instance updates the GCS blob first
+GCS_WRITE_ATTEMPTS = 5
+
 
 class DatabaseManager:
     """
@@ -65,6 +69,8 @@ class DatabaseManager:
         self.gcs_client = None
         self.bucket = None
         self.file_manager = file_manager
+        self._gcs_cache: Optional[Tuple[int, str]] = None   # (generation, content) of the last read
+        self._gcs_lock = threading.Lock()
 
         # Priority: Supabase > GCS > Local JSON
         if self.use_supabase:
@@ -133,53 +139,97 @@ class DatabaseManager:
 
     # --- Data Loading/Saving Abstractions ---
 
-    def _load_data(self) -> List[Dict[str, Any]]:
-        """Unified data loader for GCS/Local."""
+    def _load_data(self, strict: bool = False) -> List[Dict[str, Any]]:
+        """
+        Unified data loader for GCS/Local.
+        With ``strict`` a failed read raises instead of returning no records.
+        """
         if self.use_gcs:
-            return self._load_gcs_data()
-        return self._load_json_data()
+            return self._load_gcs_data(strict)
+        return self._load_json_data(strict)
 
-    def _save_data(self, data: List[Dict[str, Any]]) -> None:
-        """Unified data saver for GCS/Local."""
-        if self.use_gcs:
-            self._save_gcs_data(data)
-        else:
-            self._save_json_data(data)
+    def _modify_data(self, change: Callable[[List[Dict[str, Any]]], Tuple[Any, bool]]) -> Any:
+        """
+        Applies ``change`` to the stored records and saves them (GCS/Local).
+        Aplica ``change`` a los registros guardados y los escribe.
+
+        ``change`` edits the list in place and returns ``(result, changed)``.
+        Nothing is saved after a failed read, so a read error can never
+        replace the stored records with the current batch. In GCS mode the
+        upload only succeeds if the blob is still the generation that was
+        read; otherwise the change is applied again on the newer version.
+        """
+        if not self.use_gcs:
+            data = self._load_json_data(strict=True)
+            result, changed = change(data)
+            if changed:
+                self._save_json_data(data)
+            return result
 
-    def _load_gcs_data(self) -> List[Dict[str, Any]]:
+        for attempt in range(GCS_WRITE_ATTEMPTS):
+            data, generation = self._read_gcs()
+            result, changed = change(data)
+            if not changed:
+                return result
+            content = json.dumps(data, indent=2)
+            blob = self.bucket.blob(self.blob_name)
+            try:
+                # generation 0: the blob must not exist yet
+                blob.upload_from_string(content, content_type='application/json', if_generation_match=generation)
+            except Exception as e:
+                if getattr(e, "code", None) == 412 and attempt + 1 < GCS_WRITE_ATTEMPTS:
+                    logger.info(f"gs://{self.bucket_name}/{self.blob_name} changed while writing; retrying")
+                    continue
+                logger.error(f"Failed to save data to GCS: {e}")
+                raise
+            with self._gcs_lock:
+                self._gcs_cache = (blob.generation, content)
+            logger.debug(f"Saved {len(data)} records to gs://{self.bucket_name}/{self.blob_name}")
+            return result
+
+    def _read_gcs(self) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Records of the GCS blob and its generation (0 if the blob does not exist).
+        Registros del blob de GCS y su generación. Raises on failure.
+
+        Only the blob metadata is fetched when the generation is unchanged
+        since the last read; the content is downloaded again otherwise.
+        """
+        blob = self.bucket.get_blob(self.blob_name)
+        if blob is None:
+            return [], 0
+        with self._gcs_lock:
+            cached = self._gcs_cache
+        if cached is None or cached[0] != blob.generation:
+            cached = (blob.generation, blob.download_as_text(if_generation_match=blob.generation))
+            with self._gcs_lock:
+                self._gcs_cache = cached
+        data = json.loads(cached[1])
+        if not isinstance(data, list):
+            raise ValueError(f"gs://{self.bucket_name}/{self.blob_name} does not hold a list of records")
+        return data, cached[0]
+
+    def _load_gcs_data(self, strict: bool = False) -> List[Dict[str, Any]]:
         """Loads JSON from GCS blob."""
         try:
-            blob = self.bucket.blob(self.blob_name)
-            if not blob.exists():
-                logger.info(f"GCS blob {self.blob_name} does not exist. Creating empty.")
-                self._save_gcs_data([])
-                return []
-            
-            content = blob.download_as_text()
-            return json.loads(content)
+            return self._read_gcs()[0]
         except Exception as e:
             logger.error(f"Failed to load data from GCS: {e}")
+            if strict:
+                raise
             return []
 
-    def _save_gcs_data(self, data: List[Dict[str, Any]]) -> None:
-        """Saves JSON to GCS blob."""
-        try:
-            blob = self.bucket.blob(self.blob_name)
-            blob.upload_from_string(json.dumps(data, indent=2), content_type='application/json')
-            logger.debug(f"Saved {len(data)} records to gs://{self.bucket_name}/{self.blob_name}")
-        except Exception as e:
-            logger.error(f"Failed to save data to GCS: {e}")
-            raise
-
-    def _load_json_data(self) -> List[Dict[str, Any]]:
+    def _load_json_data(self, strict: bool = False) -> List[Dict[str, Any]]:
         """Loads data from local JSON file."""
         try:
             data = self.file_manager.read_json_file(self.db_path)
             if not isinstance(data, list):
-                return []
+                raise ValueError(f"{self.db_path} does not hold a list of records")
             return data
         except Exception as e:
             logger.error(f"Failed to load local JSON data: {e}")
+            if strict:
+                raise
             return []
 
     def _save_json_data(self, data: List[Dict[str, Any]]) -> None:
@@ -201,11 +251,54 @@ class DatabaseManager:
                 logger.error(f"Supabase insert failed: {e}")
                 raise
         else:
-            data = self._load_data()
-            data.append(record)
-            self._save_data(data)
+            self._modify_data(lambda data: (data.append(record), True))
             logger.debug(f"Inserted record into {'GCS' if self.use_gcs else 'Local JSON'}")
 
+    def insert_many(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Inserts several records with a single write (one GCS upload / one Supabase call).
+        Inserta varios registros con una sola escritura.
+        """
+        if not records:
+            return
+        if self.use_supabase:
+            try:
+                self.supabase_client.table(self.table_name).insert(records).execute()
+                logger.debug(f"Inserted {len(records)} records into Supabase table '{self.table_name}'")
+            except Exception as e:
+                logger.error(f"Supabase bulk insert failed: {e}")
+                raise
+        else:
+            self._modify_data(lambda data: (data.extend(records), True))
+            logger.debug(f"Inserted {len(records)} records into {'GCS' if self.use_gcs else 'Local JSON'}")
+
+    def upsert_many(self, records: List[Dict[str, Any]], key: str) -> None:
+        """
+        Inserts or replaces several records identified by ``key`` with a single write.
+        Inserta o reemplaza varios registros identificados por ``key`` en una sola escritura.
+        """
+        if not records:
+            return
+        # The last record of a duplicated key wins (one write cannot carry both)
+        unique = list({record[key]: record for record in records}.values())
+        if self.use_supabase:
+            try:
+                self.supabase_client.table(self.table_name).upsert(unique, on_conflict=key).execute()
+                logger.debug(f"Upserted {len(unique)} records into Supabase table '{self.table_name}'")
+            except Exception as e:
+                logger.error(f"Supabase bulk upsert failed: {e}")
+                raise
+        else:
+            incoming = {record[key]: record for record in unique}
+
+            def replace(data):
+                data[:] = [item for item in data if item.get(key) not in incoming]
+                data.extend(unique)
+                return None, True
+
+            self._modify_data(replace)
+            logger.debug(f"Upserted {len(unique)} records into {'GCS' if self.use_gcs else 'Local JSON'}")
+
     def find_all(self) -> List[Dict[str, Any]]:
         if self.use_supabase:
             try:
@@ -229,6 +322,30 @@ class DatabaseManager:
             data = self._load_data()
             return [item for item in data if item.get(key) == value]
 
+    def find_in(self, key: str, values: List[Any], chunk_size: int = 200) -> List[Dict[str, Any]]:
+        """
+        Returns every record whose ``key`` is one of ``values`` (bulk lookup).
+        Devuelve los registros cuyo ``key`` está en ``values`` (búsqueda masiva).
+
+        Raises on a read error instead of returning a partial result.
+        """
+        if not values:
+            return []
+        if self.use_supabase:
+            results = []
+            try:
+                for start in range(0, len(values), chunk_size):
+                    chunk = values[start:start + chunk_size]
+                    result = self.supabase_client.table(self.table_name).select("*").in_(key, chunk).execute()
+                    results.extend(result.data or [])
+            except Exception as e:
+                logger.error(f"Supabase find_in failed: {e}")
+                raise
+            return results
+        else:
+            wanted = set(values)
+            return [item for item in self._load_data(strict=True) if item.get(key) in wanted]
+
     def update(self, filter_key: str, filter_value: Any, updates: Dict[str, Any]) -> int:
         if self.use_supabase:
             try:
@@ -238,15 +355,15 @@ class DatabaseManager:
                 logger.error(f"Supabase update failed: {e}")
                 return 0
         else:
-            data = self._load_data()
-            count = 0
-            for item in data:
-                if item.get(filter_key) == filter_value:
-                    item.update(updates)
-                    count += 1
-            if count > 0:
-                self._save_data(data)
-            return count
+            def apply(data):
+                count = 0
+                for item in data:
+                    if item.get(filter_key) == filter_value:
+                        item.update(updates)
+                        count += 1
+                return count, count > 0
+
+            return self._modify_data(apply)
 
     def delete(self, key: str, value: Any) -> int:
         if self.use_supabase:
@@ -257,10 +374,56 @@ class DatabaseManager:
                 logger.error(f"Supabase delete failed: {e}")
                 return 0
         else:
-            data = self._load_data()
-            original_count = len(data)
-            data = [item for item in data if item.get(key) != value]
-            deleted_count = original_count - len(data)
-            if deleted_count > 0:
-                self._save_data(data)
-            return deleted_count
+            def remove(data):
+                original_count = len(data)
+                data[:] = [item for item in data if item.get(key) != value]
+                deleted_count = original_count - len(data)
+                return deleted_count, deleted_count > 0
+
+            return self._modify_data(remove)
+
+    # --- Processed-file ledger ---
+
+    @staticmethod
+    def ledger_key(
+        file_id: str,
+        modified_time: Optional[str],
+        md5: Optional[str],
+        job_id: Optional[str] = None,
+        config_hash: Optional[str] = None
+    ) -> str:
+        """
+        Identity of one version of a Drive file, as processed by one job configuration.
+        Identidad de una versión de un archivo de Drive procesada por una configuración de job.
+
+        Scoped by ``job_id`` and ``config_hash``: another job over the same
+        folder, or the same job after its prompt or filename format changed,
+        processes the file again.
+        """
+        return f"{job_id or ''}:{config_hash or ''}:{file_id}:{modified_time or ''}:{md5 or ''}"
+
+    def get_processed_keys(self, keys: List[str]) -> set:
+        """
+        Returns the subset of ``keys`` already recorded in the ledger.
+        Devuelve el subconjunto de ``keys`` ya registrado en el ledger.
+        """
+        return {record.get("ledger_key") for record in self.find_in("ledger_key", list(keys))}
+
+    def record_processed(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        Records successfully renamed files in the ledger.
+        Registra en el ledger los archivos renombrados con éxito.
+
+        Each entry needs ``file_id``, ``modified_time``, ``md5``, ``job_id`` and
+        ``config_hash``; any other field (new_name...) is stored as-is.
+        Entries already recorded (overlapping shard or manual runs) are replaced.
+        """
+        records = []
+        for entry in entries:
+            record = dict(entry)
+            record["ledger_key"] = self.ledger_key(
+                entry.get("file_id"), entry.get("modified_time"), entry.get("md5"),
+                entry.get("job_id"), entry.get("config_hash")
+            )
+            records.append(record)
+        self.upsert_many(records, key="ledger_key")
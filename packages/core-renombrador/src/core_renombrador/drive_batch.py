@@ -0,0 +1,265 @@
+"""
+Drive Batch - Lecturas de metadata y renombrados en lote
+========================================================
+
+Coalesces Drive ``files().get`` and ``files().update`` calls into batch HTTP
+requests (up to 100 sub-requests per call, the Drive batch limit). Per-item
+errors are reported individually; rate-limit and server errors are retried
+with exponential backoff. Renames whose new name equals the current name are
+skipped without any request.
+Agrupa lecturas de metadata y renombrados de Drive en requests batch,
+reintentando los errores transitorios de cada item.
+
+:created:   2026-10-17
+:filename:  drive_batch.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+# Drive accepts at most 100 calls per batch request
+MAX_BATCH_SIZE = 100
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_403_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    True for Drive errors worth retrying (rate limits and server errors).
+    True para errores de Drive que vale la pena reintentar.
+    """
+    if not isinstance(error, HttpError):
+        return False
+    status = getattr(error.resp, "status", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    if status == 403:
+        try:
+            content = json.loads(error.content.decode("utf-8"))
+            reasons = {e.get("reason") for e in content.get("error", {}).get("errors", [])}
+            return bool(reasons & RETRYABLE_403_REASONS)
+        except Exception:
+            return False
+    return False
+
+
+class DriveBatcher:
+    """
+    Executes Drive requests in batches of up to 100 with per-item retries.
+    Ejecuta requests de Drive en lotes de hasta 100 con reintentos por item.
+
+    Not thread-safe: use one DriveBatcher per Drive service / thread.
+    """
+
+    def __init__(
+        self,
+        drive_service,
+        batch_size: int = MAX_BATCH_SIZE,
+        max_retries: int = 4,
+        base_delay: float = 1.0
+    ):
+        """
+        Initialize DriveBatcher.
+
+        Args:
+            drive_service: Drive v3 service.
+            batch_size: Sub-requests per batch call (max 100).
+            max_retries: Retries for retryable per-item errors.
+            base_delay: Initial backoff delay in seconds (doubles per retry).
+        """
+        self.drive_service = drive_service
+        self.batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+    def execute(
+        self,
+        request_factories: Dict[str, Callable[[], Any]]
+    ) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """
+        Runs every request in batches, retrying retryable per-item failures.
+        Ejecuta todas las requests en lotes, reintentando los fallos transitorios.
+
+        Args:
+            request_factories: ``{key: callable returning an HttpRequest}``.
+                               A factory is used so retries get a fresh request.
+
+        Returns:
+            Tuple ``(results, errors)`` keyed like ``request_factories``.
+        """
+        results: Dict[str, Any] = {}
+        errors: Dict[str, Exception] = {}
+        pending = list(request_factories.keys())
+        attempt = 0
+
+        while pending:
+            retry = []
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                chunk_results, chunk_errors = self._execute_chunk(chunk, request_factories)
+                results.update(chunk_results)
+                for key, error in chunk_errors.items():
+                    if attempt < self.max_retries and is_retryable_error(error):
+                        retry.append(key)
+                    else:
+                        errors[key] = error
+
+            if not retry:
+                break
+            attempt += 1
+            delay = self.base_delay * (2 ** (attempt - 1)) + random.uniform(0, self.base_delay)
+            logger.warning(f"Retrying {len(retry)} Drive batch items in {delay:.1f}s (attempt {attempt})")
+            time.sleep(delay)
+            pending = retry
+
+        return results, errors
+
+    def _execute_chunk(
+        self,
+        keys: List[str],
+        request_factories: Dict[str, Callable[[], Any]]
+    ) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        results: Dict[str, Any] = {}
+        errors: Dict[str, Exception] = {}
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                results[request_id] = response
+
+        batch = self.drive_service.new_batch_http_request(callback=callback)
+        for key in keys:
+            batch.add(request_factories[key](), request_id=key)
+
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole batch call failed (network, auth...): every item gets the error
+            logger.error(f"Drive batch request failed: {e}")
+            for key in keys:
+                if key not in results and key not in errors:
+                    errors[key] = e
+
+        return results, errors
+
+    def get_metadata(
+        self,
+        file_ids: Iterable[str],
+        fields: str = "id, name, mimeType"
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        """
+        Fetches metadata for many files with batched ``files().get`` calls.
+        Obtiene la metadata de muchos archivos con llamadas ``files().get`` en lote.
+        """
+        factories = {}
+        for file_id in dict.fromkeys(file_ids):
+            factories[file_id] = (
+                lambda file_id=file_id: self.drive_service.files().get(
+                    fileId=file_id, fields=fields, supportsAllDrives=True
+                )
+            )
+        return self.execute(factories)
+
+    def rename(
+        self,
+        renames: Iterable[Dict[str, Any]],
+        fields: str = "id, name"
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception], List[str]]:
+        """
+        Renames many files with batched ``files().update`` calls.
+        Renombra muchos archivos con llamadas ``files().update`` en lote.
+
+        Args:
+            renames: Dicts with ``file_id``, ``new_name`` and optionally
+                     ``current_name`` (used to skip no-op renames).
+            fields: Field mask of the updated file returned per item.
+
+        Returns:
+            Tuple ``(results, errors, skipped_ids)``.
+        """
+        factories = {}
+        skipped = []
+        for rename in renames:
+            file_id = rename["file_id"]
+            new_name = rename["new_name"]
+            if rename.get("current_name") == new_name:
+                skipped.append(file_id)
+                continue
+            factories[file_id] = (
+                lambda file_id=file_id, new_name=new_name: self.drive_service.files().update(
+                    fileId=file_id, body={"name": new_name}, fields=fields, supportsAllDrives=True
+                )
+            )
+        results, errors = self.execute(factories)
+        return results, errors, skipped
+
+
+class BatchedRenamer:
+    """
+    Thread-safe rename buffer that flushes through DriveBatcher every ``batch_size`` items.
+    Buffer de renombrados thread-safe que se vacía en lotes vía DriveBatcher.
+
+    ``on_result(entry, updated_metadata, error)`` is called once per entry:
+    ``updated_metadata`` is None when the rename was skipped or failed.
+    """
+
+    def __init__(
+        self,
+        drive_service_factory: Callable[[], Any],
+        on_result: Callable[[Dict[str, Any], Optional[Dict[str, Any]], Optional[Exception]], None],
+        batch_size: int = MAX_BATCH_SIZE,
+        fields: str = "id, name"
+    ):
+        self.drive_service_factory = drive_service_factory
+        self.on_result = on_result
+        self.batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+        self.fields = fields
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        """
+        Queues a rename (``file_id``, ``new_name``, ``current_name`` + any context).
+        Encola un renombrado.
+        """
+        with self._lock:
+            self._pending.append(entry)
+            if len(self._pending) < self.batch_size:
+                return
+            ready, self._pending = self._pending, []
+        self._apply(ready)
+
+    def flush(self) -> None:
+        """
+        Applies every queued rename.
+        Aplica todos los renombrados pendientes.
+        """
+        with self._lock:
+            ready, self._pending = self._pending, []
+        if ready:
+            self._apply(ready)
+
+    def _apply(self, entries: List[Dict[str, Any]]) -> None:
+        batcher = DriveBatcher(self.drive_service_factory(), batch_size=self.batch_size)
+        results, errors, skipped = batcher.rename(entries, fields=self.fields)
+        logger.info(
+            f"Batch rename: {len(results)} renamed, {len(skipped)} unchanged, {len(errors)} failed"
+        )
+        for entry in entries:
+            file_id = entry["file_id"]
+            self.on_result(entry, results.get(file_id), errors.get(file_id))
@@ -0,0 +1,346 @@
+"""
+Drive Download - Descargas acotadas en memoria
+==============================================
+
+Streams Drive file content into a ``NamedSpooledTemporaryFile``: small files
+stay in memory, larger ones spill to a named temp file once ``max_memory`` is
+exceeded (its ``path`` lets pdf2image and the PDF page pool read it in
+place), and files above ``max_size`` are rejected. The returned buffer is handed to
+``ContentExtractor.get_content`` as a file-like object, so the content is
+never copied into intermediate ``bytes`` objects.
+Descarga contenido de Drive en un buffer spooled, acotado en memoria, que se
+entrega al extractor sin copias adicionales.
+
+Ranged downloads (HTTP ``Range`` on ``get_media``) are also supported:
+``RangedDriveReader`` fetches only the byte ranges the extractor reads, and
+``download_parallel_ranges`` fetches large files as concurrent chunks.
+Descargas parciales por rangos: solo se bajan los bytes que el extractor lee.
+
+Native Google Workspace files (Docs/Sheets/Slides) cannot be fetched with
+``get_media``; ``export_to_spool`` exports them to plain text or CSV instead.
+Los archivos nativos de Google se exportan a texto plano o CSV.
+
+:created:   2026-10-17
+:filename:  drive_download.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import io
+import logging
+import tempfile
+import threading
+from concurrent.futures import Executor
+from typing import IO, Any, Callable, Dict, Optional, Tuple
+
+from googleapiclient.http import MediaIoBaseDownload
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# MediaIoBaseDownload defaults to 100 MB chunks; keep chunks small on 512 MiB instances
+DEFAULT_CHUNK_SIZE = 8 * MB
+DEFAULT_SPOOL_MEMORY = 16 * MB
+DEFAULT_MAX_SIZE = 200 * MB
+
+# Ranged reads: first range covers well over the prompt budget for plain text
+DEFAULT_RANGE_BLOCK = 64 * 1024
+DEFAULT_PARALLEL_CHUNK = 8 * MB
+
+
+GOOGLE_APPS_PREFIX = "application/vnd.google-apps."
+
+# Native Google Workspace mimeType -> (export mimeType, extension for the extractor)
+EXPORT_FORMATS = {
+    "application/vnd.google-apps.document": ("text/plain", ".txt"),
+    "application/vnd.google-apps.spreadsheet": ("text/csv", ".csv"),
+    "application/vnd.google-apps.presentation": ("text/plain", ".txt"),
+}
+
+
+def is_google_native(mime_type: Optional[str]) -> bool:
+    """True for native Google Workspace files (Docs, Sheets, folders, forms...)."""
+    return bool(mime_type) and mime_type.startswith(GOOGLE_APPS_PREFIX)
+
+
+def is_exportable(mime_type: Optional[str]) -> bool:
+    """True for native files that can be exported to text/CSV."""
+    return mime_type in EXPORT_FORMATS
+
+
+class NamedSpooledTemporaryFile(tempfile.SpooledTemporaryFile):
+    """
+    SpooledTemporaryFile that rolls over to a *named* temp file (binary mode).
+    Buffer spooled que al pasar a disco usa un archivo temporal con nombre.
+
+    The stock class spills into an unnamed ``TemporaryFile`` (only an fd on
+    Linux), so consumers that need a path had to copy the content again.
+    """
+
+    def rollover(self):
+        if self._rolled:
+            return
+        memory = self._file
+        spill = tempfile.NamedTemporaryFile(**self._TemporaryFileArgs)
+        del self._TemporaryFileArgs
+
+        position = memory.tell()
+        spill.write(memory.getvalue())
+        spill.seek(position, 0)
+        self._file = spill
+        self._rolled = True
+
+    @property
+    def path(self) -> Optional[str]:
+        """Path of the spill file (flushed), or None while the content is in memory."""
+        if not self._rolled:
+            return None
+        self._file.flush()
+        return self._file.name
+
+
+class DownloadTooLargeError(Exception):
+    """Raised when a file exceeds the configured download size cap."""
+
+
+def download_to_spool(
+    drive_service,
+    file_id: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_memory: int = DEFAULT_SPOOL_MEMORY,
+    max_size: Optional[int] = DEFAULT_MAX_SIZE,
+    expected_size: Optional[int] = None
+) -> IO[bytes]:
+    """
+    Downloads a Drive file into a spooled buffer positioned at offset 0.
+    Descarga un archivo de Drive en un buffer spooled posicionado en 0.
+
+    Args:
+        drive_service: Drive v3 service.
+        file_id: Drive file ID.
+        chunk_size: Bytes requested per HTTP chunk.
+        max_memory: Bytes kept in memory before spilling to a temp file.
+        max_size: Hard cap in bytes (None = unlimited).
+        expected_size: File size from the listing, to fail before downloading.
+
+    Returns:
+        NamedSpooledTemporaryFile; the caller must close it.
+
+    Raises:
+        DownloadTooLargeError: If the file exceeds ``max_size``.
+    """
+    if max_size and expected_size and int(expected_size) > max_size:
+        raise DownloadTooLargeError(
+            f"File {file_id} is {int(expected_size) // MB} MB, above the {max_size // MB} MB cap"
+        )
+
+    buffer = NamedSpooledTemporaryFile(max_size=max_memory)
+    try:
+        request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
+        downloader = MediaIoBaseDownload(buffer, request, chunksize=chunk_size)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+            if max_size and buffer.tell() > max_size:
+                raise DownloadTooLargeError(f"File {file_id} exceeded the {max_size // MB} MB download cap")
+    except Exception:
+        buffer.close()
+        raise
+
+    buffer.seek(0)
+    return buffer
+
+
+def export_to_spool(
+    drive_service,
+    file_id: str,
+    mime_type: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_memory: int = DEFAULT_SPOOL_MEMORY
+) -> Tuple[IO[bytes], str]:
+    """
+    Exports a native Google Docs/Sheets/Slides file to text/CSV in a spooled buffer.
+    Exporta un archivo nativo de Google a texto/CSV en un buffer spooled.
+
+    Returns:
+        Tuple ``(buffer, extension)``: the extension (``.txt``/``.csv``) tells
+        ContentExtractor how to read the exported content.
+
+    Raises:
+        ValueError: If ``mime_type`` has no export format.
+    """
+    if mime_type not in EXPORT_FORMATS:
+        raise ValueError(f"No text export available for {mime_type}")
+    export_mime_type, extension = EXPORT_FORMATS[mime_type]
+
+    buffer = NamedSpooledTemporaryFile(max_size=max_memory)
+    try:
+        request = drive_service.files().export_media(fileId=file_id, mimeType=export_mime_type)
+        downloader = MediaIoBaseDownload(buffer, request, chunksize=chunk_size)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+    except Exception:
+        buffer.close()
+        raise
+
+    buffer.seek(0)
+    return buffer, extension
+
+
+def download_range(drive_service, file_id: str, start: int, end: int) -> bytes:
+    """
+    Downloads bytes ``start..end`` (inclusive) of a Drive file.
+    Descarga los bytes ``start..end`` (inclusive) de un archivo de Drive.
+    """
+    request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
+    request.headers["Range"] = f"bytes={start}-{end}"
+    return request.execute()
+
+
+class RangedDriveReader(io.RawIOBase):
+    """
+    Read-only, seekable file-like over a Drive file that fetches byte ranges on demand.
+    File-like de solo lectura que descarga rangos de bytes a medida que se leen.
+
+    Fetched blocks are kept, so re-reading the start is free. The Drive
+    service is obtained through ``drive_service_factory`` at fetch time, so
+    the reader can be created in one pipeline thread and read in another.
+    """
+
+    def __init__(
+        self,
+        drive_service_factory: Callable[[], Any],
+        file_id: str,
+        size: int,
+        block_size: int = DEFAULT_RANGE_BLOCK
+    ):
+        super().__init__()
+        self.drive_service_factory = drive_service_factory
+        self.file_id = file_id
+        self.size = int(size)
+        self.block_size = max(1, int(block_size))
+        self.bytes_fetched = 0
+        self._blocks: Dict[int, bytes] = {}
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self.size + offset
+        self._position = max(0, self._position)
+        return self._position
+
+    def prefetch(self, length: Optional[int] = None) -> None:
+        """
+        Fetches the first ``length`` bytes (default: one block) ahead of reading.
+        Descarga por adelantado los primeros ``length`` bytes.
+        """
+        self._ensure_range(0, min(self.size, length or self.block_size))
+
+    def _ensure_range(self, start: int, end: int) -> None:
+        """Fetches every missing block overlapping [start, end) in one request."""
+        if end <= start:
+            return
+        first_block = start // self.block_size
+        last_block = (end - 1) // self.block_size
+        missing = [b for b in range(first_block, last_block + 1) if b not in self._blocks]
+        if not missing:
+            return
+        range_start = missing[0] * self.block_size
+        range_end = min(self.size, (missing[-1] + 1) * self.block_size) - 1
+        data = download_range(self.drive_service_factory(), self.file_id, range_start, range_end)
+        self.bytes_fetched += len(data)
+        for offset in range(0, len(data), self.block_size):
+            self._blocks[(range_start + offset) // self.block_size] = data[offset:offset + self.block_size]
+        logger.debug(f"Ranged read {self.file_id}: bytes {range_start}-{range_end} ({self.bytes_fetched} fetched total)")
+
+    def read(self, size: int = -1) -> bytes:
+        if self._position >= self.size:
+            return b""
+        end = self.size if size is None or size < 0 else min(self.size, self._position + size)
+        self._ensure_range(self._position, end)
+        parts = []
+        position = self._position
+        while position < end:
+            block_index = position // self.block_size
+            block = self._blocks[block_index]
+            offset = position - block_index * self.block_size
+            chunk = block[offset:offset + (end - position)]
+            if not chunk:
+                break
+            parts.append(chunk)
+            position += len(chunk)
+        self._position = position
+        return b"".join(parts)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def download_parallel_ranges(
+    drive_service_factory: Callable[[], Any],
+    file_id: str,
+    size: int,
+    executor: Executor,
+    chunk_size: int = DEFAULT_PARALLEL_CHUNK,
+    max_memory: int = DEFAULT_SPOOL_MEMORY
+) -> IO[bytes]:
+    """
+    Downloads a large file as concurrent ranged chunks into a spooled buffer.
+    Descarga un archivo grande como rangos concurrentes en un buffer spooled.
+
+    Args:
+        drive_service_factory: Returns a Drive service for the calling thread.
+        file_id: Drive file ID.
+        size: File size in bytes (from the listing).
+        executor: Shared executor that runs the chunk downloads.
+        chunk_size: Bytes per ranged request.
+        max_memory: Bytes kept in memory before spilling to a temp file.
+
+    Returns:
+        NamedSpooledTemporaryFile positioned at offset 0; the caller must close it.
+    """
+    size = int(size)
+    buffer = NamedSpooledTemporaryFile(max_size=max_memory)
+    write_lock = threading.Lock()
+    futures = []
+
+    def fetch(start: int) -> None:
+        end = min(size, start + chunk_size) - 1
+        data = download_range(drive_service_factory(), file_id, start, end)
+        with write_lock:
+            buffer.seek(start)
+            buffer.write(data)
+
+    try:
+        futures = [executor.submit(fetch, start) for start in range(0, size, chunk_size)]
+        for future in futures:
+            future.result()
+    except Exception:
+        for future in futures:
+            future.cancel()
+        buffer.close()
+        raise
+
+    logger.debug(f"Downloaded {file_id} in {len(futures)} parallel ranges ({size} bytes)")
+    buffer.seek(0)
+    return buffer
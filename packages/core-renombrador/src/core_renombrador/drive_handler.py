@@ -8,7 +8,11 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
 
 # Importaciones de nuestro paquete core-renombrador
+from .content_budget import DEFAULT_MAX_TOKENS, ContentBudgeter
 from .content_extractor import ContentExtractor
+from .drive_download import download_to_spool, export_to_spool, is_exportable, is_google_native
+from .drive_lister import list_child_folders
+from .quota_governor import QuotaGovernor, governed_http
 from .config_manager import ConfigManager # Importar ConfigManager
 from .logger_manager import LoggerManager # Importar LoggerManager
 
@@ -18,14 +22,23 @@ from google.cloud import storage
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
+from googleapiclient.http import MediaIoBaseUpload
 from bs4 import BeautifulSoup
 
 logger = logging.getLogger(__name__)
 
 class DriveHandler:
-    def __init__(self, credentials, storage_client: storage.Client, config_manager: ConfigManager):
-        self.drive_service = build("drive", "v3", credentials=credentials)
+    def __init__(
+        self,
+        credentials,
+        storage_client: storage.Client,
+        config_manager: ConfigManager,
+        quota_governor: Optional[QuotaGovernor] = None
+    ):
+        # Drive requests share the process-wide quota governor with the worker
+        self.drive_service = build(
+            "drive", "v3", http=governed_http(credentials, quota_governor), cache_discovery=False
+        )
         self.storage_client = storage_client
         self.config_manager = config_manager
         
@@ -49,18 +62,13 @@ class DriveHandler:
             return []
             
         target_folders = set()
-        query = f"trashed=false and mimeType='application/vnd.google-apps.folder'"
         
         def search(folder_id):
             nonlocal target_folders
-            q = f"'{folder_id}' in parents and {query}"
-            logger.debug(f"find_target_folders_recursively - Querying with q: {q}")
+            logger.debug(f"find_target_folders_recursively - Listing subfolders of {folder_id}")
             try:
-                response = self.drive_service.files().list(
-                    q=q, spaces='drive', fields='nextPageToken, files(id, name)', 
-                    supportsAllDrives=True, includeItemsFromAllDrives=True
-                ).execute()
-                for folder in response.get('files', []):
+                # All pages are collected before recursing: the service is not shared across threads
+                for folder in list_child_folders(self.drive_service, folder_id):
                     if folder.get('name') in self.target_folder_names:
                         target_folders.add(folder.get('id'))
                     # Recursivamente buscar en subcarpetas, si no son las carpetas objetivo
@@ -74,25 +82,33 @@ class DriveHandler:
         logger.info(f"Target folders found: {target_folders}")
         return list(target_folders)
 
-    def get_file_content_and_metadata(self, file_id: str) -> tuple[Optional[str], Optional[dict]]:
+    def get_file_content_and_metadata(self, file_id: str, file_metadata: Optional[dict] = None) -> tuple[Optional[str], Optional[dict]]:
         """
         Descarga el contenido de un archivo de Drive y su metadata.
+        Si ya se tiene la metadata (p.ej. de un batch), se omite el files().get.
         """
         try:
-            file_metadata = self.drive_service.files().get(fileId=file_id, fields="id, name, mimeType", supportsAllDrives=True).execute()
+            if file_metadata is None:
+                file_metadata = self.drive_service.files().get(fileId=file_id, fields="id, name, mimeType, size", supportsAllDrives=True).execute()
             
             # Solo descargar si no es una carpeta
             if file_metadata.get('mimeType') == 'application/vnd.google-apps.folder':
                 return None, file_metadata
 
-            request = self.drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
-            file_bytes = BytesIO()
-            downloader = MediaIoBaseDownload(file_bytes, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            
-            file_content = ContentExtractor.get_content(file_metadata['name'], file_bytes.getvalue())
+            mime_type = file_metadata.get('mimeType')
+            if is_google_native(mime_type):
+                if not is_exportable(mime_type):
+                    logger.info(f"Native Google file without text export skipped: {file_metadata.get('name')} ({mime_type})")
+                    return None, file_metadata
+                # Docs/Sheets/Slides se exportan a texto/CSV (get_media falla con archivos nativos)
+                file_buffer, extension = export_to_spool(self.drive_service, file_id, mime_type)
+                extract_name = file_metadata['name'] + extension
+            else:
+                file_buffer = download_to_spool(self.drive_service, file_id, expected_size=file_metadata.get('size'))
+                extract_name = file_metadata['name']
+
+            with file_buffer:
+                file_content = ContentExtractor.get_content(extract_name, file_buffer)
             return file_content, file_metadata
 
         except HttpError as error:
@@ -107,8 +123,11 @@ class DriveHandler:
         prompt_template = prompt_config.get("prompt_template", "")
         json_structure = json.dumps(prompt_config.get("json_structure", {}), indent=4)
         
-        # Limiting content to avoid overly large prompts, especially for binary/encoded content
-        prompt = prompt_template.format(original_filename=original_filename, file_content=file_content[:8000])
+        # Fit the content to a token budget (head, tail and blocks with dates/CUIT/amounts)
+        budgeter = ContentBudgeter(max_tokens=prompt_config.get("max_content_tokens", DEFAULT_MAX_TOKENS))
+        file_content, report = budgeter.fit(file_content)
+        logger.info(f"Content for {original_filename}: {report['tokens']} tokens sent, {report['tokens_saved']} saved")
+        prompt = prompt_template.format(original_filename=original_filename, file_content=file_content)
         prompt += f"\n\nLa estructura del JSON de salida debe ser:\n{json_structure}"
         return prompt
 
@@ -333,7 +352,8 @@ class DriveHandler:
                 response = self.drive_service.changes().list(
                     pageToken=page_token, 
                     spaces='drive', 
-                    fields='nextPageToken, newStartPageToken, changes(fileId, removed, file(name, parents, mimeType))',
+                    # The feed already carries the metadata we need: no per-file files.get
+                    fields='nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, mimeType, size, parents, trashed))',
                     supportsAllDrives=True,
                     includeItemsFromAllDrives=True
                 ).execute()
@@ -342,17 +362,18 @@ class DriveHandler:
                     file_info = change.get('file')
                     parent_folder = file_info.get('parents', [None])[0] if file_info else None
                     
-                    if change.get('removed') or not file_info or \
+                    if change.get('removed') or not file_info or file_info.get('trashed') or \
                        file_info.get('mimeType') == 'application/vnd.google-apps.folder' or \
                        parent_folder not in target_folder_ids:
                         continue
 
+                    file_id = change.get('fileId')
                     original_name = file_info.get('name')
                     if original_name == "index.html" or "DOCPROCESADO" in original_name:
                         continue
                     
-                    logger.info(f"New file change detected: '{original_name}' (ID: {file_info.get('id')})")
-                    self.process_file_item(file_info.get('id'), original_name, parent_folder)
+                    logger.info(f"New file change detected: '{original_name}' (ID: {file_id})")
+                    self.process_file_item(file_id, original_name, parent_folder)
 
                 if 'newStartPageToken' in response:
                     save_new_token(response['newStartPageToken'])
@@ -0,0 +1,207 @@
+"""
+Drive Lister - Listado paginado con prefetch
+============================================
+
+Generator-based listing of Google Drive files that follows ``nextPageToken``
+so folders with more than one page are never truncated. While the caller
+consumes the current page, the next page is already being fetched in a
+background thread.
+Listado de archivos de Drive basado en generadores que sigue
+``nextPageToken`` y precarga la siguiente página en segundo plano.
+
+:created:   2026-10-17
+:filename:  drive_lister.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+# Maximum page size accepted by files().list
+MAX_PAGE_SIZE = 1000
+
+# Minimal field masks: only what the pipeline actually reads
+FOLDER_FIELDS = "id, name"
+FILE_FIELDS = "id, name, mimeType"
+
+
+def folder_children_query(folder_id: str, folders_only: bool = False) -> str:
+    """
+    Builds the ``q`` expression listing non-trashed children of a folder.
+    Construye la expresión ``q`` para listar los hijos de una carpeta.
+    """
+    operator = "=" if folders_only else "!="
+    return f"'{folder_id}' in parents and trashed=false and mimeType {operator} '{FOLDER_MIME_TYPE}'"
+
+
+def iter_drive_pages(
+    drive_service,
+    query: str,
+    file_fields: str = FILE_FIELDS,
+    page_size: int = MAX_PAGE_SIZE,
+    prefetch: bool = True
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields one list of files per result page.
+    Genera una lista de archivos por página de resultados.
+
+    The drive_service must not be used by other threads while iterating:
+    with ``prefetch`` the background thread is the only one issuing requests.
+
+    Args:
+        drive_service: Drive v3 service.
+        query: ``q`` expression for files().list.
+        file_fields: Field mask for each file (inside ``files(...)``).
+        page_size: Page size (max 1000).
+        prefetch: Fetch the next page while the current one is consumed.
+    """
+    fields = f"nextPageToken, files({file_fields})"
+    page_size = min(int(page_size), MAX_PAGE_SIZE)
+
+    def fetch(page_token: Optional[str]) -> Dict[str, Any]:
+        return drive_service.files().list(
+            q=query,
+            fields=fields,
+            pageSize=page_size,
+            pageToken=page_token,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
+        ).execute()
+
+    if not prefetch:
+        page_token = None
+        while True:
+            response = fetch(page_token)
+            yield response.get("files", [])
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drive-lister")
+    try:
+        pending = executor.submit(fetch, None)
+        page_number = 0
+        while pending is not None:
+            response = pending.result()
+            page_number += 1
+            page_token = response.get("nextPageToken")
+            # Start fetching the next page before handing this one out
+            pending = executor.submit(fetch, page_token) if page_token else None
+            files = response.get("files", [])
+            logger.debug(f"Drive list page {page_number}: {len(files)} files (more: {bool(page_token)})")
+            yield files
+    finally:
+        # If the consumer stops early, don't wait for an unneeded prefetch
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_drive_files(
+    drive_service,
+    query: str,
+    file_fields: str = FILE_FIELDS,
+    page_size: int = MAX_PAGE_SIZE,
+    prefetch: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields every file matching ``query`` across all pages.
+    Genera cada archivo que coincide con ``query`` en todas las páginas.
+    """
+    for page in iter_drive_pages(drive_service, query, file_fields, page_size, prefetch):
+        yield from page
+
+
+def list_child_folders(drive_service, folder_id: str) -> List[Dict[str, Any]]:
+    """
+    Returns every direct subfolder (id, name) of a folder.
+    Devuelve todas las subcarpetas directas (id, name) de una carpeta.
+    """
+    return list(iter_drive_files(
+        drive_service,
+        folder_children_query(folder_id, folders_only=True),
+        file_fields=FOLDER_FIELDS
+    ))
+
+
+def find_target_folders(drive_service, root_folder_id: str, target_names: List[str]) -> List[str]:
+    """
+    Returns the IDs of the direct subfolders of ``root_folder_id`` named in ``target_names``.
+    Devuelve los IDs de las subcarpetas cuyo nombre está en ``target_names``.
+
+    Lookup errors are raised: an empty result always means "no such folders",
+    never "the listing failed".
+    """
+    found_folders = []
+    try:
+        for folder in list_child_folders(drive_service, root_folder_id):
+            if folder["name"] in target_names:
+                found_folders.append(folder["id"])
+                logger.info(f"Found target folder: {folder['name']} (ID: {folder['id']})")
+    except Exception as e:
+        logger.error(f"Error finding folders: {e}")
+        raise
+    return found_folders
+
+
+def get_start_page_token(drive_service) -> str:
+    """
+    Returns the current Changes API start page token.
+    Devuelve el token de inicio actual de la Changes API.
+    """
+    response = drive_service.changes().getStartPageToken(supportsAllDrives=True).execute()
+    return response.get("startPageToken")
+
+
+def changes_checkpoint(
+    new_page_token: Optional[str],
+    listing_complete: bool,
+    failed_file_ids: List[str]
+) -> Dict[str, Any]:
+    """
+    Job fields to store after a run that consumed (or restarted) the Changes feed.
+    Campos del job a guardar tras un run que consumió (o reinició) el feed de cambios.
+
+    The token only advances when every candidate file was listed; otherwise
+    it is cleared so the next run does a full listing. Files that failed
+    (download, extraction, agent or rename) are kept in
+    ``changes_retry_file_ids`` and replayed by the next incremental run,
+    since the advanced token will not report them again.
+    """
+    if not new_page_token or not listing_complete:
+        return {"changes_page_token": None, "changes_retry_file_ids": []}
+    return {"changes_page_token": new_page_token, "changes_retry_file_ids": sorted(set(failed_file_ids))}
+
+
+def iter_change_pages(
+    drive_service,
+    page_token: str,
+    change_fields: str = "fileId, removed, file(id, name, mimeType, parents, trashed)",
+    page_size: int = MAX_PAGE_SIZE
+) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+    """
+    Yields ``(changes, new_start_page_token)`` for every page of changes since ``page_token``.
+    Genera ``(cambios, nuevo_token)`` por cada página de cambios desde ``page_token``.
+
+    ``new_start_page_token`` is only set on the last page; it is the token to
+    store for the next incremental run.
+    """
+    fields = f"nextPageToken, newStartPageToken, changes({change_fields})"
+    while page_token:
+        response = drive_service.changes().list(
+            pageToken=page_token,
+            spaces="drive",
+            fields=fields,
+            pageSize=page_size,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
+        ).execute()
+        page_token = response.get("nextPageToken")
+        yield response.get("changes", []), response.get("newStartPageToken")
@@ -0,0 +1,248 @@
+"""
+Filename Template - Plantillas de nombre compiladas e índice de colisiones
+==========================================================================
+
+``filename_format`` templates are parsed once into a cached
+``FilenameTemplate``; rendering a file name is then a single pass over the
+pre-split literals and fields, with case-insensitive placeholders
+(``{date}``, ``{DATE}``, ``{Issuer}``...) and the same aliases the worker has
+always offered (``type``, ``issuer``/``entity``, ``brief_detail``/``concept``).
+Las plantillas de nombre se compilan una sola vez y se renderizan en una
+pasada, con placeholders insensibles a mayúsculas.
+
+Rendered values are sanitized (characters that break Drive sync or other
+file systems are replaced) and names are cut to ``max_length`` keeping the
+extension.
+Los valores se sanean y el nombre se recorta conservando la extensión.
+
+``FolderNameIndex`` tracks the names present in each folder (loaded with a
+names-only listing the first time a folder is claimed in) and resolves collisions with suffixes derived
+from the file ID, so a file always gets the same name on every run.
+El índice por carpeta resuelve colisiones con sufijos deterministas
+derivados del ID del archivo.
+
+:created:   2026-10-17
+:filename:  filename_template.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import logging
+import os
+import re
+import string
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LENGTH = 200
+DEFAULT_DATE = "2025-01-01"
+MISSING_VALUE = "unknown"
+
+# Illegal on Windows/macOS sync clients and confusing in Drive paths
+_ILLEGAL_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f\x7f]')
+_WHITESPACE = re.compile(r"\s+")
+_SIMPLE_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_formatter = string.Formatter()
+
+
+def sanitize_component(value: Any) -> str:
+    """
+    Makes a template value safe inside a file name.
+    Sanea un valor para usarlo dentro de un nombre de archivo.
+    """
+    text = "_".join(map(str, value)) if isinstance(value, (list, tuple)) else str(value)
+    text = _ILLEGAL_CHARS.sub("-", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def limit_length(name: str, max_length: int = DEFAULT_MAX_LENGTH) -> str:
+    """Cuts the stem so the whole name fits ``max_length``, keeping the extension."""
+    if len(name) <= max_length:
+        return name
+    stem, ext = os.path.splitext(name)
+    if len(ext) >= max_length:
+        return name[:max_length]
+    return stem[:max_length - len(ext)].rstrip(" ._-") + ext
+
+
+def template_variables(original_name: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Lower-cased template variables of one analysis (the "big 4", aliases and every field).
+    Variables de plantilla de un análisis (en minúsculas).
+    """
+    ext = os.path.splitext(original_name)[1]
+    keywords = analysis.get("keywords", [])
+    if not isinstance(keywords, list):
+        keywords = [str(keywords)]
+
+    variables = {
+        "date": analysis.get("date") or analysis.get("fecha") or analysis.get("Fecha") or DEFAULT_DATE,
+        "keywords": "_".join(map(str, keywords)) if keywords else "doc",
+        "ext": ext,
+        "original_filename": os.path.splitext(original_name)[0],
+    }
+    # keywords = [type, entity, concept]
+    aliases = (("type",), ("issuer", "entity"), ("brief_detail", "concept"))
+    for position, names in enumerate(aliases):
+        if len(keywords) > position:
+            for name in names:
+                variables[name] = keywords[position]
+
+    for key, value in analysis.items():
+        variables.setdefault(key.lower(), "_".join(map(str, value)) if isinstance(value, list) else value)
+    return variables
+
+
+class FilenameTemplate:
+    """
+    A ``filename_format`` parsed once into literals and fields.
+    Una plantilla ``filename_format`` parseada en literales y campos.
+    """
+
+    def __init__(self, template: str, max_length: int = DEFAULT_MAX_LENGTH):
+        self.template = template
+        self.max_length = max_length
+        # (literal, field name lower-cased, conversion, format spec); None = invalid template
+        self.parts: Optional[List[Tuple[str, Optional[str], Optional[str], str]]] = []
+        try:
+            for literal, field, spec, conversion in _formatter.parse(template):
+                self.parts.append((literal, field.lower() if field is not None else None, conversion, spec or ""))
+        except ValueError as e:
+            logger.error(f"Invalid filename template '{template}': {e}")
+            self.parts = None
+
+    def _value(self, field: str, variables: Dict[str, Any]) -> Any:
+        if _SIMPLE_FIELD.match(field):
+            return variables.get(field, MISSING_VALUE)
+        # Indexed/attribute fields such as {keywords[0]}
+        try:
+            value, _ = _formatter.get_field(field, (), variables)
+            return value
+        except (KeyError, IndexError, AttributeError, TypeError):
+            return MISSING_VALUE
+
+    def render(self, original_name: str, analysis: Dict[str, Any]) -> str:
+        """
+        Renders the file name for ``analysis``; sanitized and length-limited.
+        Genera el nombre de archivo para ``analysis``, saneado y acotado.
+        """
+        variables = template_variables(original_name, analysis)
+        pieces = []
+        try:
+            if self.parts is None:
+                raise ValueError("invalid template")
+            for literal, field, conversion, spec in self.parts:
+                pieces.append(literal)
+                if field is None:
+                    continue
+                if field == "ext":
+                    # The extension is inserted as-is (with its dot)
+                    pieces.append(str(variables["ext"]))
+                    continue
+                value = self._value(field, variables)
+                if conversion:
+                    value = _formatter.convert_field(value, conversion)
+                pieces.append(sanitize_component(format(value, spec) if spec else value))
+            name = "".join(pieces)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Error formatting filename with template '{self.template}': {e}")
+            name = f"{sanitize_component(variables['date'])}_{sanitize_component(variables['keywords'])}{variables['ext']}"
+        name = _ILLEGAL_CHARS.sub("-", name).strip()
+        return limit_length(name, self.max_length)
+
+
+@lru_cache(maxsize=256)
+def compile_template(template: str, max_length: int = DEFAULT_MAX_LENGTH) -> FilenameTemplate:
+    """
+    Returns the compiled (and cached) renderer of a ``filename_format``.
+    Devuelve el renderizador compilado (y cacheado) de un ``filename_format``.
+    """
+    return FilenameTemplate(template, max_length)
+
+
+class FolderNameIndex:
+    """
+    Names present in each folder, used to keep renamed files unique.
+    Nombres presentes en cada carpeta, para que los renombres no colisionen.
+
+    ``claim`` returns the name a file should get. With a ``loader`` every
+    name of a folder is read (once) before the first claim in it, so files
+    outside the current batch of work (unchanged siblings in incremental or
+    shard runs, later listing pages) are never overwritten. Without one, feed
+    every file with ``add`` first. Names are compared case-insensitively.
+    """
+
+    def __init__(self, loader: Optional[Callable[[str], Iterable[Tuple[str, str]]]] = None):
+        """
+        Initialize FolderNameIndex.
+
+        Args:
+            loader: Yields ``(file_id, name)`` of every file in a folder.
+        """
+        self._names: Dict[str, Dict[str, str]] = {}   # folder -> {casefolded name: file_id}
+        self._lock = threading.Lock()
+        self._loader = loader
+        self._loaded: Set[str] = set()
+        self._folder_locks: Dict[str, threading.Lock] = {}
+
+    def _ensure_loaded(self, folder_id: str) -> None:
+        """Loads the names of a folder on first use (one listing per folder, other folders not blocked)."""
+        if self._loader is None:
+            return
+        with self._lock:
+            if folder_id in self._loaded:
+                return
+            folder_lock = self._folder_locks.setdefault(folder_id, threading.Lock())
+        with folder_lock:
+            with self._lock:
+                if folder_id in self._loaded:
+                    return
+            listed = list(self._loader(folder_id))
+            with self._lock:
+                names = self._names.setdefault(folder_id, {})
+                for file_id, name in listed:
+                    names.setdefault(name.casefold(), file_id)
+                self._loaded.add(folder_id)
+            logger.debug(f"Indexed {len(listed)} names of folder {folder_id}")
+
+    def add(self, folder_id: str, file_id: str, name: str) -> None:
+        """
+        Registers an existing file name (from the listing).
+        Registra el nombre de un archivo existente (del listado).
+        """
+        with self._lock:
+            self._names.setdefault(folder_id, {}).setdefault(name.casefold(), file_id)
+
+    def claim(self, folder_id: str, file_id: str, desired: str, current: Optional[str] = None) -> str:
+        """
+        Returns ``desired`` or, if another file holds it, ``<stem>_<id suffix><ext>``.
+        Devuelve ``desired`` o, si otro archivo lo usa, un nombre con sufijo del ID.
+
+        The suffix is taken from the file ID (6 characters, more if needed),
+        so re-running a job produces the same name and no new rename.
+        Raises whatever the loader raises: no name is claimed blind.
+        """
+        self._ensure_loaded(folder_id)
+        stem, ext = os.path.splitext(desired)
+        with self._lock:
+            names = self._names.setdefault(folder_id, {})
+            candidates = [desired]
+            for length in (6, 10, len(file_id)):
+                candidates.append(limit_length(f"{stem}_{file_id[-length:]}{ext}", max(len(desired), DEFAULT_MAX_LENGTH)))
+            for candidate in candidates:
+                holder = names.get(candidate.casefold())
+                if holder is None or holder == file_id:
+                    break
+            if current and current.casefold() != candidate.casefold() and names.get(current.casefold()) == file_id:
+                del names[current.casefold()]
+            names[candidate.casefold()] = file_id
+        if candidate != desired:
+            logger.info(f"Name collision on '{desired}' in folder {folder_id}; using '{candidate}'")
+        return candidate
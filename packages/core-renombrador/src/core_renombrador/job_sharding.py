@@ -0,0 +1,254 @@
+"""
+Job Sharding - Reparto de jobs grandes en tareas por carpeta / rango de archivos
+================================================================================
+
+Splits one job into shards so several worker instances process it in
+parallel. The API server enumerates the job's target folders and cuts each
+folder's file list into ranges of ``shard_size`` file IDs; every shard becomes
+one Cloud Task carrying ``run_id``, ``shard_index``, ``shard_count`` and its
+precomputed ``file_ids``.
+Divide un job en shards (carpetas o rangos de N archivos) para que varias
+instancias del worker lo procesen en paralelo.
+
+Workers record each shard result with ``ShardTracker``; the worker that
+completes the last shard merges every shard's stats into one run summary.
+Cada worker registra el resultado de su shard; el último en terminar agrega
+las estadísticas de todo el run.
+
+:created:   2026-10-17
+:filename:  job_sharding.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .database_manager import DatabaseManager
+from .drive_lister import find_target_folders, folder_children_query, iter_drive_files
+from .pipeline import merge_stage_stats
+from .rule_classifier import rule_hit_rate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 200
+
+# Counters summed across shards
+SUMMED_STATS = ("files_processed", "files_renamed", "errors", "cache_hits", "cache_misses",
+                "llm_batches", "batched_files", "tokens_sent", "tokens_saved",
+                "rule_hits", "rule_seconds_saved", "category_hints")
+
+
+def new_run_id() -> str:
+    """Returns a new run identifier shared by every shard of one job run."""
+    return uuid.uuid4().hex
+
+
+def plan_job_shards(
+    drive_service,
+    job_config: Dict[str, Any],
+    shard_size: int = DEFAULT_SHARD_SIZE
+) -> List[Dict[str, Any]]:
+    """
+    Enumerates the job's target folders and splits their files into shards.
+    Enumera las carpetas del job y divide sus archivos en shards.
+
+    Args:
+        drive_service: Drive v3 service.
+        job_config: Job configuration (``source_folder_id``, ``target_folder_names``).
+        shard_size: Max file IDs per shard.
+
+    Returns:
+        List of ``{"folder_id", "file_ids"}`` dicts; a folder with fewer than
+        ``shard_size`` files is a single shard, empty folders yield none.
+    """
+    shard_size = max(1, int(shard_size))
+    root_folder_id = job_config.get("source_folder_id")
+    target_folder_names = job_config.get("target_folder_names", ["*"])
+
+    if target_folder_names == ["*"]:
+        folders = [root_folder_id]
+    else:
+        folders = find_target_folders(drive_service, root_folder_id, target_folder_names)
+
+    shards = []
+    for folder_id in folders:
+        file_ids = []
+        for file in iter_drive_files(drive_service, folder_children_query(folder_id), file_fields="id, name"):
+            if file["name"] == "index.html":
+                continue
+            file_ids.append(file["id"])
+            if len(file_ids) == shard_size:
+                shards.append({"folder_id": folder_id, "file_ids": file_ids})
+                file_ids = []
+        if file_ids:
+            shards.append({"folder_id": folder_id, "file_ids": file_ids})
+
+    logger.info(f"Job '{job_config.get('id')}' split into {len(shards)} shards across {len(folders)} folders")
+    return shards
+
+
+def aggregate_shard_results(shard_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merges the stats of every shard of a run.
+    Combina las estadísticas de todos los shards de un run.
+
+    Returns:
+        Dict with ``status`` ("success" when every shard succeeded, else
+        "partial"), ``shards_failed`` and the summed ``stats``.
+    """
+    stats: Dict[str, Any] = {key: 0 for key in SUMMED_STATS}
+    stats["stages"] = {}
+    failed = []
+
+    for shard in sorted(shard_results, key=lambda r: r.get("shard_index", 0)):
+        if shard.get("status") != "success":
+            failed.append(shard.get("shard_index"))
+        shard_stats = shard.get("stats") or {}
+        for key in SUMMED_STATS:
+            stats[key] += shard_stats.get(key, 0)
+        merge_stage_stats(stats["stages"], shard_stats.get("stages", {}))
+    stats["rule_seconds_saved"] = round(stats["rule_seconds_saved"], 3)
+    stats["rule_hit_rate"] = rule_hit_rate(stats)
+
+    return {
+        "status": "success" if not failed else "partial",
+        "shards_failed": failed,
+        "stats": stats,
+    }
+
+
+class ShardTracker:
+    """
+    Records shard results and aggregates a run once every shard reported.
+    Registra el resultado de cada shard y agrega el run al completarse.
+
+    Shard results and run summaries live in two DatabaseManager tables
+    (``job_shards`` and ``job_runs``). With the JSON/GCS backends writes from
+    different instances can race; use Supabase for sharded production runs.
+    """
+
+    def __init__(self, shards_db: DatabaseManager, runs_db: DatabaseManager):
+        """
+        Initialize ShardTracker.
+
+        Args:
+            shards_db: Table storing one record per finished shard.
+            runs_db: Table storing one aggregated record per run.
+        """
+        self.shards_db = shards_db
+        self.runs_db = runs_db
+
+    def record_shard(
+        self,
+        run_id: str,
+        job_id: str,
+        shard_index: int,
+        shard_count: int,
+        result: Dict[str, Any]
+    ) -> None:
+        """
+        Stores the result of one shard.
+        Guarda el resultado de un shard.
+        """
+        self.shards_db.insert({
+            "id": f"{run_id}:{shard_index}",
+            "run_id": run_id,
+            "job_id": job_id,
+            "shard_index": shard_index,
+            "shard_count": shard_count,
+            "status": result.get("status"),
+            "stats": result.get("stats", {}),
+            "error": result.get("error"),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    def try_aggregate(self, run_id: str, job_id: str, shard_count: int) -> Optional[Dict[str, Any]]:
+        """
+        Aggregates the run if every shard has reported, otherwise returns None.
+        Agrega el run si todos los shards terminaron; si no, devuelve None.
+
+        Several workers may see the run complete at once; the summary is
+        deterministic, so storing it twice is harmless.
+
+        If dispatching the run failed partway (see ``record_dispatch_failure``)
+        only the shards actually enqueued are awaited, and the run is
+        reported as "partial".
+        """
+        shard_results = {}
+        for record in self.shards_db.find("run_id", run_id):
+            # Cloud Tasks may deliver a shard twice: keep one result per index
+            shard_results[record.get("shard_index")] = record
+
+        dispatch_failure = None
+        if len(shard_results) < shard_count:
+            dispatch_failure = self._dispatch_failure(run_id)
+            if dispatch_failure is not None:
+                shard_count = dispatch_failure["shards_dispatched"]
+        if len(shard_results) < shard_count:
+            logger.info(f"Run {run_id}: {len(shard_results)}/{shard_count} shards finished")
+            return None
+
+        summary = aggregate_shard_results(list(shard_results.values()))
+        summary.update({
+            "run_id": run_id,
+            "job_id": job_id,
+            "shard_count": shard_count,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        })
+        if dispatch_failure is not None:
+            summary["status"] = "partial"
+            summary["shards_dispatched"] = dispatch_failure["shards_dispatched"]
+            summary["error"] = dispatch_failure.get("error")
+        try:
+            self.runs_db.upsert_many([dict(summary, id=run_id)], key="id")
+        except Exception as e:
+            logger.error(f"Failed to store summary of run {run_id}: {e}")
+        logger.info(
+            f"Run {run_id} of job '{job_id}' complete: {summary['stats']['files_renamed']} renamed, "
+            f"{len(summary['shards_failed'])} shards failed"
+        )
+        return summary
+
+    def record_dispatch_failure(
+        self,
+        run_id: str,
+        job_id: str,
+        shard_count: int,
+        shards_dispatched: int,
+        error: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Marks a run whose shard tasks could only be partly enqueued.
+        Marca un run cuyas tareas solo se pudieron encolar en parte.
+
+        The run is stored as "dispatch_failed" with the number of shards
+        actually enqueued, so it aggregates (as "partial") once those finish
+        and never moves the Changes API token. Returns the summary when every
+        enqueued shard already finished.
+        """
+        self.runs_db.upsert_many([{
+            "id": run_id,
+            "run_id": run_id,
+            "job_id": job_id,
+            "status": "dispatch_failed",
+            "shard_count": shard_count,
+            "shards_dispatched": shards_dispatched,
+            "error": error,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }], key="id")
+        logger.error(f"Run {run_id} of job '{job_id}': only {shards_dispatched}/{shard_count} shards dispatched ({error})")
+        if shards_dispatched == 0:
+            return None
+        return self.try_aggregate(run_id, job_id, shard_count)
+
+    def _dispatch_failure(self, run_id: str) -> Optional[Dict[str, Any]]:
+        for record in self.runs_db.find("id", run_id):
+            if record.get("status") == "dispatch_failed":
+                return record
+        return None
@@ -0,0 +1,314 @@
+"""
+LLM Cache - Caché persistente de respuestas del modelo
+======================================================
+
+Caches validated structured responses of the agent keyed by everything that
+determines them: model id, generation parameters, output schema and a hash
+of the prompt (instructions included). Re-running a job after changing only
+``filename_format``, or retrying after a rename failure, reuses the stored
+``FileAnalysis`` instead of paying Gemini latency and cost again.
+Caché de respuestas validadas del agente indexada por modelo, parámetros de
+generación, schema de salida y hash del prompt.
+
+Two tiers:
+
+- Local disk: one JSON file per entry under ``cache_dir``. Bounded by
+  ``max_disk_bytes``; the least recently used files are removed first.
+  On Cloud Run the disk is in-memory, so keep it small (or 0, which turns
+  the tier off) when the GCS tier is configured.
+- GCS (optional): one blob per entry under ``gcs_prefix``, shared by every
+  worker instance. A hit in GCS is copied to the local tier. Configure a
+  bucket lifecycle rule (age > TTL) to bound its size.
+
+Entries older than ``ttl_seconds`` are treated as misses and deleted.
+
+:created:   2026-10-17
+:filename:  llm_cache.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def schema_fingerprint(output_schema: Any) -> Optional[str]:
+    """
+    Stable description of an output schema (Pydantic model class or dict).
+    Descripción estable de un schema de salida.
+    """
+    if output_schema is None:
+        return None
+    if hasattr(output_schema, "model_json_schema"):
+        return json.dumps(output_schema.model_json_schema(), sort_keys=True, default=str)
+    return json.dumps(output_schema, sort_keys=True, default=str)
+
+
+def llm_cache_key(
+    model_id: str,
+    generation_params: Optional[Dict[str, Any]],
+    output_schema: Any,
+    prompt: str,
+    instructions: Optional[Any] = None
+) -> str:
+    """
+    Cache key of one agent call.
+    Clave de caché de una llamada al agente.
+
+    Args:
+        model_id: Model name (e.g. ``gemini-2.0-flash``).
+        generation_params: Temperature, max tokens, etc.
+        output_schema: Pydantic model class or dict schema of the response.
+        prompt: User prompt sent to the model.
+        instructions: System instructions, hashed together with the prompt.
+    """
+    prompt_hash = hashlib.sha256(
+        json.dumps([instructions, prompt], ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+    payload = json.dumps(
+        {
+            "model": model_id,
+            "params": generation_params or {},
+            "schema": schema_fingerprint(output_schema),
+            "prompt": prompt_hash,
+        },
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier (local disk + GCS) cache of validated agent responses.
+    Caché de dos niveles (disco local + GCS) de respuestas validadas.
+
+    Usage:
+        key = llm_cache_key(model_id, params, FileAnalysis, prompt)
+        analysis = cache.get(key)
+        if analysis is None:
+            analysis = run_agent(prompt)
+            cache.put(key, analysis, schema=FileAnalysis)
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = "data/llm_cache",
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+        gcs_bucket_name: Optional[str] = None,
+        gcs_prefix: str = "cache/llm/",
+        storage_client=None
+    ):
+        """
+        Initialize LLMResponseCache.
+
+        Args:
+            cache_dir: Directory of the local tier (None disables it).
+            ttl_seconds: Entry lifetime; older entries are misses.
+            max_disk_bytes: Size bound of the local tier (LRU eviction); 0 disables it.
+            gcs_bucket_name: Bucket of the shared tier (None disables it).
+            gcs_prefix: Blob prefix inside the bucket.
+            storage_client: Cloud Storage client (built on demand if omitted).
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir and max_disk_bytes > 0 else None
+        self.ttl_seconds = int(ttl_seconds)
+        self.max_disk_bytes = int(max_disk_bytes)
+        self.gcs_prefix = gcs_prefix
+        self.bucket = None
+
+        self._disk_bytes: Optional[int] = None
+        self._counters = {"hits": 0, "disk_hits": 0, "gcs_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        if gcs_bucket_name:
+            try:
+                if storage_client is None:
+                    from google.cloud import storage
+                    storage_client = storage.Client()
+                self.bucket = storage_client.bucket(gcs_bucket_name)
+                logger.info(f"LLMResponseCache shared tier: gs://{gcs_bucket_name}/{gcs_prefix}")
+            except Exception as e:
+                logger.warning(f"LLMResponseCache could not initialize GCS ({e}). Using the local tier only.")
+                self.bucket = None
+
+    # --- Local tier ---
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _disk_usage(self) -> int:
+        """Total size of the local tier, scanned once and then tracked."""
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(path.stat().st_size for path in self.cache_dir.glob("*/*.json"))
+        return self._disk_bytes
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable LLM cache entry {key}: {e}")
+            self._disk_delete(path)
+            return None
+        if self._expired(entry):
+            self._disk_delete(path)
+            return None
+        # Touch: eviction removes the least recently used files first
+        os.utime(path)
+        return entry
+
+    def _disk_put(self, key: str, entry: Dict[str, Any]) -> None:
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            usage = self._disk_usage()
+            previous = path.stat().st_size if path.exists() else 0
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            self._disk_bytes = usage - previous + len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _disk_delete(self, path: Path) -> None:
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                return
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    def _evict(self) -> None:
+        """Removes least recently used files until the tier is at 90% of its bound (lock held)."""
+        files = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        target = int(self.max_disk_bytes * 0.9)
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._counters["evictions"] += 1
+        self._disk_bytes = total
+
+    # --- GCS tier ---
+
+    def _gcs_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.bucket is None:
+            return None
+        try:
+            blob = self.bucket.blob(f"{self.gcs_prefix}{key}.json")
+            if not blob.exists():
+                return None
+            entry = json.loads(blob.download_as_text())
+        except Exception as e:
+            logger.warning(f"LLM cache GCS read failed for {key}: {e}")
+            return None
+        return None if self._expired(entry) else entry
+
+    def _gcs_put(self, key: str, entry: Dict[str, Any]) -> None:
+        if self.bucket is None:
+            return
+        try:
+            blob = self.bucket.blob(f"{self.gcs_prefix}{key}.json")
+            blob.upload_from_string(json.dumps(entry, ensure_ascii=False), content_type="application/json")
+        except Exception as e:
+            logger.warning(f"LLM cache GCS write failed for {key}: {e}")
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get("stored_at", 0) > self.ttl_seconds
+
+    # --- Lookups ---
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached response or None (local tier first, then GCS).
+        Devuelve la respuesta cacheada o None.
+        """
+        entry = self._disk_get(key)
+        tier = "disk_hits"
+        if entry is None:
+            entry = self._gcs_get(key)
+            tier = "gcs_hits"
+            if entry is not None:
+                self._disk_put(key, entry)
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._counters[tier] += 1
+        return dict(entry["response"])
+
+    def put(self, key: str, response: Dict[str, Any], schema: Optional[type] = None) -> bool:
+        """
+        Stores a response after validating it against ``schema`` (Pydantic model).
+        Guarda una respuesta, validándola antes contra ``schema``.
+
+        Returns:
+            True if stored; invalid or empty responses are not cached.
+        """
+        if not response:
+            return False
+        if schema is not None and hasattr(schema, "model_validate"):
+            try:
+                response = schema.model_validate(response).model_dump()
+            except Exception as e:
+                logger.debug(f"Not caching invalid LLM response {key}: {e}")
+                return False
+        entry = {"response": response, "stored_at": int(time.time())}
+        try:
+            self._disk_put(key, entry)
+        except Exception as e:
+            logger.warning(f"LLM cache disk write failed for {key}: {e}")
+        self._gcs_put(key, entry)
+        with self._lock:
+            self._counters["stores"] += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Hit/miss/store/eviction counters since the process started.
+        Contadores de aciertos, fallos, escrituras y desalojos.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            counters["disk_bytes"] = self._disk_bytes or 0
+        return counters
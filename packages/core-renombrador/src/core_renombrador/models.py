@@ -26,3 +26,47 @@ class FileAnalysis(BaseModel):
     model_config = ConfigDict(
         extra='ignore'
     )
+
+
+class FileAnalysisItem(FileAnalysis):
+    """
+    One entry of a multi-document analysis: FileAnalysis plus the file it belongs to.
+    """
+    file_id: str = Field(
+        description="ID of the document this analysis belongs to, exactly as given in the prompt."
+    )
+
+
+class FileAnalysisBatch(BaseModel):
+    """
+    Structured output for a single request that analyzes several documents.
+    """
+    results: List[FileAnalysisItem] = Field(
+        description="One analysis per document, identified by file_id."
+    )
+
+    model_config = ConfigDict(
+        extra='ignore'
+    )
+
+
+_batch_models = {FileAnalysis: FileAnalysisBatch}
+
+
+def batch_model_for(item_model: type) -> type:
+    """
+    Returns the batch output model (``results: List[item + file_id]``) for a per-file model.
+    Devuelve el modelo de salida por lotes para un modelo por archivo.
+    """
+    if item_model not in _batch_models:
+        from pydantic import create_model
+        item = create_model(
+            f"{item_model.__name__}Item",
+            __base__=item_model,
+            file_id=(str, Field(description="ID of the document this analysis belongs to."))
+        )
+        _batch_models[item_model] = create_model(
+            f"{item_model.__name__}Batch",
+            results=(List[item], Field(description="One analysis per document, identified by file_id."))
+        )
+    return _batch_models[item_model]
@@ -0,0 +1,355 @@
+"""
+StagedPipeline - Motor de pipeline concurrente por etapas
+=========================================================
+
+Runs items through a sequence of stages (e.g. download -> extract -> LLM ->
+rename). Each stage has its own bounded input queue and its own worker pool,
+so slow network-bound stages overlap instead of running one file at a time.
+Ejecuta items a través de una secuencia de etapas, cada una con su propia cola
+acotada y su propio pool de workers.
+
+Stage handlers receive one item and return the item for the next stage.
+Returning ``None`` drops the item (skipped), raising marks it as failed.
+
+Batch stages (``batch_size`` set) hand their handler a list of items, grouped
+until the batch is full, the weight budget is reached or ``batch_wait``
+seconds pass. The handler returns one result per item; an ``Exception``
+instance in the list marks that single item as failed.
+
+:created:   2026-10-17
+:filename:  pipeline.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marker put on a queue to tell one worker that no more items will arrive
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    Definition of a single pipeline stage.
+    Definición de una etapa del pipeline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        batch_budget: Optional[float] = None,
+        batch_weight: Optional[Callable[[Any], float]] = None,
+        batch_wait: float = 0.5
+    ):
+        """
+        Initialize PipelineStage.
+
+        Args:
+            name: Stage name used in stats and logs.
+            handler: Callable that processes one item and returns the item
+                     for the next stage (or ``None`` to drop it). For batch
+                     stages it receives and returns a list.
+            workers: Number of threads serving this stage.
+            queue_size: Max items waiting in this stage's input queue.
+                        Defaults to ``2 * workers`` (``2 * workers * batch_size``
+                        for batch stages).
+            batch_size: Max items per batch; ``None`` processes items one by one.
+            batch_budget: Max total weight per batch (an item heavier than
+                          the budget still forms its own batch).
+            batch_weight: Callable returning the weight of one item (default 1).
+            batch_wait: Seconds to wait for more items after the first one.
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size)) if batch_size else None
+        self.batch_budget = batch_budget
+        self.batch_weight = batch_weight or (lambda item: 1)
+        self.batch_wait = batch_wait
+        self.queue_size = queue_size or self.workers * 2 * (self.batch_size or 1)
+
+
+class StageStats:
+    """
+    Thread-safe counters for one stage.
+    Contadores thread-safe de una etapa.
+    """
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.succeeded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, elapsed: float) -> None:
+        """Records the outcome ('succeeded', 'skipped', 'failed') of one item."""
+        with self._lock:
+            self.processed += 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.busy_seconds += elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "processed": self.processed,
+                "succeeded": self.succeeded,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "busy_seconds": round(self.busy_seconds, 3),
+            }
+
+
+class StagedPipeline:
+    """
+    Streams items from a source iterable through concurrent stages.
+    Transmite items desde una fuente a través de etapas concurrentes.
+
+    Usage:
+        pipeline = StagedPipeline(
+            [PipelineStage("download", download, workers=8),
+             PipelineStage("rename", rename, workers=2)],
+            source_name="list"
+        )
+        stats = pipeline.run(iter_files())
+    """
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        source_name: str = "source",
+        on_error: Optional[Callable[[str, Any, Exception], None]] = None
+    ):
+        """
+        Initialize StagedPipeline.
+
+        Args:
+            stages: Ordered list of stages.
+            source_name: Name used for the stats of the source iterable.
+            on_error: Optional callback ``(stage_name, item, exception)``
+                      invoked when a handler raises.
+        """
+        if not stages:
+            raise ValueError("StagedPipeline requires at least one stage")
+        self.stages = stages
+        self.source_name = source_name
+        self.on_error = on_error
+        self.source_stats = StageStats(source_name)
+        self.stage_stats = {stage.name: StageStats(stage.name, stage.workers) for stage in stages}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def run(self, items: Iterable[Any]) -> Dict[str, Any]:
+        """
+        Runs the pipeline until the source is exhausted and every stage drains.
+        Ejecuta el pipeline hasta agotar la fuente y vaciar todas las etapas.
+
+        Returns:
+            Stats dict as returned by ``stats()``.
+        """
+        self.started_at = time.monotonic()
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        threads: List[List[threading.Thread]] = []
+
+        for index, stage in enumerate(self.stages):
+            stage_threads = []
+            for worker_number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(index, queues),
+                    name=f"pipeline-{stage.name}-{worker_number}",
+                    daemon=True
+                )
+                thread.start()
+                stage_threads.append(thread)
+            threads.append(stage_threads)
+
+        # The source runs in the calling thread; the first queue applies backpressure
+        try:
+            iterator = iter(items)
+            while True:
+                start = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    self.source_stats.record("failed", time.monotonic() - start)
+                    self._report_error(self.source_name, None, e)
+                    break
+                self.source_stats.record("succeeded", time.monotonic() - start)
+                queues[0].put(item)
+        finally:
+            # Shut stages down in order so each one drains before the next stops
+            for index, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    queues[index].put(_STOP)
+                for thread in threads[index]:
+                    thread.join()
+
+        self.finished_at = time.monotonic()
+        return self.stats()
+
+    def _worker_loop(self, index: int, queues: List[queue.Queue]) -> None:
+        stage = self.stages[index]
+        stats = self.stage_stats[stage.name]
+        next_queue = queues[index + 1] if index + 1 < len(queues) else None
+
+        if stage.batch_size is not None:
+            self._batch_worker_loop(stage, stats, queues[index], next_queue)
+            return
+
+        while True:
+            item = queues[index].get()
+            if item is _STOP:
+                return
+
+            start = time.monotonic()
+            try:
+                result = stage.handler(item)
+            except Exception as e:
+                stats.record("failed", time.monotonic() - start)
+                self._report_error(stage.name, item, e)
+                continue
+
+            if result is None:
+                stats.record("skipped", time.monotonic() - start)
+                continue
+
+            stats.record("succeeded", time.monotonic() - start)
+            if next_queue is not None:
+                next_queue.put(result)
+
+    def _batch_worker_loop(
+        self,
+        stage: PipelineStage,
+        stats: StageStats,
+        input_queue: queue.Queue,
+        next_queue: Optional[queue.Queue]
+    ) -> None:
+        carry = None
+        while True:
+            first = carry if carry is not None else input_queue.get()
+            carry = None
+            if first is _STOP:
+                return
+
+            # Group items until the batch is full, over budget or the wait expires
+            batch = [first]
+            weight = stage.batch_weight(first)
+            deadline = time.monotonic() + stage.batch_wait
+            stopping = False
+            while len(batch) < stage.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = input_queue.get(timeout=remaining) if remaining > 0 else input_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                item_weight = stage.batch_weight(item)
+                if stage.batch_budget is not None and weight + item_weight > stage.batch_budget:
+                    carry = item
+                    break
+                batch.append(item)
+                weight += item_weight
+
+            self._run_batch(stage, stats, batch, next_queue)
+            if stopping:
+                return
+
+    def _run_batch(
+        self,
+        stage: PipelineStage,
+        stats: StageStats,
+        batch: List[Any],
+        next_queue: Optional[queue.Queue]
+    ) -> None:
+        start = time.monotonic()
+        try:
+            results = stage.handler(batch)
+            if len(results) != len(batch):
+                raise ValueError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            elapsed = (time.monotonic() - start) / len(batch)
+            for item in batch:
+                stats.record("failed", elapsed)
+                self._report_error(stage.name, item, e)
+            return
+
+        elapsed = (time.monotonic() - start) / len(batch)
+        for item, result in zip(batch, results):
+            if isinstance(result, Exception):
+                stats.record("failed", elapsed)
+                self._report_error(stage.name, item, result)
+            elif result is None:
+                stats.record("skipped", elapsed)
+            else:
+                stats.record("succeeded", elapsed)
+                if next_queue is not None:
+                    next_queue.put(result)
+
+    def _report_error(self, stage_name: str, item: Any, error: Exception) -> None:
+        if self.on_error:
+            try:
+                self.on_error(stage_name, item, error)
+                return
+            except Exception as callback_error:
+                logger.error(f"Pipeline on_error callback failed: {callback_error}")
+        logger.error(f"Pipeline stage '{stage_name}' failed: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns per-stage stats (safe to call while the pipeline is running).
+        Devuelve estadísticas por etapa (se puede llamar durante la ejecución).
+        """
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        stages = {self.source_name: self.source_stats.to_dict()}
+        for stage in self.stages:
+            stages[stage.name] = self.stage_stats[stage.name].to_dict()
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "running": self.started_at is not None and self.finished_at is None,
+            "stages": stages,
+        }
+
+    @property
+    def failed(self) -> int:
+        """Total failures across the source and every stage."""
+        total = self.source_stats.failed
+        for stats in self.stage_stats.values():
+            total += stats.failed
+        return total
+
+
+def merge_stage_stats(target: Dict[str, Dict[str, Any]], source: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Adds the per-stage counters of ``source`` into ``target`` (in place).
+    Suma los contadores por etapa de ``source`` en ``target``.
+    """
+    for stage_name, counters in source.items():
+        merged = target.setdefault(stage_name, {})
+        for key, value in counters.items():
+            if key == "workers":
+                merged[key] = max(merged.get(key, 0), value)
+            elif isinstance(value, (int, float)):
+                merged[key] = round(merged.get(key, 0) + value, 3)
@@ -0,0 +1,256 @@
+"""
+Quota Governor - Control compartido de cuota de la API de Drive
+================================================================
+
+Token-bucket pacing of every Drive API request made by the process (list,
+get/get_media, update, changes and batch calls). Drive services are built on
+a ``GovernedHttp`` transport that takes a token before each HTTP request, so
+the worker, the API server and ``DriveHandler`` stay under one configured
+QPS no matter how many jobs run at once.
+Limita el ritmo de todas las llamadas a la API de Drive del proceso con un
+token bucket compartido.
+
+Rate-limit answers (403 ``userRateLimitExceeded`` / ``rateLimitExceeded``
+and 429) are retried after the ``Retry-After`` delay (or a jittered
+backoff) and pause the whole bucket meanwhile, instead of surfacing as file
+errors. With several instances, each one can send its own ``quotaUser`` so
+the per-user quota is split between them.
+Ante un 403/429 por cuota se espera ``Retry-After`` y se reintenta; con
+varias instancias se puede repartir la cuota con ``quotaUser``.
+
+:created:   2026-10-17
+:filename:  quota_governor.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import google_auth_httplib2
+import httplib2
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QPS = 20.0
+
+RATE_LIMIT_REASONS = (b"userRateLimitExceeded", b"rateLimitExceeded")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait from a ``Retry-After`` header (delta seconds or HTTP date).
+    Segundos de espera indicados por el header ``Retry-After``.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(status: int, content: Any) -> bool:
+    """True for 429 and for 403 responses whose reason is a rate limit."""
+    if status == 429:
+        return True
+    if status != 403 or not content:
+        return False
+    if isinstance(content, str):
+        content = content.encode("utf-8", "replace")
+    return any(reason in content for reason in RATE_LIMIT_REASONS)
+
+
+class QuotaGovernor:
+    """
+    Thread-safe token bucket shared by every Drive client of the process.
+    Token bucket thread-safe compartido por todos los clientes de Drive.
+    """
+
+    def __init__(
+        self,
+        qps: float = DEFAULT_QPS,
+        burst: Optional[int] = None,
+        quota_user: Optional[str] = None,
+        max_retries: int = 5,
+        backoff_cap: float = 60.0
+    ):
+        """
+        Initialize QuotaGovernor.
+
+        Args:
+            qps: Sustained Drive requests per second.
+            burst: Bucket size (defaults to ``qps``, at least 1).
+            quota_user: ``quotaUser`` sent with every request (None = not sent).
+            max_retries: Retries of a rate-limited request before giving up.
+            backoff_cap: Max wait in seconds when there is no ``Retry-After``.
+        """
+        self.qps = max(0.1, float(qps))
+        self.burst = max(1, int(burst if burst is not None else self.qps))
+        self.quota_user = quota_user or None
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_cap = backoff_cap
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._counters = {"requests": 0, "rate_limited": 0, "retries": 0, "gave_up": 0}
+        self._waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: int = 1) -> float:
+        """
+        Blocks until ``cost`` tokens are available; returns the seconds waited.
+        Bloquea hasta tener ``cost`` tokens; devuelve los segundos de espera.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.qps)
+            self._updated = now
+            # Reserve now, wait outside the lock: later callers queue behind the deficit
+            self._tokens -= cost
+            wait = max(0.0, -self._tokens / self.qps, self._paused_until - now)
+            self._counters["requests"] += cost
+            self._waited += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds every caller for ``seconds`` (after a rate-limit answer).
+        Detiene a todos los llamadores ``seconds`` segundos.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_cap, 2 ** attempt))
+
+    def record(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Configured QPS and request/rate-limit counters.
+        QPS configurado y contadores de requests y límites de cuota.
+        """
+        with self._lock:
+            view = dict(self._counters)
+            view.update({
+                "qps": self.qps,
+                "burst": self.burst,
+                "quota_user": self.quota_user,
+                "waited_seconds": round(self._waited, 3),
+            })
+        return view
+
+
+class GovernedHttp:
+    """
+    httplib2-compatible transport that paces requests through a QuotaGovernor.
+    Transporte compatible con httplib2 que regula las requests con un QuotaGovernor.
+
+    Wraps an (authorized) ``httplib2.Http``; unknown attributes are delegated
+    to it, so googleapiclient can use it as its ``http`` object.
+    """
+
+    def __init__(self, http, governor: QuotaGovernor):
+        self.http = http
+        self.governor = governor
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def _with_quota_user(self, uri: str) -> str:
+        if not self.governor.quota_user:
+            return uri
+        parts = urlsplit(uri)
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "quotaUser"]
+        query.append(("quotaUser", self.governor.quota_user))
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    @staticmethod
+    def _cost(uri: str, body: Any) -> int:
+        """A batch request spends one token per inner call."""
+        if "/batch/" not in uri or not body:
+            return 1
+        if isinstance(body, str):
+            body = body.encode("utf-8", "replace")
+        return max(1, body.count(b"Content-ID:")) if isinstance(body, bytes) else 1
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        uri = self._with_quota_user(uri)
+        # Streamed bodies cannot be sent twice
+        can_retry = body is None or isinstance(body, (bytes, str))
+        attempt = 0
+        while True:
+            self.governor.acquire(self._cost(uri, body))
+            response, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+            if not is_rate_limited(response.status, content):
+                return response, content
+
+            self.governor.record("rate_limited")
+            if not can_retry or attempt >= self.governor.max_retries:
+                self.governor.record("gave_up")
+                logger.warning(f"Drive rate limit persists after {attempt} retries ({method} {uri.split('?')[0]})")
+                return response, content
+
+            delay = self.governor.retry_delay(attempt, parse_retry_after(response.get("retry-after")))
+            self.governor.pause(delay)
+            self.governor.record("retries")
+            logger.info(f"Drive rate limited ({response.status}); retrying in {delay:.1f}s (attempt {attempt + 1})")
+            attempt += 1
+
+
+def governed_http(credentials, governor: Optional["QuotaGovernor"] = None, timeout: int = 120) -> GovernedHttp:
+    """
+    Authorized, quota-governed HTTP transport for building a Drive service.
+    Transporte HTTP autorizado y regulado para construir un servicio de Drive.
+    """
+    http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout))
+    return GovernedHttp(http, governor or get_quota_governor())
+
+
+_default_governor: Optional[QuotaGovernor] = None
+_default_lock = threading.Lock()
+
+
+def configure_quota_governor(**kwargs) -> QuotaGovernor:
+    """
+    Replaces the process-wide governor (call once at startup).
+    Reemplaza el governor del proceso (llamar una vez al iniciar).
+    """
+    global _default_governor
+    with _default_lock:
+        _default_governor = QuotaGovernor(**kwargs)
+    return _default_governor
+
+
+def get_quota_governor() -> QuotaGovernor:
+    """
+    Returns the process-wide QuotaGovernor.
+    Devuelve el QuotaGovernor del proceso.
+    """
+    global _default_governor
+    if _default_governor is None:
+        with _default_lock:
+            if _default_governor is None:
+                _default_governor = QuotaGovernor()
+    return _default_governor
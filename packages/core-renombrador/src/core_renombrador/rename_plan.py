@@ -0,0 +1,228 @@
+"""
+Rename Plan - Planes de renombrado revisables (plan / apply)
+============================================================
+
+Two-phase bulk renames. In ``plan`` mode a job analyzes its files and
+stores the proposed renames (file ID, old name, new name, analysis) as a
+``RenamePlan`` without touching Drive. After review, ``apply`` mode pushes the
+stored plan through batched Drive updates, with no downloads and no model
+calls, so a large backfill is both reviewable and fast.
+Renombrado en dos fases: ``plan`` guarda los cambios propuestos sin tocar
+Drive; ``apply`` los aplica en lotes.
+
+An applied plan is never pushed again; a ``partial`` one only retries the
+files that failed. Entries whose file changed since planning (name, md5 or
+modifiedTime) are skipped as stale instead of overwriting newer work.
+
+Plans are stored as one JSON document each, in GCS (``plans/<plan_id>.json``)
+or in a local directory, following the other stores of the package.
+
+:created:   2026-10-17
+:filename:  rename_plan.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PLAN_STATUSES = ("planned", "applied", "partial")
+
+
+class RenamePlan:
+    """
+    Proposed renames of one job run.
+    Renombrados propuestos de una ejecución de job.
+    """
+
+    def __init__(
+        self,
+        plan_id: str,
+        job_id: Optional[str],
+        entries: Optional[List[Dict[str, Any]]] = None,
+        status: str = "planned",
+        created_at: Optional[str] = None,
+        unchanged: int = 0,
+        applied: Optional[Dict[str, Any]] = None
+    ):
+        self.plan_id = plan_id
+        self.job_id = job_id
+        self.entries: List[Dict[str, Any]] = entries or []
+        self.status = status
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat()
+        self.unchanged = unchanged
+        self.applied = applied
+        self._lock = threading.Lock()
+
+    def add(self, file: Dict[str, Any], folder_id: str, new_name: str, analysis: Dict[str, Any]) -> None:
+        """
+        Records the proposed rename of a file (no-op renames are only counted).
+        Registra el renombrado propuesto de un archivo.
+        """
+        with self._lock:
+            if file["name"] == new_name:
+                self.unchanged += 1
+                return
+            self.entries.append({
+                "file_id": file["id"],
+                "folder_id": folder_id,
+                "old_name": file["name"],
+                "new_name": new_name,
+                "analysis": analysis,
+                "md5Checksum": file.get("md5Checksum"),
+                "modifiedTime": file.get("modifiedTime"),
+            })
+
+    def pending_entries(self) -> List[Dict[str, Any]]:
+        """
+        Entries an ``apply`` has to push: all of them for a new plan, only the
+        failed ones for a ``partial`` plan.
+        Entradas pendientes de aplicar (solo las fallidas si el plan es parcial).
+
+        Raises:
+            ValueError: If the plan was already applied.
+        """
+        with self._lock:
+            if self.status == "applied":
+                raise ValueError(f"Rename plan '{self.plan_id}' was already applied")
+            if self.status == "partial":
+                failed = set((self.applied or {}).get("failed_file_ids") or [])
+                return [entry for entry in self.entries if entry["file_id"] in failed]
+            return list(self.entries)
+
+    @staticmethod
+    def is_current(entry: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> bool:
+        """
+        True if the file still is the version the entry was planned from.
+        Indica si el archivo sigue siendo la versión sobre la que se planificó.
+        """
+        return (
+            metadata is not None
+            and not metadata.get("trashed")
+            and metadata.get("name") == entry["old_name"]
+            and metadata.get("md5Checksum") == entry.get("md5Checksum")
+            and metadata.get("modifiedTime") == entry.get("modifiedTime")
+        )
+
+    def record_apply(self, files_renamed: int, failed_file_ids: List[str], stale_file_ids: List[str]) -> None:
+        """
+        Stores the outcome of an ``apply`` (counts accumulate across retries).
+        Guarda el resultado de una aplicación del plan.
+        """
+        with self._lock:
+            previous = self.applied or {}
+            self.status = "applied" if not failed_file_ids else "partial"
+            self.applied = {
+                "applied_at": datetime.now(timezone.utc).isoformat(),
+                "files_renamed": previous.get("files_renamed", 0) + files_renamed,
+                "failed_file_ids": list(failed_file_ids),
+                "stale_file_ids": sorted(set(previous.get("stale_file_ids") or []) | set(stale_file_ids)),
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "plan_id": self.plan_id,
+                "job_id": self.job_id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "unchanged": self.unchanged,
+                "applied": self.applied,
+                "entries": list(self.entries),
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RenamePlan":
+        return cls(
+            plan_id=data["plan_id"],
+            job_id=data.get("job_id"),
+            entries=data.get("entries") or [],
+            status=data.get("status", "planned"),
+            created_at=data.get("created_at"),
+            unchanged=data.get("unchanged", 0),
+            applied=data.get("applied"),
+        )
+
+
+class RenamePlanStore:
+    """
+    Stores rename plans in GCS or a local directory.
+    Guarda los planes de renombrado en GCS o en un directorio local.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = "data/plans",
+        gcs_bucket_name: Optional[str] = None,
+        gcs_prefix: str = "plans/",
+        storage_client=None
+    ):
+        """
+        Initialize RenamePlanStore.
+
+        Args:
+            directory: Local directory for plans (local mode).
+            gcs_bucket_name: Bucket for plans (takes priority).
+            gcs_prefix: Blob prefix inside the bucket.
+            storage_client: Cloud Storage client (built on demand if omitted).
+        """
+        self.directory = Path(directory)
+        self.gcs_prefix = gcs_prefix
+        self.bucket = None
+
+        if gcs_bucket_name:
+            try:
+                if storage_client is None:
+                    from google.cloud import storage
+                    storage_client = storage.Client()
+                self.bucket = storage_client.bucket(gcs_bucket_name)
+                logger.info(f"Rename plans stored in gs://{gcs_bucket_name}/{gcs_prefix}")
+            except Exception as e:
+                logger.warning(f"RenamePlanStore could not initialize GCS ({e}). Using {self.directory}.")
+                self.bucket = None
+
+    def save(self, plan: RenamePlan) -> None:
+        """
+        Writes (or overwrites) a plan.
+        Escribe (o sobrescribe) un plan.
+        """
+        data = json.dumps(plan.to_dict(), ensure_ascii=False, indent=2)
+        if self.bucket is not None:
+            blob = self.bucket.blob(f"{self.gcs_prefix}{plan.plan_id}.json")
+            blob.upload_from_string(data, content_type="application/json")
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{plan.plan_id}.json").write_text(data, encoding="utf-8")
+        logger.info(f"Rename plan {plan.plan_id} saved ({len(plan.entries)} renames)")
+
+    def load(self, plan_id: str) -> Optional[RenamePlan]:
+        """
+        Reads a plan, or None if it does not exist.
+        Lee un plan, o None si no existe.
+        """
+        if not plan_id or "/" in plan_id or ".." in plan_id:
+            return None
+        try:
+            if self.bucket is not None:
+                blob = self.bucket.blob(f"{self.gcs_prefix}{plan_id}.json")
+                if not blob.exists():
+                    return None
+                data = json.loads(blob.download_as_text())
+            else:
+                path = self.directory / f"{plan_id}.json"
+                if not path.exists():
+                    return None
+                data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.error(f"Failed to load rename plan {plan_id}: {e}")
+            return None
+        return RenamePlan.from_dict(data)
@@ -0,0 +1,279 @@
+"""
+Rule Classifier - Clasificación por reglas antes del LLM
+========================================================
+
+Fast path for highly regular documents (AFIP VEPs, F931 forms, "Factura
+A/B/C" invoices, bank statements). A compiled set of regex/keyword rules is
+run over the extracted text; when a rule matches with enough confidence and
+the date, issuer and detail can be read from the text, the analysis is
+produced locally and the Gemini call is skipped. Otherwise the file falls
+through to the agent.
+Clasifica documentos muy regulares con reglas regex/palabras clave y evita
+la llamada a Gemini cuando la confianza es alta.
+
+The result follows ``FileAnalysis``: ``date``, ``category`` and the three
+``keywords`` [type, issuer, detail] (``FilenameTemplate`` exposes them as
+``{type}``, ``{issuer}`` and ``{brief_detail}``).
+
+Rule format (``agent_config["fast_rules"]["rules"]``)::
+
+    {
+        "name": "vep",
+        "category": "Impuestos",
+        "type": "VEP",
+        "required": ["\\\\bVEP\\\\b"],              # all must match
+        "patterns": [["AFIP|ARCA", 2], "CUIT"],   # weighted evidence
+        "min_confidence": 0.6,                    # share of the weight matched
+        "issuer": "AFIP",                         # literal, or
+        "issuer_pattern": "raz[oó]n social:?\\\\s*(.+)",  # first group
+        "detail": "Pago",
+        "detail_pattern": "...",
+        "date_labels": ["fecha de pago"]          # dates after these labels first
+    }
+
+:created:   2026-10-17
+:filename:  rule_classifier.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import datetime
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+_FLAGS = re.IGNORECASE | re.MULTILINE
+
+# dd/mm/yyyy, dd-mm-yy, yyyy-mm-dd and mm/yyyy (periods)
+DATE_VALUE = re.compile(
+    r"\b(?P<d>\d{1,2})[/.-](?P<m>\d{1,2})[/.-](?P<y>\d{4}|\d{2})\b"
+    r"|\b(?P<iy>\d{4})-(?P<im>\d{2})-(?P<id>\d{2})\b"
+    r"|\b(?P<pm>\d{1,2})[/-](?P<py>\d{4})\b"
+)
+
+# How far after a label the date may appear
+_LABEL_WINDOW = 60
+
+_INVOICE_ISSUER = r"raz[oó]n social\s*[:\-]?\s*([^\n]{3,60})"
+_INVOICE_NUMBER = r"(?:comp(?:robante)?\.?\s*n(?:ro|[°º])\.?|n[uú]mero)\s*[:\-]?\s*(\d{4,5}\s*-\s*\d{6,8}|\d{6,13})"
+
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {
+        "name": "afip_vep",
+        "category": "Impuestos",
+        "type": "VEP",
+        "required": [r"\bVEP\b|volante electr[oó]nico de pago"],
+        "patterns": [[r"\bAFIP\b|\bARCA\b", 2], r"n(?:[uú]mero|ro\.?) de VEP|\bnro\.? VEP", r"\bCUIT\b",
+                     r"per[ií]odo", r"importe"],
+        "issuer": "AFIP",
+        "detail_pattern": r"(?:descripci[oó]n (?:del )?impuesto|impuesto|concepto)\s*[:\-]?\s*([^\n]{3,40})",
+        "detail": "Pago",
+        "date_labels": [r"fecha de pago", r"fecha (?:de )?generaci[oó]n", r"vencimiento"],
+    },
+    {
+        "name": "afip_f931",
+        "category": "Cargas Sociales",
+        "type": "F931",
+        "required": [r"\bF\.?\s?931\b|formulario\s*931"],
+        "patterns": [[r"\bAFIP\b|\bARCA\b", 1], [r"SUSS|seguridad social|declaraci[oó]n jurada", 2],
+                     r"per[ií]odo", r"remuneraci"],
+        "issuer": "AFIP",
+        "detail": "DDJJ SUSS",
+        "date_labels": [r"per[ií]odo(?: fiscal)?", r"fecha de presentaci[oó]n"],
+    },
+    # The letter is matched case-sensitively: "factura a nombre de..." is not a Factura A
+    *[
+        {
+            "name": f"factura_{letter.lower()}",
+            "category": "Factura",
+            "type": f"Factura {letter}",
+            "required": [rf"\bfactura\b\s*[:\-]?\s*\"?(?-i:{letter})\b|\bfactura\b[^\n]{{0,40}}\bc[oó]d(?:igo)?\.?\s*(?:n[°º]\s*)?0?{code}\b"],
+            "patterns": [[r"\bCAE\b", 2], r"punto de venta|pto\.?\s*(?:de\s*)?vta", r"\bCUIT\b",
+                         r"fecha de emisi[oó]n", r"\btotal\b"],
+            "issuer_pattern": _INVOICE_ISSUER,
+            "detail_pattern": _INVOICE_NUMBER,
+            "date_labels": [r"fecha de emisi[oó]n", r"\bfecha\b"],
+        }
+        for letter, code in (("A", "01"), ("B", "06"), ("C", "11"))
+    ],
+    *[
+        {
+            "name": f"resumen_{key}",
+            "category": "Resumen",
+            "type": "Resumen Bancario",
+            "required": [bank_pattern, r"resumen de cuenta|extracto|estado de cuenta|movimientos"],
+            "patterns": [[r"\bsaldo\b", 2], r"\bCBU\b", r"caja de ahorro|cuenta corriente", r"per[ií]odo"],
+            "issuer": bank_name,
+            "detail_pattern": r"(caja de ahorros?|cuenta corriente)",
+            "detail": "Resumen de cuenta",
+            "date_labels": [r"fecha de cierre|cierre", r"per[ií]odo|hasta", r"saldo al"],
+        }
+        for key, bank_name, bank_pattern in (
+            ("galicia", "Banco Galicia", r"banco galicia|galicia"),
+            ("santander", "Banco Santander", r"santander"),
+            ("nacion", "Banco Nacion", r"banco de la naci[oó]n|banco naci[oó]n|\bBNA\b"),
+        )
+    ],
+]
+
+
+def parse_date(text: str) -> Optional[str]:
+    """
+    Returns the first valid date of ``text`` as YYYY-MM-DD (periods -> first day).
+    Devuelve la primera fecha válida de ``text`` en formato YYYY-MM-DD.
+    """
+    for match in DATE_VALUE.finditer(text):
+        groups = match.groupdict()
+        if groups["d"]:
+            year, month, day = groups["y"], groups["m"], groups["d"]
+        elif groups["iy"]:
+            year, month, day = groups["iy"], groups["im"], groups["id"]
+        else:
+            year, month, day = groups["py"], groups["pm"], "1"
+        year, month, day = int(year), int(month), int(day)
+        if year < 100:
+            year += 2000
+        if not 1990 <= year <= 2100:
+            continue
+        try:
+            return datetime.date(year, month, day).isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _clean(value: str, max_length: int = 40) -> str:
+    value = " ".join(value.split()).strip(" .,:;-_/")
+    return value[:max_length].rstrip()
+
+
+def rule_hit_rate(stats: Dict[str, Any]) -> float:
+    """
+    Share of analyzed files resolved by rules (rule hits vs. agent calls).
+    Proporción de archivos resueltos por reglas.
+    """
+    analyzed = stats.get("rule_hits", 0) + stats.get("cache_misses", 0)
+    return round(stats.get("rule_hits", 0) / analyzed, 3) if analyzed else 0.0
+
+
+class _CompiledRule:
+    def __init__(self, rule: Dict[str, Any], min_confidence: float):
+        self.name = rule.get("name", "rule")
+        self.category = rule["category"]
+        self.type = rule.get("type", self.category)
+        self.required = [re.compile(pattern, _FLAGS) for pattern in rule.get("required", [])]
+        self.patterns = []
+        for entry in rule.get("patterns", []):
+            pattern, weight = (entry, 1) if isinstance(entry, str) else (entry[0], entry[1])
+            self.patterns.append((re.compile(pattern, _FLAGS), float(weight)))
+        self.min_confidence = float(rule.get("min_confidence", min_confidence))
+        self.issuer = rule.get("issuer")
+        self.issuer_pattern = re.compile(rule["issuer_pattern"], _FLAGS) if rule.get("issuer_pattern") else None
+        self.detail = rule.get("detail")
+        self.detail_pattern = re.compile(rule["detail_pattern"], _FLAGS) if rule.get("detail_pattern") else None
+        self.date_labels = [re.compile(label, _FLAGS) for label in rule.get("date_labels", [])]
+
+    def confidence(self, text: str) -> float:
+        if not all(pattern.search(text) for pattern in self.required):
+            return 0.0
+        total = sum(weight for _, weight in self.patterns)
+        if not total:
+            return 1.0
+        return sum(weight for pattern, weight in self.patterns if pattern.search(text)) / total
+
+    def extract(self, pattern: Optional[re.Pattern], literal: Optional[str], text: str) -> Optional[str]:
+        if pattern is not None:
+            match = pattern.search(text)
+            if match:
+                value = _clean(match.group(1) if match.groups() else match.group(0))
+                if value:
+                    return value
+        return literal
+
+    def extract_date(self, text: str) -> Optional[str]:
+        for label in self.date_labels:
+            for match in label.finditer(text):
+                date = parse_date(text[match.end():match.end() + _LABEL_WINDOW])
+                if date:
+                    return date
+        return parse_date(text)
+
+
+class RuleClassifier:
+    """
+    Compiled set of fast-path rules; the first confident rule wins.
+    Conjunto compilado de reglas; gana la primera regla con confianza suficiente.
+
+    Usage:
+        classifier = RuleClassifier.from_config(agent_config.get("fast_rules"))
+        match = classifier.classify(content) if classifier else None
+        if match:
+            analysis = match["analysis"]
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        """
+        Initialize RuleClassifier.
+
+        Args:
+            rules: Rule definitions (see module docstring), tried in order.
+            min_confidence: Default share of weighted evidence a rule needs.
+        """
+        self.rules = []
+        for rule in rules:
+            try:
+                self.rules.append(_CompiledRule(rule, min_confidence))
+            except (KeyError, IndexError, TypeError, re.error) as e:
+                logger.warning(f"Skipping invalid fast-path rule {rule.get('name', rule)!r}: {e}")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["RuleClassifier"]:
+        """
+        Builds the classifier of a job from ``agent_config["fast_rules"]``.
+        Returns None when the job does not enable rules.
+
+        Config keys: ``enabled``, ``rules`` (job rules, tried first),
+        ``use_default_rules`` (default True) and ``min_confidence``.
+        """
+        config = config or {}
+        if not config.get("enabled", False):
+            return None
+        rules = list(config.get("rules") or [])
+        if config.get("use_default_rules", True):
+            rules.extend(DEFAULT_RULES)
+        return cls(rules, float(config.get("min_confidence", DEFAULT_MIN_CONFIDENCE)))
+
+    def classify(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns ``{"rule", "confidence", "analysis"}`` or None to fall through to the agent.
+        Devuelve el análisis por reglas, o None para delegar en el agente.
+        """
+        if not text:
+            return None
+        for rule in self.rules:
+            confidence = rule.confidence(text)
+            if confidence < rule.min_confidence:
+                continue
+            date = rule.extract_date(text)
+            issuer = rule.extract(rule.issuer_pattern, rule.issuer, text)
+            detail = rule.extract(rule.detail_pattern, rule.detail, text)
+            if not (date and issuer and detail):
+                logger.debug(f"Rule {rule.name} matched but date/issuer/detail are missing")
+                continue
+            return {
+                "rule": rule.name,
+                "confidence": round(confidence, 3),
+                "analysis": {
+                    "date": date,
+                    "keywords": [rule.type, issuer, detail],
+                    "category": rule.category,
+                },
+            }
+        return None
@@ -0,0 +1,210 @@
+"""
+Run Registry - Estado en vivo de las ejecuciones de jobs
+========================================================
+
+Keeps track of job runs executing in background threads so HTTP endpoints
+can return immediately and report progress later. Each ``RunState`` holds
+the counters of the folders already finished plus the pipeline currently
+running, so a snapshot shows live per-stage timings.
+Registra las ejecuciones de jobs en segundo plano para que los endpoints
+respondan de inmediato y reporten el progreso en vivo.
+
+With a ``store`` (DatabaseManager), a snapshot of every run is written when
+it is queued, starts, finishes a folder and ends, so any instance can answer
+for a run started on another one (with progress as of the last write).
+Con un ``store`` los runs se persisten y cualquier instancia puede consultarlos.
+
+:created:   2026-10-17
+:filename:  run_registry.py
+:author:    amBotHs + CENF
+:version:   1.0.0
+:status:    Development
+:license:   MIT
+:copyright: Copyright (c) 2026 CENF
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from .pipeline import StagedPipeline, merge_stage_stats
+
+logger = logging.getLogger(__name__)
+
+RUN_STATUSES = ("queued", "running", "success", "error")
+
+# Per-folder counters reported while a pipeline is running
+PROGRESS_COUNTERS = ("files_processed", "files_renamed", "errors", "cache_hits", "cache_misses",
+                     "llm_batches", "batched_files", "tokens_sent", "tokens_saved",
+                     "rule_hits", "rule_seconds_saved", "category_hints")
+
+
+class RunState:
+    """
+    Live state of one job run.
+    Estado en vivo de una ejecución de job.
+    """
+
+    def __init__(self, run_id: str, job_id: Optional[str], on_change: Optional[Callable[["RunState"], None]] = None):
+        self.run_id = run_id
+        self.job_id = job_id
+        self.status = "queued"
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._completed: Dict[str, Any] = {"stages": {}}
+        self._pipeline: Optional[StagedPipeline] = None
+        self._pipeline_stats: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._on_change = on_change
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def start(self) -> None:
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.monotonic()
+        self._changed()
+
+    def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.finished_at = time.monotonic()
+            self.result = result
+            self.error = error or (result or {}).get("error")
+            self.status = "error" if self.error or (result or {}).get("status") == "error" else "success"
+        self._changed()
+
+    def attach_pipeline(self, pipeline: StagedPipeline, folder_stats: Dict[str, Any]) -> None:
+        """
+        Registers the running pipeline and its (live) folder counters.
+        Registra el pipeline en ejecución y sus contadores en vivo.
+        """
+        with self._lock:
+            self._pipeline = pipeline
+            self._pipeline_stats = folder_stats
+
+    def complete_folder(self, folder_stats: Dict[str, Any]) -> None:
+        """
+        Folds the final stats of a finished folder into the run totals.
+        Suma las estadísticas finales de una carpeta a los totales del run.
+        """
+        with self._lock:
+            for key in PROGRESS_COUNTERS:
+                self._completed[key] = self._completed.get(key, 0) + folder_stats.get(key, 0)
+            merge_stage_stats(self._completed["stages"], folder_stats.get("stages", {}))
+            self._pipeline = None
+            self._pipeline_stats = None
+        self._changed()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable view of the run, including live pipeline stats.
+        Devuelve una vista serializable del run, con las estadísticas en vivo.
+        """
+        with self._lock:
+            progress = copy.deepcopy(self._completed)
+            pipeline = self._pipeline
+            live_stats = dict(self._pipeline_stats or {})
+            end = self.finished_at or time.monotonic()
+            elapsed = round(end - self.started_at, 3) if self.started_at else 0.0
+            view = {
+                "run_id": self.run_id,
+                "job_id": self.job_id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "elapsed_seconds": elapsed,
+                "error": self.error,
+            }
+
+        for key in PROGRESS_COUNTERS:
+            progress[key] = progress.get(key, 0) + live_stats.get(key, 0)
+        if pipeline is not None:
+            pipeline_view = pipeline.stats()
+            merge_stage_stats(progress["stages"], pipeline_view["stages"])
+            progress["current_pipeline_seconds"] = pipeline_view["elapsed_seconds"]
+        view["progress"] = progress
+        if self.result is not None:
+            view["result"] = self.result
+        return view
+
+
+class RunRegistry:
+    """
+    Thread-safe registry of recent runs (oldest finished runs are dropped).
+    Registro thread-safe de las ejecuciones recientes.
+    """
+
+    def __init__(self, max_runs: int = 200, store=None):
+        """
+        Initialize RunRegistry.
+
+        Args:
+            max_runs: Runs kept in memory.
+            store: Optional DatabaseManager where run snapshots are persisted
+                   (keyed by ``id`` = run_id), shared by every instance.
+        """
+        self.max_runs = max(1, int(max_runs))
+        self.store = store
+        self._runs: "OrderedDict[str, RunState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+
+    def create(self, run_id: str, job_id: Optional[str]) -> RunState:
+        state = RunState(run_id, job_id, on_change=self._persist if self.store is not None else None)
+        with self._lock:
+            self._runs[run_id] = state
+            self._evict()
+        if self.store is not None:
+            self._persist(state)
+        return state
+
+    def get(self, run_id: str) -> Optional[RunState]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def snapshot(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Snapshot of a run: live if it runs on this instance, else the last persisted one.
+        Vista de un run: en vivo si corre en esta instancia, si no la última persistida.
+        """
+        state = self.get(run_id)
+        if state is not None:
+            return state.snapshot()
+        if self.store is None:
+            return None
+        try:
+            records = self.store.find("id", run_id)
+        except Exception as e:
+            logger.error(f"Failed to read run {run_id} from the run store: {e}")
+            return None
+        if not records:
+            return None
+        view = dict(records[0])
+        view.pop("id", None)
+        return view
+
+    def _persist(self, state: RunState) -> None:
+        # Persistence is best effort: it must never fail the run itself
+        try:
+            with self._store_lock:
+                self.store.upsert_many([dict(state.snapshot(), id=state.run_id)], key="id")
+        except Exception as e:
+            logger.warning(f"Failed to persist run {state.run_id}: {e}")
+
+    def _evict(self) -> None:
+        if len(self._runs) <= self.max_runs:
+            return
+        # Never forget a run that is still queued or running
+        for run_id in list(self._runs):
+            if len(self._runs) <= self.max_runs:
+                break
+            if self._runs[run_id].status not in ("queued", "running"):
+                del self._runs[run_id]
@@ -20,6 +20,7 @@ import re
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -37,6 +38,10 @@ from core_renombrador.config_manager import ConfigManager
 from core_renombrador.logger_manager import LoggerManager
 from core_renombrador.database_manager import DatabaseManager
 from core_renombrador.file_manager import FileManager
+from core_renombrador.client_registry import ClientRegistry
+from core_renombrador.quota_governor import configure_quota_governor
+from core_renombrador.drive_lister import get_start_page_token
+from core_renombrador.job_sharding import DEFAULT_SHARD_SIZE, ShardTracker, new_run_id, plan_job_shards
 from core_renombrador.oauth_security import (
     OAuthSecurityManager,
     create_oauth_manager_from_config
@@ -98,6 +103,23 @@ else:
     )
     logger.info("DatabaseManager initialized in JSON mode")
 
+# Shard/run tables shared with the workers (partly dispatched runs are recorded here)
+if use_supabase:
+    shard_tracker = ShardTracker(
+        DatabaseManager(use_supabase=True, table_name="job_shards"),
+        DatabaseManager(use_supabase=True, table_name="job_runs")
+    )
+elif use_gcs:
+    shard_tracker = ShardTracker(
+        DatabaseManager(use_gcs=True, table_name="job_shards"),
+        DatabaseManager(use_gcs=True, table_name="job_runs")
+    )
+else:
+    shard_tracker = ShardTracker(
+        DatabaseManager(file_manager=file_manager, db_path="data/job_shards.json"),
+        DatabaseManager(file_manager=file_manager, db_path="data/job_runs.json")
+    )
+
 # OAuth Security Manager
 oauth_manager = None
 try:
@@ -125,6 +147,10 @@ WORKER_URL = os.environ.get("WORKER_URL")
 if not all([GCP_PROJECT, WORKER_URL]):
     logger.warning("Cloud Tasks not fully configured. Task dispatch will fail.")
 
+# Sharding: full runs of scheduled jobs are split into one task per N files
+SHARDING_ENABLED = os.environ.get("SHARDING_ENABLED", "true").lower() == "true"
+SHARD_FILE_COUNT = int(os.environ.get("SHARD_FILE_COUNT", str(DEFAULT_SHARD_SIZE)))
+
 # FastAPI App
 app = FastAPI(
     title="API Server - RenameDriverFolders",
@@ -251,6 +277,102 @@ def create_cloud_task(payload: dict) -> str:
     return task_id
 
 
+# Drive API pacing for shard planning (the quota is shared with the workers)
+configure_quota_governor(
+    qps=float(os.environ.get("DRIVE_QPS", "20")),
+    quota_user=os.environ.get("DRIVE_QUOTA_USER") or None
+)
+
+# Read-only Drive clients (used to plan shards), built on first use
+drive_clients = ClientRegistry(scopes=["https://www.googleapis.com/auth/drive.readonly"])
+
+
+def get_drive_service():
+    """
+    Return the read-only Drive service of the calling thread.
+    Devuelve el servicio de Drive de solo lectura del thread.
+    """
+    return drive_clients.drive_service()
+
+
+def dispatch_scheduled_job(job: dict) -> dict:
+    """
+    Enqueue the Cloud Tasks of one scheduled job.
+    Encola las tareas de Cloud Tasks de un job programado.
+
+    Incremental runs (job with a Changes API token) only touch recent
+    changes and go out as a single task. Full runs are split into shards of
+    SHARD_FILE_COUNT files, one task each, so several worker instances share
+    the job; the worker finishing the last shard aggregates the run.
+
+    Blocking (Drive listing and Cloud Tasks calls): run it in a thread pool.
+    """
+    job_id = job.get("id")
+    incremental = job.get("incremental", True)
+    single_task = (
+        not SHARDING_ENABLED
+        or job.get("sharding") is False
+        or (incremental and job.get("changes_page_token"))
+    )
+
+    if not single_task:
+        try:
+            drive_service = get_drive_service()
+            # Taken before listing so changes made during the run are seen next time
+            page_token = get_start_page_token(drive_service) if incremental else None
+            shards = plan_job_shards(drive_service, job, job.get("shard_size") or SHARD_FILE_COUNT)
+        except Exception as e:
+            logger.warning(f"Could not shard job {job_id} ({e}). Falling back to a single task.")
+            single_task = True
+
+    if single_task:
+        task_id = create_cloud_task({"job_id": job_id, "trigger_type": "scheduled"})
+        return {"job_id": job_id, "status": "task_created", "task_id": task_id}
+
+    if not shards:
+        if page_token:
+            db_manager.update("id", job_id, {"changes_page_token": page_token})
+        return {"job_id": job_id, "status": "no_files"}
+
+    run_id = new_run_id()
+    task_ids = []
+    try:
+        for shard_index, shard in enumerate(shards):
+            task_ids.append(create_cloud_task({
+                "job_id": job_id,
+                "trigger_type": "scheduled",
+                "folder_id": shard["folder_id"],
+                "run_id": run_id,
+                "shard_index": shard_index,
+                "shard_count": len(shards),
+                "file_ids": shard["file_ids"],
+                "changes_page_token": page_token
+            }))
+    except Exception as e:
+        # Shards already enqueued will run: record how many, so the run still
+        # aggregates (as "partial", without moving the Changes token)
+        try:
+            shard_tracker.record_dispatch_failure(run_id, job_id, len(shards), len(task_ids), str(e))
+        except Exception as record_error:
+            logger.error(f"Failed to record partial dispatch of run {run_id}: {record_error}")
+        return {
+            "job_id": job_id,
+            "status": "error",
+            "error": f"Dispatched {len(task_ids)}/{len(shards)} shards: {e}",
+            "run_id": run_id,
+            "shards": len(shards),
+            "task_ids": task_ids
+        }
+    logger.info(f"Job {job_id} dispatched as run {run_id} with {len(shards)} shard tasks")
+    return {
+        "job_id": job_id,
+        "status": "task_created",
+        "run_id": run_id,
+        "shards": len(shards),
+        "task_ids": task_ids
+    }
+
+
 def verify_oauth_token(request: Request) -> dict:
     """
     Verify OAuth token from request.
@@ -558,24 +680,16 @@ async def process_scheduled_jobs(request: Request):
                 "jobs_processed": 0
             }
         
-        # Create tasks for each job
+        # Create tasks for each job (one per shard for large full runs)
         results = []
         for job in scheduled_jobs:
             job_id = job.get("id")
             
-            payload = {
-                "job_id": job_id,
-                "trigger_type": "scheduled"
-            }
-            
             try:
-                task_id = create_cloud_task(payload)
-                results.append({
-                    "job_id": job_id,
-                    "status": "task_created",
-                    "task_id": task_id
-                })
-                logger.info(f"Task created for scheduled job: {job_id}")
+                # Shard planning lists Drive: keep it off the event loop
+                result = await run_in_threadpool(dispatch_scheduled_job, job)
+                results.append(result)
+                logger.info(f"Scheduled job {job_id} dispatched: {result['status']}")
                 
             except Exception as e:
                 logger.error(f"Error creating task for job {job_id}: {e}")
@@ -585,7 +699,7 @@ async def process_scheduled_jobs(request: Request):
                     "error": str(e)
                 })
         
-        success_count = sum(1 for r in results if r["status"] == "task_created")
+        success_count = sum(len(r.get("task_ids", [r.get("task_id")])) for r in results if r["status"] == "task_created")
         
         return {
             "status": "success",
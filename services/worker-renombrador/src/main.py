@@ -15,16 +15,20 @@ Soporta múltiples jobs con diferentes configuraciones y schedules.
 """
 
 import os
+import socket
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
 
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
-import google.auth
 from google.oauth2 import service_account
-from google.cloud import storage
-from googleapiclient.discovery import build
 
 # Core modules
 from core_renombrador.config_manager import ConfigManager
@@ -33,7 +37,40 @@ from core_renombrador.database_manager import DatabaseManager
 from core_renombrador.file_manager import FileManager
 from core_renombrador.agent_factory import AgentFactory, create_document_agent
 from core_renombrador.drive_handler import DriveHandler
+from core_renombrador.client_registry import ClientRegistry, get_client_registry
+from core_renombrador.quota_governor import configure_quota_governor, get_quota_governor
+from core_renombrador.category_model import CategoryModel, CategorySampleRecorder
+from core_renombrador.concurrency import AdaptiveLimiter
+from core_renombrador.content_budget import DEFAULT_MAX_TOKENS, ContentBudgeter, estimate_tokens
 from core_renombrador.content_extractor import ContentExtractor
+from core_renombrador.drive_batch import BatchedRenamer, DriveBatcher, MAX_BATCH_SIZE
+from core_renombrador.drive_download import (
+    MB,
+    RangedDriveReader,
+    download_parallel_ranges,
+    download_to_spool,
+    export_to_spool,
+    is_exportable,
+    is_google_native
+)
+from core_renombrador.drive_lister import (
+    FOLDER_MIME_TYPE,
+    changes_checkpoint,
+    find_target_folders,
+    folder_children_query,
+    get_start_page_token,
+    iter_change_pages,
+    iter_drive_pages
+)
+from core_renombrador.analysis_cache import AnalysisCache, agent_config_hash
+from core_renombrador.filename_template import FolderNameIndex, compile_template
+from core_renombrador.job_sharding import ShardTracker, new_run_id
+from core_renombrador.llm_cache import LLMResponseCache, llm_cache_key
+from core_renombrador.models import FileAnalysis, batch_model_for
+from core_renombrador.pipeline import StagedPipeline, PipelineStage, merge_stage_stats
+from core_renombrador.rename_plan import RenamePlan, RenamePlanStore
+from core_renombrador.rule_classifier import RuleClassifier, rule_hit_rate
+from core_renombrador.run_registry import RunRegistry
 
 # --- Initialization ---
 config_manager = ConfigManager(config_path="config.json")
@@ -70,16 +107,188 @@ else:
     )
     logger.info("DatabaseManager initialized in JSON mode")
 
+# Run snapshots shared by every instance (GET /runs/{run_id} works on any of them)
+if use_supabase:
+    run_store = DatabaseManager(use_supabase=True, table_name="worker_runs")
+elif use_gcs:
+    run_store = DatabaseManager(use_gcs=True, table_name="worker_runs")
+else:
+    run_store = DatabaseManager(file_manager=file_manager, db_path="data/worker_runs.json")
+
+# Processed-file ledger (job + config hash + fileId + modifiedTime + md5 of every renamed file)
+if use_supabase:
+    ledger_db = DatabaseManager(use_supabase=True, table_name="processed_files")
+elif use_gcs:
+    ledger_db = DatabaseManager(use_gcs=True, table_name="processed_files")
+else:
+    ledger_db = DatabaseManager(file_manager=file_manager, db_path="data/processed_files.json")
+
+# Sharded runs: one record per finished shard, one aggregated record per run
+if use_supabase:
+    shard_tracker = ShardTracker(
+        DatabaseManager(use_supabase=True, table_name="job_shards"),
+        DatabaseManager(use_supabase=True, table_name="job_runs")
+    )
+elif use_gcs:
+    shard_tracker = ShardTracker(
+        DatabaseManager(use_gcs=True, table_name="job_shards"),
+        DatabaseManager(use_gcs=True, table_name="job_runs")
+    )
+else:
+    shard_tracker = ShardTracker(
+        DatabaseManager(file_manager=file_manager, db_path="data/job_shards.json"),
+        DatabaseManager(file_manager=file_manager, db_path="data/job_runs.json")
+    )
+
 # Agent Factory
 agent_factory = AgentFactory(
     database_manager=db_manager,
-    config_manager=config_manager
+    config_manager=config_manager,
+    max_cached_agents=int(os.environ.get("AGENT_CACHE_SIZE", "32"))
+)
+
+# Drive API pacing shared by every Drive client of the process (worker and DriveHandler)
+drive_quota_user = os.environ.get("DRIVE_QUOTA_USER") or None
+if drive_quota_user == "instance":
+    # Split the per-user quota between instances
+    drive_quota_user = f"{os.environ.get('K_REVISION', 'worker')}-{socket.gethostname()}"
+configure_quota_governor(
+    qps=float(os.environ.get("DRIVE_QPS", "20")),
+    burst=int(os.environ["DRIVE_QPS_BURST"]) if os.environ.get("DRIVE_QPS_BURST") else None,
+    quota_user=drive_quota_user,
+    max_retries=int(os.environ.get("DRIVE_RATE_LIMIT_RETRIES", "5"))
 )
 
+# Credentials and Google API clients are built once per process
+client_registry = get_client_registry()
+
 # Content Extractor with OCR
 enable_ocr = os.environ.get("ENABLE_OCR", "true").lower() == "true"
-content_extractor = ContentExtractor(enable_ocr=enable_ocr)
-logger.info(f"ContentExtractor initialized (OCR: {enable_ocr})")
+ocr_max_pages = int(os.environ.get("OCR_MAX_PAGES", "2")) or None  # 0 = every page
+
+# Process pool shared by every file of every job for PDF page-range text extraction
+# (0 = serial). Spawned, not forked: the parent holds threads and gRPC clients.
+PDF_PAGE_PROCESSES = int(os.environ.get("PDF_PAGE_PROCESSES", str(min(4, (os.cpu_count() or 1) - 1))))
+pdf_page_pool = None
+if PDF_PAGE_PROCESSES > 0:
+    pdf_page_pool = ProcessPoolExecutor(
+        max_workers=PDF_PAGE_PROCESSES,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+content_extractor = ContentExtractor(
+    enable_ocr=enable_ocr,
+    max_chars=int(os.environ.get("EXTRACT_MAX_CHARS", "32000")),  # ContentBudgeter then fits it to the job's token budget
+    ocr_max_pages=ocr_max_pages,
+    vision_client=client_registry.vision_client() if enable_ocr else None,
+    page_pool=pdf_page_pool,
+    page_workers=max(1, PDF_PAGE_PROCESSES),
+    parallel_min_pages=int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "16")),
+    pages_per_task=int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+)
+logger.info(
+    f"ContentExtractor initialized (OCR: {enable_ocr}, OCR max pages: {ocr_max_pages or 'all'}, "
+    f"PDF page processes: {PDF_PAGE_PROCESSES if pdf_page_pool else 'serial'})"
+)
+
+# Pipeline worker pool sizes (overridable per job via job_config["pipeline"])
+PIPELINE_SETTINGS = {
+    "download_workers": int(os.environ.get("PIPELINE_DOWNLOAD_WORKERS", "8")),
+    "extract_workers": int(os.environ.get("PIPELINE_EXTRACT_WORKERS", "4")),
+    "llm_workers": int(os.environ.get("PIPELINE_LLM_WORKERS", "4")),
+    "rename_workers": int(os.environ.get("PIPELINE_RENAME_WORKERS", "2")),
+}
+logger.info(f"Pipeline settings: {PIPELINE_SETTINGS}")
+
+# Scheduled jobs run concurrently in /run-task; stage pools are split between them
+JOB_PARALLELISM = max(1, int(os.environ.get("JOB_PARALLELISM", "3")))
+
+# JSON/GCS tables are read-modify-write: serialize writes from concurrent jobs
+db_write_lock = threading.Lock()
+
+# Downloads stream into spooled buffers: in memory up to max_memory, then temp file
+DOWNLOAD_SETTINGS = {
+    "chunk_size": int(os.environ.get("DOWNLOAD_CHUNK_SIZE_MB", "8")) * MB,
+    "max_memory": int(os.environ.get("DOWNLOAD_SPOOL_MEMORY_MB", "16")) * MB,
+    "max_size": int(os.environ.get("DOWNLOAD_MAX_SIZE_MB", "200")) * MB,
+    "range_block": int(os.environ.get("DOWNLOAD_RANGE_BLOCK_KB", "64")) * 1024,
+    "parallel_threshold": int(os.environ.get("DOWNLOAD_PARALLEL_THRESHOLD_MB", "32")) * MB,
+    "parallel_chunks": int(os.environ.get("DOWNLOAD_PARALLEL_CHUNKS", "4")),
+}
+
+# Shared pool for ranged chunk downloads of very large files
+range_executor = ThreadPoolExecutor(
+    max_workers=DOWNLOAD_SETTINGS["parallel_chunks"],
+    thread_name_prefix="drive-range"
+)
+
+# Text-like files are read through ranged requests (only the needed bytes)
+RANGED_TEXT_EXTENSIONS = {".txt", ".csv", ".tsv", ".json", ".xml", ".md", ".log"}
+
+# Analysis cache keyed by Drive md5Checksum + agent_config hash
+analysis_cache = AnalysisCache(
+    max_entries=int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", "5000")),
+    file_manager=file_manager,
+    cache_path="data/analysis_cache.json",
+    gcs_bucket_name=os.environ.get("GCS_BUCKET_NAME") if use_gcs else None
+)
+
+# Reviewable rename plans (process_job run_mode="plan" / "apply")
+plan_store = RenamePlanStore(
+    directory="data/plans",
+    gcs_bucket_name=os.environ.get("GCS_BUCKET_NAME") if use_gcs else None,
+    storage_client=client_registry.storage_client() if use_gcs else None
+)
+
+# Concurrent Drive batch requests when applying a plan
+APPLY_PARALLEL_BATCHES = int(os.environ.get("APPLY_PARALLEL_BATCHES", "4"))
+
+# Response cache keyed by model, generation params, output schema and prompt hash.
+# The local tier lives on Cloud Run's in-memory disk: off by default when GCS is shared.
+llm_cache = None
+if os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true":
+    llm_cache = LLMResponseCache(
+        cache_dir=os.environ.get("LLM_CACHE_DIR", "data/llm_cache"),
+        ttl_seconds=int(float(os.environ.get("LLM_CACHE_TTL_DAYS", "30")) * 24 * 3600),
+        max_disk_bytes=int(os.environ.get("LLM_CACHE_MAX_MB", "0" if use_gcs else "256")) * 1024 * 1024,
+        gcs_bucket_name=os.environ.get("GCS_BUCKET_NAME") if use_gcs else None,
+        storage_client=client_registry.storage_client() if use_gcs else None
+    )
+
+# Local category classifier (trained offline with `python -m core_renombrador.category_model train`)
+category_model = None
+if os.environ.get("CATEGORY_MODEL_PATH"):
+    try:
+        category_model = CategoryModel.load(
+            os.environ["CATEGORY_MODEL_PATH"],
+            storage_client=client_registry.storage_client() if os.environ["CATEGORY_MODEL_PATH"].startswith("gs://") else None
+        )
+    except Exception as e:
+        logger.warning(f"Could not load category model ({e}). Category pre-labeling disabled.")
+
+# (extracted text, category) pairs from Gemini analyses, used to train the category model
+sample_recorder = None
+if os.environ.get("CATEGORY_SAMPLES", "false").lower() == "true":
+    sample_recorder = CategorySampleRecorder(
+        directory="data/category_samples",
+        gcs_bucket_name=os.environ.get("GCS_BUCKET_NAME") if use_gcs else None,
+        storage_client=client_registry.storage_client() if use_gcs else None
+    )
+
+# Gemini calls in flight across all jobs: AIMD limit with 429-aware retries
+gemini_limiter = AdaptiveLimiter(
+    initial_limit=int(os.environ.get("GEMINI_INITIAL_CONCURRENCY", "4")),
+    max_limit=int(os.environ.get("GEMINI_MAX_CONCURRENCY", "16")),
+    latency_target=float(os.environ.get("GEMINI_LATENCY_TARGET_SECONDS", "20")),
+    retry_budget=float(os.environ.get("GEMINI_RETRY_BUDGET_SECONDS", "120"))
+)
+
+# Jobs run off the event loop so /health and /runs stay responsive
+job_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("WORKER_MAX_RUNS", "4")),
+    thread_name_prefix="run"
+)
+run_registry = RunRegistry(max_runs=int(os.environ.get("RUN_HISTORY_SIZE", "200")), store=run_store)
 
 # Lifespan manager
 @asynccontextmanager
@@ -94,6 +303,9 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("Shutting down Worker...")
+    job_executor.shutdown(wait=False, cancel_futures=True)
+    if pdf_page_pool is not None:
+        pdf_page_pool.shutdown(wait=False, cancel_futures=True)
 
 # FastAPI app
 app = FastAPI(
@@ -114,6 +326,12 @@ class TaskPayload(BaseModel):
     folder_id: Optional[str] = None
     user_token: Optional[str] = None
     trigger_type: str = "scheduled"  # "scheduled" or "manual"
+    # Sharded runs (see core_renombrador.job_sharding)
+    run_id: Optional[str] = None
+    shard_index: Optional[int] = None
+    shard_count: Optional[int] = None
+    file_ids: Optional[List[str]] = None
+    changes_page_token: Optional[str] = None  # Saved once every shard of the run finished
 
 
 class JobRunRequest(BaseModel):
@@ -122,6 +340,8 @@ class JobRunRequest(BaseModel):
     """
     job_id: str
     folder_id: Optional[str] = None  # For manual jobs
+    mode: str = "run"                # "run", "plan" (store a rename plan) or "apply" (apply plan_id)
+    plan_id: Optional[str] = None    # Plan to apply
 
 
 # --- Helper Functions ---
@@ -130,17 +350,12 @@ def get_credentials():
     """
     Get Google Cloud credentials (Service Account or ADC).
     Obtiene credenciales de Google Cloud (Service Account o ADC).
-    """
-    SCOPES = [
-        "https://www.googleapis.com/auth/drive",
-        "https://www.googleapis.com/auth/cloud-platform"
-    ]
     
+    Resolved once and cached by the ClientRegistry.
+    """
     try:
-        # Try Application Default Credentials first (Cloud Run)
-        credentials, project_id = google.auth.default(scopes=SCOPES)
-        logger.info("Using Application Default Credentials")
-        return credentials
+        # Application Default Credentials (Cloud Run)
+        return client_registry.get_credentials()
     except Exception as e:
         logger.error(f"Failed to get credentials: {e}")
         raise
@@ -185,7 +400,13 @@ def get_all_active_jobs() -> list:
 def process_job(
     job_config: Dict[str, Any],
     folder_id: Optional[str] = None,
-    credentials = None
+    credentials = None,
+    job_share: int = 1,
+    file_ids: Optional[List[str]] = None,
+    run_state=None,
+    run_mode: str = "run",
+    plan_id: Optional[str] = None,
+    trigger: str = "manual"
 ) -> Dict[str, Any]:
     """
     Process a single job.
@@ -195,6 +416,17 @@ def process_job(
         job_config: Job configuration from database.
         folder_id: Override folder ID (for manual jobs).
         credentials: Google Cloud credentials.
+        job_share: Number of jobs running concurrently; pipeline worker
+                   pools are divided by it so jobs share the Drive/Gemini budget.
+        file_ids: Precomputed files of one shard (``folder_id`` is the shard's
+                  folder); skips listing and the Changes API.
+        run_state: Optional RunState that receives live progress.
+        run_mode: "run" (analyze and rename), "plan" (analyze and store a
+                  rename plan without touching Drive) or "apply" (rename
+                  from the stored plan ``plan_id``).
+        plan_id: Plan to write ("plan", defaults to the run ID) or apply.
+        trigger: "scheduled" (Cloud Tasks / /run-task) or "manual" (/run-job).
+                 Only scheduled runs use the Changes API token.
     
     Returns:
         Result dictionary with status and stats.
@@ -208,16 +440,24 @@ def process_job(
         # Use provided folder_id or get from config
         target_folder_id = folder_id or job_config.get("source_folder_id")
         
+        if run_mode == "apply":
+            return apply_rename_plan(job_config, plan_id, credentials, run_state)
+        
         if not target_folder_id or target_folder_id == "DYNAMIC":
             raise ValueError(f"No folder_id provided for job '{job_id}'")
         
-        # Create agent for this job using AgentFactory
-        agent = agent_factory.create_agent_from_job_config(job_config)
-        logger.info(f"Agent created for job '{job_name}'")
+        # Plan mode: analyses are stored as a rename plan, Drive is left untouched
+        plan = None
+        if run_mode == "plan":
+            plan_id = plan_id or (run_state.run_id if run_state is not None else new_run_id())
+            plan = RenamePlan(plan_id, job_id)
         
-        # Initialize Drive service
-        drive_service = build("drive", "v3", credentials=credentials)
-        storage_client = storage.Client(credentials=credentials)
+        # Reuse pooled clients (per-thread Drive services with keep-alive connections)
+        registry = client_registry
+        if credentials is not None and credentials is not client_registry.get_credentials():
+            registry = ClientRegistry(credentials=credentials)
+        drive_service = registry.drive_service()
+        drive_service_factory = registry.drive_service_factory()
         
         # Get target folder names
         target_folder_names = job_config.get("target_folder_names", ["*"])
@@ -226,11 +466,21 @@ def process_job(
         stats = {
             "files_processed": 0,
             "files_renamed": 0,
-            "errors": 0
+            "errors": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "llm_batches": 0,
+            "batched_files": 0,
+            "tokens_sent": 0,
+            "tokens_saved": 0,
+            "rule_hits": 0,
+            "rule_seconds_saved": 0.0,
+            "category_hints": 0,
+            "stages": {}
         }
         
         # If target_folder_names is ["*"], process all files in folder
-        if target_folder_names == ["*"]:
+        if file_ids is not None or target_folder_names == ["*"]:
             folders_to_process = [target_folder_id]
         else:
             # Find specific subfolders
@@ -240,30 +490,125 @@ def process_job(
                 target_folder_names
             )
         
-        for folder in folders_to_process:
-            folder_stats = process_folder_files(
-                drive_service=drive_service,
-                folder_id=folder,
-                agent=agent,
-                job_config=job_config
-            )
+        # Files to replay on the next incremental run, and whether every listing completed
+        failed_file_ids = []
+        listing_complete = True
+        
+        def add_folder_stats(folder_stats):
+            nonlocal listing_complete
+            failed_file_ids.extend(folder_stats.pop("failed_file_ids"))
+            listing_complete = listing_complete and folder_stats.pop("listing_complete")
             stats["files_processed"] += folder_stats["files_processed"]
             stats["files_renamed"] += folder_stats["files_renamed"]
             stats["errors"] += folder_stats["errors"]
+            stats["cache_hits"] += folder_stats["cache_hits"]
+            stats["cache_misses"] += folder_stats["cache_misses"]
+            stats["llm_batches"] += folder_stats["llm_batches"]
+            stats["batched_files"] += folder_stats["batched_files"]
+            stats["tokens_sent"] += folder_stats["tokens_sent"]
+            stats["tokens_saved"] += folder_stats["tokens_saved"]
+            stats["rule_hits"] += folder_stats["rule_hits"]
+            stats["rule_seconds_saved"] += folder_stats["rule_seconds_saved"]
+            stats["category_hints"] += folder_stats["category_hints"]
+            merge_stage_stats(stats["stages"], folder_stats["stages"])
+            if run_state is not None:
+                run_state.complete_folder(folder_stats)
+        
+        # Scheduled runs are incremental: only consume Drive changes since the last run.
+        # Manual runs (/run-job) always list everything, even for scheduled jobs.
+        incremental = (
+            plan is None
+            and folder_id is None
+            and trigger == "scheduled"
+            and job_config.get("incremental", True)
+        )
+        page_token = job_config.get("changes_page_token") if incremental else None
+        
+        if file_ids is not None:
+            stats["mode"] = "shard"
+            add_folder_stats(process_folder_files(
+                drive_service=drive_service,
+                folder_id=target_folder_id,
+                job_config=job_config,
+                drive_service_factory=drive_service_factory,
+                job_share=job_share,
+                run_state=run_state,
+                file_pages=iter_file_id_pages(drive_service, file_ids),
+                plan=plan
+            ))
+        elif page_token:
+            stats["mode"] = "incremental"
+            token_holder = {}
+            add_folder_stats(process_folder_files(
+                drive_service=drive_service,
+                folder_id="changes-feed",
+                job_config=job_config,
+                drive_service_factory=drive_service_factory,
+                job_share=job_share,
+                run_state=run_state,
+                file_pages=iter_changed_file_pages(
+                    drive_service, page_token, set(folders_to_process), token_holder,
+                    retry_file_ids=job_config.get("changes_retry_file_ids") or []
+                )
+            ))
+            if not token_holder.get("token") or not listing_complete:
+                # Token rejected (expired/invalid) or listing failed: next run does a full listing
+                logger.warning(f"Changes feed for job '{job_id}' did not complete. Resetting page token.")
+            save_changes_checkpoint(
+                job_id, changes_checkpoint(token_holder.get("token"), listing_complete, failed_file_ids)
+            )
+        else:
+            stats["mode"] = "full"
+            # Take the token before listing so changes made during the run are not missed
+            new_page_token = get_start_page_token(drive_service) if incremental else None
+            
+            for folder in folders_to_process:
+                add_folder_stats(process_folder_files(
+                    drive_service=drive_service,
+                    folder_id=folder,
+                    job_config=job_config,
+                    drive_service_factory=drive_service_factory,
+                    job_share=job_share,
+                    run_state=run_state,
+                    plan=plan
+                ))
+            
+            if new_page_token:
+                save_changes_checkpoint(
+                    job_id, changes_checkpoint(new_page_token, listing_complete, failed_file_ids)
+                )
+        
+        analysis_cache.flush()
+        if sample_recorder is not None:
+            sample_recorder.flush()
+        if llm_cache is not None:
+            logger.info(f"LLM response cache: {llm_cache.stats()}")
+        logger.info(f"Gemini concurrency: {gemini_limiter.metrics()}")
+        stats["rule_seconds_saved"] = round(stats["rule_seconds_saved"], 3)
+        stats["rule_hit_rate"] = rule_hit_rate(stats)
+        
+        if plan is not None:
+            stats["files_planned"] = len(plan.entries)
+            plan_store.save(plan)
         
         logger.info(
             f"Job '{job_name}' completed. "
             f"Processed: {stats['files_processed']}, "
             f"Renamed: {stats['files_renamed']}, "
-            f"Errors: {stats['errors']}"
+            f"Errors: {stats['errors']}, "
+            f"Cache hits: {stats['cache_hits']}, "
+            f"Rule hits: {stats['rule_hits']} ({stats['rule_hit_rate']:.0%}, ~{stats['rule_seconds_saved']}s saved)"
         )
         
-        return {
+        result = {
             "status": "success",
             "job_id": job_id,
             "job_name": job_name,
             "stats": stats
         }
+        if plan is not None:
+            result["plan_id"] = plan.plan_id
+        return result
         
     except Exception as e:
         logger.error(f"Error processing job '{job_name}': {e}", exc_info=True)
@@ -275,149 +620,828 @@ def process_job(
         }
 
 
-def find_target_folders(
+# Listing field mask: md5Checksum/size feed the analysis cache,
+# modifiedTime/md5Checksum the processed-file ledger
+LIST_FILE_FIELDS = "id, name, mimeType, md5Checksum, size, modifiedTime"
+LEDGER_FILE_FIELDS = "id, name, md5Checksum, modifiedTime"
+CHANGE_FIELDS = f"fileId, removed, file({LIST_FILE_FIELDS}, parents, trashed)"
+
+
+def apply_rename_plan(
+    job_config: Dict[str, Any],
+    plan_id: Optional[str],
+    credentials=None,
+    run_state=None
+) -> Dict[str, Any]:
+    """
+    Apply a stored rename plan through concurrent Drive batch updates.
+    Aplica un plan de renombrado guardado mediante lotes de Drive concurrentes.
+
+    No downloads and no model calls: per batch of up to 100 entries, one
+    ``files.get`` batch checks the files are unchanged since planning and one
+    ``files.update`` batch renames them, APPLY_PARALLEL_BATCHES at a time
+    (paced by the Drive quota governor). Changed files are skipped as stale.
+    An applied plan is refused; a partial one only retries its failed files.
+    Renamed files are recorded in the processed-file ledger.
+    """
+    job_id = job_config.get("id")
+    plan = plan_store.load(plan_id) if plan_id else None
+    if plan is None:
+        raise ValueError(f"Rename plan '{plan_id}' not found")
+    if plan.job_id != job_id:
+        raise ValueError(f"Rename plan '{plan_id}' belongs to job '{plan.job_id}', not '{job_id}'")
+
+    # Applied plans are refused; partial ones only retry their failed files
+    entries = plan.pending_entries()
+
+    registry = client_registry
+    if credentials is not None and credentials is not client_registry.get_credentials():
+        registry = ClientRegistry(credentials=credentials)
+    drive_service_factory = registry.drive_service_factory()
+
+    ledger_hash = ledger_config_hash(job_config)
+    chunks = [entries[start:start + MAX_BATCH_SIZE] for start in range(0, len(entries), MAX_BATCH_SIZE)]
+    logger.info(f"Applying rename plan {plan_id} ({plan.status}): {len(entries)} renames in {len(chunks)} batches")
+
+    def apply_chunk(chunk):
+        batcher = DriveBatcher(drive_service_factory())
+        current, lookup_errors = batcher.get_metadata(
+            [entry["file_id"] for entry in chunk], fields=f"{LEDGER_FILE_FIELDS}, trashed"
+        )
+        renames = []
+        stale = []
+        for entry in chunk:
+            if entry["file_id"] in lookup_errors:
+                continue
+            if not RenamePlan.is_current(entry, current.get(entry["file_id"])):
+                stale.append(entry)
+                continue
+            renames.append({
+                "file_id": entry["file_id"],
+                "new_name": entry["new_name"],
+                "current_name": entry["old_name"],
+                "record": entry.get("analysis") != FALLBACK_ANALYSIS
+            })
+        return renames, stale, lookup_errors, batcher.rename(renames, fields=LEDGER_FILE_FIELDS)
+
+    stats = {"files_processed": len(entries), "files_renamed": 0, "files_stale": 0, "errors": 0, "mode": "apply"}
+    failed = []
+    stale_ids = []
+    ledger_entries = []
+    with ThreadPoolExecutor(max_workers=max(1, APPLY_PARALLEL_BATCHES), thread_name_prefix="plan-apply") as executor:
+        for renames, stale, lookup_errors, (results, errors, _) in executor.map(apply_chunk, chunks):
+            for file_id, error in lookup_errors.items():
+                logger.error(f"Error reading current metadata of file {file_id}: {error}")
+                failed.append(file_id)
+            for entry in stale:
+                logger.warning(f"Skipping {entry['old_name']} ({entry['file_id']}): changed since the plan was made")
+                stale_ids.append(entry["file_id"])
+            for rename in renames:
+                updated = results.get(rename["file_id"])
+                if rename["file_id"] in errors:
+                    logger.error(f"Error renaming file {rename['current_name']}: {errors[rename['file_id']]}")
+                    failed.append(rename["file_id"])
+                elif updated is not None:
+                    stats["files_renamed"] += 1
+                    if rename["record"]:
+                        ledger_entries.append(ledger_entry_for(updated, job_config, rename["new_name"], ledger_hash))
+    stats["errors"] = len(failed)
+    stats["files_stale"] = len(stale_ids)
+
+    try:
+        with db_write_lock:
+            ledger_db.record_processed(ledger_entries)
+    except Exception as e:
+        logger.error(f"Failed to record {len(ledger_entries)} files in the processed-file ledger: {e}")
+
+    plan.record_apply(stats["files_renamed"], failed, stale_ids)
+    plan_store.save(plan)
+    if run_state is not None:
+        run_state.complete_folder(stats)
+
+    logger.info(
+        f"Rename plan {plan_id} applied: {stats['files_renamed']} renamed, "
+        f"{stats['files_stale']} stale, {stats['errors']} failed"
+    )
+    return {
+        "status": "success",
+        "job_id": job_id,
+        "job_name": job_config.get("name"),
+        "plan_id": plan_id,
+        "stats": stats
+    }
+
+
+def iter_file_id_pages(drive_service, file_ids: List[str]):
+    """
+    Yield pages of file metadata for a shard's precomputed file IDs.
+    Genera páginas con la metadata de los archivos de un shard.
+
+    Metadata is fetched with batched ``files().get`` calls (100 per request);
+    files deleted or trashed since the shard was planned are dropped.
+    """
+    batcher = DriveBatcher(drive_service)
+    for start in range(0, len(file_ids), MAX_BATCH_SIZE):
+        chunk = file_ids[start:start + MAX_BATCH_SIZE]
+        metadata, errors = batcher.get_metadata(chunk, fields=f"{LIST_FILE_FIELDS}, parents, trashed")
+        for file_id, error in errors.items():
+            logger.warning(f"Skipping shard file {file_id}: {error}")
+        page = [
+            metadata[file_id] for file_id in chunk
+            if file_id in metadata
+            and not metadata[file_id].get("trashed")
+            and metadata[file_id].get("mimeType") != FOLDER_MIME_TYPE
+        ]
+        if page:
+            yield page
+
+
+def iter_changed_file_pages(
     drive_service,
-    root_folder_id: str,
-    target_names: list
-) -> list:
+    page_token: str,
+    folder_ids: set,
+    token_holder: Dict[str, str],
+    retry_file_ids: Optional[List[str]] = None
+):
     """
-    Find specific folders by name within a root folder.
-    Encuentra carpetas específicas por nombre dentro de una carpeta raíz.
+    Yield pages of files changed since ``page_token`` that live in ``folder_ids``.
+    Genera páginas de archivos modificados desde ``page_token`` en ``folder_ids``.
+
+    Files that failed in the previous run (``retry_file_ids``) are yielded
+    first. The new start page token is stored in ``token_holder["token"]``
+    once the feed is fully consumed.
     """
-    found_folders = []
+    seen = set()
+    if retry_file_ids:
+        logger.info(f"Replaying {len(retry_file_ids)} files that failed in the previous run")
+        for page in iter_file_id_pages(drive_service, retry_file_ids):
+            page = [file for file in page if folder_ids.intersection(file.get("parents", []))]
+            seen.update(file["id"] for file in page)
+            if page:
+                yield page
     
-    try:
-        query = f"'{root_folder_id}' in parents and trashed=false and mimeType='application/vnd.google-apps.folder'"
-        response = drive_service.files().list(
-            q=query,
-            fields="files(id, name)",
-            supportsAllDrives=True,
-            includeItemsFromAllDrives=True
-        ).execute()
+    for changes, new_start_token in iter_change_pages(drive_service, page_token, change_fields=CHANGE_FIELDS):
+        if new_start_token:
+            token_holder["token"] = new_start_token
         
-        folders = response.get("files", [])
+        page = []
+        for change in changes:
+            file = change.get("file")
+            if change.get("removed") or not file or file.get("trashed"):
+                continue
+            if file.get("mimeType") == FOLDER_MIME_TYPE:
+                continue
+            if not folder_ids.intersection(file.get("parents", [])):
+                continue
+            if file["id"] in seen:
+                continue
+            page.append(file)
         
-        for folder in folders:
-            if folder["name"] in target_names:
-                found_folders.append(folder["id"])
-                logger.info(f"Found target folder: {folder['name']} (ID: {folder['id']})")
-    
+        logger.info(f"Changes feed page: {len(changes)} changes, {len(page)} in target folders")
+        yield page
+
+
+def save_changes_checkpoint(job_id: str, checkpoint: Dict[str, Any]) -> None:
+    """
+    Store the job's Changes API token and files to replay in the jobs table.
+    Guarda el token de la Changes API del job y los archivos a reintentar.
+    """
+    try:
+        with db_write_lock:
+            db_manager.update("id", job_id, checkpoint)
+        logger.info(
+            f"Saved changes page token for job '{job_id}': {checkpoint['changes_page_token']} "
+            f"({len(checkpoint['changes_retry_file_ids'])} files to retry)"
+        )
     except Exception as e:
-        logger.error(f"Error finding folders: {e}")
-    
-    return found_folders
+        logger.error(f"Failed to save changes page token for job '{job_id}': {e}")
+
+
+def get_pipeline_settings(job_config: Dict[str, Any], job_share: int = 1) -> Dict[str, int]:
+    """
+    Resolve worker pool sizes for each pipeline stage.
+    Resuelve el tamaño del pool de workers de cada etapa del pipeline.
+
+    Defaults come from PIPELINE_SETTINGS (env), and can be overridden per job
+    with a ``pipeline`` dict in the job config. When ``job_share`` jobs run
+    at once, each gets 1/job_share of every pool (at least one worker).
+    """
+    settings = dict(PIPELINE_SETTINGS)
+    for key, value in (job_config.get("pipeline") or {}).items():
+        if key in settings:
+            try:
+                settings[key] = max(1, int(value))
+            except (TypeError, ValueError):
+                logger.warning(f"Invalid pipeline setting {key}={value!r}, using {settings[key]}")
+    if job_share > 1:
+        settings = {key: max(1, value // job_share) for key, value in settings.items()}
+    return settings
+
+
+# Defaults for agent_config["batching"] (multi-document LLM calls)
+BATCHING_DEFAULTS = {
+    "enabled": False,
+    "max_documents": 8,           # Documents per Gemini request
+    "max_tokens": 6000,           # Estimated content tokens per request
+    "max_document_tokens": 1500,  # Larger documents always get their own call
+    "max_wait_seconds": 0.5,      # Wait for more small documents before sending
+}
+
+
+def get_batching_settings(job_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Resolve multi-document batching settings, or None when the job doesn't use it.
+    Resuelve la configuración de lotes multi-documento (None si está deshabilitado).
+    """
+    settings = dict(BATCHING_DEFAULTS)
+    settings.update(job_config.get("agent_config", {}).get("batching") or {})
+    if not settings["enabled"] or int(settings["max_documents"]) < 2:
+        return None
+    return settings
+
+
+# Default per-document token budget (overridable via agent_config["content_budget"]["max_tokens"])
+CONTENT_MAX_TOKENS = int(os.environ.get("CONTENT_MAX_TOKENS", str(DEFAULT_MAX_TOKENS)))
+
+
+# Defaults for agent_config["category_model"] (local category pre-labeling).
+# The model only predicts the category; type, issuer and detail always come from Gemini.
+CATEGORY_MODEL_DEFAULTS = {
+    "enabled": False,
+    "hint_threshold": 0.8,     # Above: cheaper prompt (smaller content + suggested category)
+    "hint_max_tokens": 800,    # Content token budget of the cheaper prompt
+}
+
+
+def get_category_model_settings(job_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Resolve category pre-labeling settings, or None when the job doesn't use it.
+    Resuelve la configuración del clasificador local (None si está deshabilitado).
+    """
+    if category_model is None:
+        return None
+    settings = dict(CATEGORY_MODEL_DEFAULTS)
+    settings.update(job_config.get("agent_config", {}).get("category_model") or {})
+    return settings if settings["enabled"] else None
+
+
+def get_content_budgeter(job_config: Dict[str, Any]) -> ContentBudgeter:
+    """
+    Build the content budgeter for a job from agent_config["content_budget"].
+    Crea el ajustador de contenido del job según agent_config["content_budget"].
+    """
+    budget = job_config.get("agent_config", {}).get("content_budget") or {}
+    max_tokens = budget.get("max_tokens", CONTENT_MAX_TOKENS)
+    try:
+        return ContentBudgeter(max_tokens=int(max_tokens))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid content_budget max_tokens={max_tokens!r}, using {CONTENT_MAX_TOKENS}")
+        return ContentBudgeter(max_tokens=CONTENT_MAX_TOKENS)
 
 
 def process_folder_files(
     drive_service,
     folder_id: str,
-    agent,
-    job_config: Dict[str, Any]
-) -> Dict[str, int]:
+    job_config: Dict[str, Any],
+    drive_service_factory=None,
+    file_pages=None,
+    job_share: int = 1,
+    run_state=None,
+    plan=None
+) -> Dict[str, Any]:
     """
-    Process all files in a folder.
-    Procesa todos los archivos en una carpeta.
+    Process all files in a folder through the staged pipeline.
+    Procesa todos los archivos en una carpeta a través del pipeline por etapas.
+
+    Stages: list -> download -> extract -> analyze -> rename. Each stage has
+    its own worker pool so downloads, OCR and Gemini calls overlap.
+
+    ``file_pages`` replaces the folder listing with pre-selected pages of
+    files (e.g. from the Changes API); ``folder_id`` is then only a label.
+    With a ``plan`` (RenamePlan), the rename stage records the proposed names
+    instead of renaming.
     """
-    stats = {"files_processed": 0, "files_renamed": 0, "errors": 0}
-    
-    try:
-        # List files in folder
-        query = f"'{folder_id}' in parents and trashed=false and mimeType != 'application/vnd.google-apps.folder'"
-        response = drive_service.files().list(
-            q=query,
-            fields="files(id, name, mimeType)",
-            supportsAllDrives=True,
-            includeItemsFromAllDrives=True
-        ).execute()
-        
-        files = response.get("files", [])
-        logger.info(f"Found {len(files)} files in folder {folder_id}")
-        
-        for file in files:
-            stats["files_processed"] += 1
-            
-            # Skip already processed files
-            if "DOCPROCESADO" in file["name"] or file["name"] == "index.html":
-                continue
-            
+    stats = {
+        "files_processed": 0,
+        "files_renamed": 0,
+        "errors": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "llm_batches": 0,
+        "batched_files": 0,
+        "tokens_sent": 0,
+        "tokens_saved": 0,
+        "rule_hits": 0,
+        "rule_seconds_saved": 0.0,
+        "category_hints": 0,
+        "stages": {}
+    }
+    settings = get_pipeline_settings(job_config, job_share)
+    config_hash = agent_config_hash(job_config.get("agent_config", {}))
+    ledger_hash = ledger_config_hash(job_config)
+    stats_lock = threading.Lock()
+    ledger_entries = []
+    get_drive = drive_service_factory or (lambda: drive_service)
+    budgeter = get_content_budgeter(job_config)
+    name_template = compile_template(job_config["agent_config"]["filename_format"])
+    rules = RuleClassifier.from_config(job_config.get("agent_config", {}).get("fast_rules"))
+    categories = get_category_model_settings(job_config)
+    hint_budgeter = ContentBudgeter(max_tokens=int(categories["hint_max_tokens"])) if categories else None
+
+    if drive_service_factory is None:
+        # A single shared service is not thread-safe: serialize Drive stages
+        settings["download_workers"] = 1
+        settings["rename_workers"] = 1
+
+    def list_files():
+        listed = 0
+        already_processed = 0
+        # Prefetching uses drive_service from a background thread, so only do it
+        # when pipeline stages have their own per-thread services
+        prefetch = drive_service_factory is not None
+        pages = file_pages if file_pages is not None else iter_drive_pages(
+            drive_service,
+            folder_children_query(folder_id),
+            file_fields=LIST_FILE_FIELDS,
+            prefetch=prefetch
+        )
+        for page in pages:
+            listed += len(page)
+            stats["files_processed"] += len(page)
+
+            # One bulk ledger lookup per page, before anything is downloaded
+            page_keys = {file["id"]: ledger_key_for(file, job_config, ledger_hash) for file in page}
+            processed_keys = ledger_db.get_processed_keys(list(page_keys.values()))
+
+            for file in page:
+                if file["name"] == "index.html":
+                    continue
+                if page_keys[file["id"]] in processed_keys:
+                    already_processed += 1
+                    continue
+                yield prepare_item(file)
+
+        logger.info(
+            f"Found {listed} files in folder {folder_id} "
+            f"({already_processed} already in the processed-file ledger)"
+        )
+
+    def list_folder_names(folder):
+        # Runs on the rename thread that first claims a name in ``folder``
+        pages = iter_drive_pages(get_drive(), folder_children_query(folder), file_fields="id, name", prefetch=False)
+        for page in pages:
+            for file in page:
+                yield file["id"], file["name"]
+
+    # Names already present per folder, from a names-only listing of each folder
+    # the first time a file in it is renamed (covers siblings outside the work pages)
+    name_index = FolderNameIndex(loader=list_folder_names)
+
+    def parent_of(file):
+        # Changes API pages carry parents; folder listings are all in folder_id
+        return (file.get("parents") or [folder_id])[0]
+
+    def prepare_item(file):
+        # A cache hit skips download, extraction and the agent call
+        cached = analysis_cache.get(file.get("md5Checksum"), config_hash)
+        if cached is not None:
+            logger.info(f"Analysis cache hit for {file['name']} (md5 {file['md5Checksum']})")
+            with stats_lock:
+                stats["cache_hits"] += 1
+            return {"file": file, "analysis": cached}
+
+        return {"file": file}
+
+    def download_stage(item):
+        if "analysis" in item:
+            return item
+        file = item["file"]
+        extension = os.path.splitext(file["name"])[1].lower()
+        size = int(file.get("size") or 0)
+        item["extract_name"] = file["name"]
+
+        if is_google_native(file.get("mimeType")):
+            if not is_exportable(file.get("mimeType")):
+                logger.info(f"Skipping native Google file without text export: {file['name']} ({file.get('mimeType')})")
+                return None
+            # Docs/Sheets/Slides: export to plain text / CSV (get_media fails on them)
+            item["file_buffer"], export_extension = export_to_spool(
+                get_drive(),
+                file["id"],
+                file["mimeType"],
+                max_memory=DOWNLOAD_SETTINGS["max_memory"]
+            )
+            item["extract_name"] = file["name"] + export_extension
+        elif extension in RANGED_TEXT_EXTENSIONS and size > DOWNLOAD_SETTINGS["range_block"]:
+            # Text files: fetch only the leading range the extractor needs
+            reader = RangedDriveReader(get_drive, file["id"], size, block_size=DOWNLOAD_SETTINGS["range_block"])
+            reader.prefetch()
+            item["file_buffer"] = reader
+        elif (
+            extension == ".pdf"
+            and drive_service_factory is not None
+            and size >= DOWNLOAD_SETTINGS["parallel_threshold"]
+            and size <= DOWNLOAD_SETTINGS["max_size"]
+        ):
+            # Very large PDFs: concurrent ranged chunks
+            item["file_buffer"] = download_parallel_ranges(
+                get_drive,
+                file["id"],
+                size,
+                executor=range_executor,
+                chunk_size=DOWNLOAD_SETTINGS["chunk_size"],
+                max_memory=DOWNLOAD_SETTINGS["max_memory"]
+            )
+        else:
+            item["file_buffer"] = download_file(get_drive(), file["id"], expected_size=file.get("size"))
+        return item
+
+    def extract_stage(item):
+        if "analysis" in item:
+            return item
+        file = item["file"]
+        # The spooled buffer goes straight to the extractor (no bytes copy)
+        with item.pop("file_buffer") as file_buffer:
+            content = content_extractor.get_content(item.pop("extract_name"), file_buffer)
+        content, report = budgeter.fit(content)
+        logger.info(
+            f"Extracted content for {file['name']}: {report['tokens']} tokens sent, "
+            f"{report['tokens_saved']} saved (of ~{report['original_tokens']})"
+        )
+        with stats_lock:
+            stats["tokens_sent"] += report["tokens"]
+            stats["tokens_saved"] += report["tokens_saved"]
+        item["content"] = content
+        return item
+
+    def classify_stage(item):
+        # Fast path: regular documents (VEP, F931, invoices, statements) skip the agent
+        if "analysis" in item or rules is None:
+            return item
+        match = rules.classify(item["content"])
+        if match is None:
+            return item
+        file = item["file"]
+        try:
+            analysis = item_schema.model_validate(match["analysis"]).model_dump()
+        except Exception as e:
+            logger.debug(f"Rule {match['rule']} result does not fit the job's output schema: {e}")
+            return item
+        logger.info(f"Rule {match['rule']} classified {file['name']} (confidence {match['confidence']}); skipping Gemini")
+        item.pop("content", None)
+        item["analysis"] = analysis
+        with stats_lock:
+            stats["rule_hits"] += 1
+            stats["rule_seconds_saved"] += gemini_limiter.average_latency
+        return item
+
+    def categorize_stage(item):
+        # Local model: confident predictions get a cheaper prompt with the suggested category
+        if "analysis" in item or categories is None:
+            return item
+        category, confidence, _ = category_model.predict(item["content"])
+        if category is None or confidence < float(categories["hint_threshold"]):
+            return item
+        file = item["file"]
+        content, report = hint_budgeter.fit(item["content"])
+        item["content"] = content
+        item["category_hint"] = category
+        with stats_lock:
+            stats["category_hints"] += 1
+            stats["tokens_sent"] -= report["tokens_saved"]
+            stats["tokens_saved"] += report["tokens_saved"]
+        logger.info(f"Category model suggests {category} for {file['name']} ({confidence:.2f}); using the short prompt")
+        return item
+
+    def record_sample(item, content):
+        # Only unhinted Gemini answers become training samples (no feedback loop)
+        if sample_recorder is not None and "category_hint" not in item and item["analysis"] != FALLBACK_ANALYSIS:
+            sample_recorder.record(content, item["analysis"].get("category"), job_config.get("id"))
+
+    def analyze_stage(item):
+        if "analysis" in item:
+            return item
+        file = item["file"]
+        content = item.pop("content")
+        # Each LLM worker runs its own Agent (Agno keeps the current run's state on it)
+        with agent_factory.lease_agent(job_config) as agent:
+            item["analysis"] = analyze_content(
+                agent, file["name"], content, job_config, category_hint=item.get("category_hint")
+            )
+        record_sample(item, content)
+        if item["analysis"] != FALLBACK_ANALYSIS:
+            analysis_cache.put(file.get("md5Checksum"), config_hash, item["analysis"])
+        with stats_lock:
+            stats["cache_misses"] += 1
+        return item
+
+    def analyze_batch_stage(items):
+        # Cache hits and large documents go through the per-file path
+        results = [None] * len(items)
+        batchable = []
+        for position, item in enumerate(items):
+            if "analysis" in item or estimate_tokens(item["content"]) > batching["max_document_tokens"]:
+                try:
+                    results[position] = analyze_stage(item)
+                except Exception as e:
+                    results[position] = e
+            else:
+                batchable.append(position)
+
+        analyses = {}
+        if len(batchable) > 1:
+            batch_items = [items[position] for position in batchable]
             try:
-                # Download file content
-                file_bytes = download_file(drive_service, file["id"])
-                
-                # Extract content (with OCR if needed)
-                content = content_extractor.get_content(file["name"], file_bytes)
-                logger.info(f"Extracted content length: {len(content)} chars for {file['name']}")
-                
-                # Analyze with agent
-                prompt = job_config["agent_config"]["prompt_template"].format(
-                    original_filename=file["name"],
-                    file_content=content[:8000]  # Limit content
-                )
-                
-                # LOG COMPLETO DEL PROMPT
-                print("\n" + "="*80)
-                print("PROMPT SENT TO GEMINI:")
-                print("="*80)
-                print(prompt[:2000])  # Primeros 2000 chars
-                print("..." if len(prompt) > 2000 else "")
-                print("="*80 + "\n")
-                
-                logger.info(f"Sending prompt to Gemini for {file['name']} (prompt length: {len(prompt)} chars)")
-                
-                response = agent.run(prompt)
-                
-                # LOG COMPLETO DE LA RESPUESTA
-                print("\n" + "="*80)
-                print("RAW RESPONSE FROM GEMINI:")
-                print("="*80)
-                print(f"Type: {type(response)}")
-                print(f"Has .content: {hasattr(response, 'content')}")
-                if hasattr(response, 'content'):
-                    print(f"Content type: {type(response.content)}")
-                    print(f"Content: {response.content}")
-                print(f"Response repr: {repr(response)[:500]}")
-                print("="*80 + "\n")
-                
-                logger.info(f"Gemini response received for {file['name']}")
-                
-                # Parse response (should match output_schema)
-                # For now, assume response.content has the structured data
-                analysis = parse_agent_response(response)
-                logger.info(f"Parsed analysis for {file['name']}: {analysis}")
-                
-                # Rename file
-                new_name = build_filename(file["name"], analysis, job_config)
-                logger.info(f"Generated filename: {new_name}")
-                
-                rename_file(drive_service, file["id"], new_name)
-                stats["files_renamed"] += 1
-                logger.info(f"Renamed: {file['name']} -> {new_name}")
-                
+                with agent_factory.lease_agent(job_config, output_schema=batch_schema) as batch_agent:
+                    analyses = analyze_batch(batch_agent, batch_items, job_config, item_schema)
+                with stats_lock:
+                    stats["llm_batches"] += 1
+                    stats["batched_files"] += len(analyses)
             except Exception as e:
-                logger.error(f"Error processing file {file['name']}: {e}")
-                stats["errors"] += 1
-    
+                logger.warning(f"Batched analysis of {len(batch_items)} files failed ({e}). Falling back to per-file calls.")
+
+        for position in batchable:
+            item = items[position]
+            analysis = analyses.get(item["file"]["id"])
+            if analysis is None:
+                # Missing or invalid in the batch response: analyze this file alone
+                try:
+                    results[position] = analyze_stage(item)
+                except Exception as e:
+                    results[position] = e
+                continue
+            content = item.pop("content", None)
+            item["analysis"] = analysis
+            record_sample(item, content)
+            analysis_cache.put(item["file"].get("md5Checksum"), config_hash, analysis)
+            with stats_lock:
+                stats["cache_misses"] += 1
+            results[position] = item
+        return results
+
+    def rename_stage(item):
+        file = item["file"]
+        new_name = name_index.claim(
+            parent_of(file), file["id"], name_template.render(file["name"], item["analysis"]), file["name"]
+        )
+        logger.info(f"Generated filename: {new_name}")
+
+        if plan is not None:
+            plan.add(file, parent_of(file), new_name, item["analysis"])
+            return item
+
+        # Renames are coalesced into Drive batch requests (up to 100 per call)
+        renamer.add({
+            "file_id": file["id"],
+            "new_name": new_name,
+            "current_name": file["name"],
+            "file": file,
+            # A fallback name is not a result: the file is analyzed again next run
+            "record": item["analysis"] != FALLBACK_ANALYSIS
+        })
+        return item
+
+    def on_rename_result(entry, updated, error):
+        file = entry["file"]
+        with stats_lock:
+            if error is not None:
+                logger.error(f"Error renaming file {file['name']}: {error}")
+                rename_errors.append(file["id"])
+                return
+            if updated is not None:
+                stats["files_renamed"] += 1
+                logger.info(f"Renamed: {file['name']} -> {entry['new_name']}")
+            # Renaming bumps modifiedTime: record the version Drive now reports
+            if entry["record"]:
+                ledger_entries.append(ledger_entry_for(updated or file, job_config, entry["new_name"], ledger_hash))
+
+    renamer = BatchedRenamer(get_drive, on_rename_result, fields=LEDGER_FILE_FIELDS)
+    rename_errors = []
+    failed_file_ids = []
+
+    def on_error(stage_name, item, error):
+        if item is None:
+            logger.error(f"Error listing files in folder {folder_id}: {error}")
+        else:
+            logger.error(f"Error processing file {item['file']['name']} ({stage_name}): {error}")
+            with stats_lock:
+                failed_file_ids.append(item["file"]["id"])
+
+    with agent_factory.lease_agent(job_config) as agent:
+        item_schema = getattr(agent, "output_schema", None) or FileAnalysis
+    batching = get_batching_settings(job_config)
+    if batching:
+        # Several small documents per Gemini request (results keyed by file ID)
+        batch_schema = batch_model_for(item_schema)
+        analyze = PipelineStage(
+            "analyze",
+            analyze_batch_stage,
+            workers=settings["llm_workers"],
+            batch_size=int(batching["max_documents"]),
+            batch_budget=int(batching["max_tokens"]),
+            batch_weight=lambda item: 0 if "analysis" in item else estimate_tokens(item["content"]),
+            batch_wait=float(batching["max_wait_seconds"])
+        )
+    else:
+        analyze = PipelineStage("analyze", analyze_stage, workers=settings["llm_workers"])
+
+    pipeline = StagedPipeline(
+        [
+            PipelineStage("download", download_stage, workers=settings["download_workers"]),
+            PipelineStage("extract", extract_stage, workers=settings["extract_workers"]),
+            PipelineStage("classify", classify_stage, workers=1),
+            PipelineStage("categorize", categorize_stage, workers=1),
+            analyze,
+            PipelineStage("rename", rename_stage, workers=settings["rename_workers"]),
+        ],
+        source_name="list",
+        on_error=on_error
+    )
+    if run_state is not None:
+        run_state.attach_pipeline(pipeline, stats)
+    pipeline_stats = pipeline.run(list_files())
+    renamer.flush()
+
+    try:
+        with db_write_lock:
+            ledger_db.record_processed(ledger_entries)
     except Exception as e:
-        logger.error(f"Error listing files in folder {folder_id}: {e}")
-        stats["errors"] += 1
-    
+        logger.error(f"Failed to record {len(ledger_entries)} files in the processed-file ledger: {e}")
+
+    stats["errors"] = pipeline.failed + len(rename_errors)
+    stats["rule_seconds_saved"] = round(stats["rule_seconds_saved"], 3)
+    stats["stages"] = pipeline_stats["stages"]
+    # Consumed by process_job to decide how far the Changes API token may advance
+    stats["failed_file_ids"] = failed_file_ids + rename_errors
+    stats["listing_complete"] = pipeline.source_stats.failed == 0
+    logger.info(f"Folder {folder_id} pipeline finished in {pipeline_stats['elapsed_seconds']}s")
+
     return stats
 
 
-def download_file(drive_service, file_id: str) -> bytes:
-    """Download file from Drive."""
-    from googleapiclient.http import MediaIoBaseDownload
-    from io import BytesIO
-    
-    request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
-    file_bytes = BytesIO()
-    downloader = MediaIoBaseDownload(file_bytes, request)
-    
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    
-    return file_bytes.getvalue()
+# Appended to the prompt when the local category model is confident
+CATEGORY_HINT_TEMPLATE = (
+    "\n\nCategoría sugerida por el clasificador local: {category}. "
+    "Úsala salvo que el contenido indique claramente otra."
+)
+
+
+def analyze_content(
+    agent,
+    file_name: str,
+    content: str,
+    job_config: Dict[str, Any],
+    category_hint: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the prompt for a file, run the agent and parse its structured output.
+    Construye el prompt de un archivo, ejecuta el agente y parsea la respuesta.
+    """
+    prompt = job_config["agent_config"]["prompt_template"].format(
+        original_filename=file_name,
+        file_content=content  # Already fitted to the job's token budget
+    )
+    if category_hint:
+        prompt += CATEGORY_HINT_TEMPLATE.format(category=category_hint)
+
+    # LOG COMPLETO DEL PROMPT
+    print("\n" + "="*80)
+    print("PROMPT SENT TO GEMINI:")
+    print("="*80)
+    print(prompt[:2000])  # Primeros 2000 chars
+    print("..." if len(prompt) > 2000 else "")
+    print("="*80 + "\n")
+
+    cache_key = llm_cache_key_for(agent, prompt, job_config)
+    if cache_key is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"LLM cache hit for {file_name}")
+            return cached
+
+    logger.info(f"Sending prompt to Gemini for {file_name} (prompt length: {len(prompt)} chars)")
+
+    response = gemini_limiter.call(agent.run, prompt)
+
+    # LOG COMPLETO DE LA RESPUESTA
+    print("\n" + "="*80)
+    print("RAW RESPONSE FROM GEMINI:")
+    print("="*80)
+    print(f"Type: {type(response)}")
+    print(f"Has .content: {hasattr(response, 'content')}")
+    if hasattr(response, 'content'):
+        print(f"Content type: {type(response.content)}")
+        print(f"Content: {response.content}")
+    print(f"Response repr: {repr(response)[:500]}")
+    print("="*80 + "\n")
+
+    logger.info(f"Gemini response received for {file_name}")
+
+    # Parse response (should match output_schema)
+    analysis = parse_agent_response(response)
+    logger.info(f"Parsed analysis for {file_name}: {analysis}")
+    if cache_key is not None and analysis != FALLBACK_ANALYSIS:
+        llm_cache.put(cache_key, analysis, schema=getattr(agent, "output_schema", None) or FileAnalysis)
+    return analysis
+
+
+def llm_cache_key_for(agent, prompt: str, job_config: Dict[str, Any]) -> Optional[str]:
+    """
+    Response cache key of an agent call, or None when the cache is off for this job.
+    Clave de caché de la respuesta, o None si el job no usa la caché.
+    """
+    agent_config = job_config.get("agent_config", {})
+    if llm_cache is None or (agent_config.get("llm_cache") or {}).get("bypass", False):
+        return None
+    generation_params = dict(agent_config.get("model") or {})
+    model_id = getattr(getattr(agent, "model", None), "id", None) or generation_params.get("name")
+    generation_params.pop("name", None)
+    return llm_cache_key(
+        model_id,
+        generation_params,
+        getattr(agent, "output_schema", None),
+        prompt,
+        instructions=agent_config.get("instructions")
+    )
+
+
+# Header of a multi-document prompt; each document then uses the job's prompt_template
+BATCH_PROMPT_HEADER = (
+    "Analiza cada uno de los siguientes {count} documentos por separado. "
+    "Devuelve exactamente un resultado por documento en 'results', "
+    "con su 'file_id' copiado tal cual aparece en el encabezado del documento.\n\n"
+)
+
+
+def analyze_batch(agent, items: List[Dict[str, Any]], job_config: Dict[str, Any], item_schema) -> Dict[str, Dict[str, Any]]:
+    """
+    Analyze several documents with a single agent call.
+    Analiza varios documentos con una sola llamada al agente.
+
+    Returns:
+        ``{file_id: analysis}`` for every result that names a known file and
+        validates against ``item_schema``; other files are left out so the
+        caller can retry them one by one.
+    """
+    template = job_config["agent_config"]["prompt_template"]
+    sections = [BATCH_PROMPT_HEADER.format(count=len(items))]
+    for item in items:
+        file = item["file"]
+        sections.append(f"=== DOCUMENTO file_id={file['id']} ===\n")
+        sections.append(template.format(original_filename=file["name"], file_content=item["content"]))
+        if item.get("category_hint"):
+            sections.append(CATEGORY_HINT_TEMPLATE.format(category=item["category_hint"]))
+        sections.append("\n\n")
+    prompt = "".join(sections)
+
+    cache_key = llm_cache_key_for(agent, prompt, job_config)
+    parsed = llm_cache.get(cache_key) if cache_key is not None else None
+    if parsed is None:
+        logger.info(f"Sending batched prompt to Gemini for {len(items)} files (prompt length: {len(prompt)} chars)")
+        response = gemini_limiter.call(agent.run, prompt)
+        parsed = parse_agent_response(response)
+        if cache_key is not None:
+            llm_cache.put(cache_key, parsed, schema=getattr(agent, "output_schema", None))
+    else:
+        logger.info(f"LLM cache hit for batch of {len(items)} files")
+    expected_ids = {item["file"]["id"] for item in items}
+    analyses = {}
+    for entry in parsed.get("results") or []:
+        if not isinstance(entry, dict):
+            continue
+        entry = dict(entry)
+        file_id = entry.pop("file_id", None)
+        if file_id not in expected_ids or file_id in analyses:
+            continue
+        try:
+            analyses[file_id] = item_schema.model_validate(entry).model_dump()
+        except Exception as e:
+            logger.warning(f"Invalid batched analysis for file {file_id}: {e}")
+
+    logger.info(f"Batched analysis returned {len(analyses)}/{len(items)} valid results")
+    return analyses
+
+
+def download_file(drive_service, file_id: str, expected_size: Optional[int] = None):
+    """
+    Download file from Drive into a memory-bounded spooled buffer.
+    The caller must close the returned buffer.
+    """
+    return download_to_spool(
+        drive_service,
+        file_id,
+        chunk_size=DOWNLOAD_SETTINGS["chunk_size"],
+        max_memory=DOWNLOAD_SETTINGS["max_memory"],
+        max_size=DOWNLOAD_SETTINGS["max_size"],
+        expected_size=expected_size
+    )
+
+
+# Returned by parse_agent_response when the model output can't be parsed
+FALLBACK_ANALYSIS = {"date": "2025-01-01", "keywords": ["documento"]}
+
+# Only the cache bypass flag leaves the rename result unchanged
+LEDGER_EXCLUDED_KEYS = ("llm_cache",)
 
 
 def parse_agent_response(response) -> Dict[str, Any]:
@@ -473,96 +1497,44 @@ def parse_agent_response(response) -> Dict[str, Any]:
                 return result
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse JSON: {e}. Content: {content[:500]}")
-                return {"date": "2025-01-01", "keywords": ["documento"]}
+                return dict(FALLBACK_ANALYSIS)
     
     # Last resort fallback
     logger.error(f"Unable to parse response. Type: {type(response)}. Using fallback values.")
-    return {"date": "2025-01-01", "keywords": ["documento"]}
+    return dict(FALLBACK_ANALYSIS)
 
 
-def build_filename(
-    original_name: str,
-    analysis: Dict[str, Any],
-    job_config: Dict[str, Any]
-) -> str:
+def ledger_config_hash(job_config: Dict[str, Any]) -> str:
     """
-    Build new filename from analysis with alias support and case-insensitivity.
-    Construye el nuevo nombre de archivo con soporte para alias e insensibilidad a mayúsculas.
+    Hash of the agent_config that produced a rename (prompt, schema and filename_format).
+    Hash del agent_config que produjo un renombrado.
     """
-    import os
-    from collections import defaultdict
-    
-    template = job_config["agent_config"]["filename_format"]
-    ext = os.path.splitext(original_name)[1]
-    
-    # 1. Prepare raw variables from analysis (lowercase keys for matching)
-    raw_vars = {k.lower(): v for k, v in analysis.items()}
-    
-    # 2. Build keywords string
-    keywords_list = analysis.get("keywords", [])
-    if not isinstance(keywords_list, list):
-        keywords_list = [str(keywords_list)]
-    
-    keywords_str = "_".join(keywords_list) if keywords_list else "doc"
-    
-    # 3. Define Standard Variables (The "Big 4")
-    template_vars = {
-        "date": analysis.get("date") or raw_vars.get("fecha") or "2025-01-01",
-        "keywords": keywords_str,
-        "ext": ext,
-        "original_filename": os.path.splitext(original_name)[0]
-    }
-    
-    # 4. Add Aliases / Mapping for common template placeholders
-    # If keywords has 3 elements: [type, entity, concept]
-    if len(keywords_list) >= 1:
-        template_vars["type"] = keywords_list[0]
-    if len(keywords_list) >= 2:
-        template_vars["issuer"] = keywords_list[1]
-        template_vars["entity"] = keywords_list[1]
-    if len(keywords_list) >= 3:
-        template_vars["brief_detail"] = keywords_list[2]
-        template_vars["concept"] = keywords_list[2]
-
-    # 5. Merge all analysis fields (prefer existing title-case if matching)
-    for key, value in analysis.items():
-        low_key = key.lower()
-        if low_key not in template_vars:
-            if isinstance(value, list):
-                template_vars[low_key] = "_".join(map(str, value))
-            else:
-                template_vars[low_key] = value
-
-    # 6. Create Case-Insensitive safe_vars mapper
-    # This allows {CATEGORY} or {category} or {Category} to work
-    class CaseInsensitiveDict(defaultdict):
-        def __missing__(self, key):
-            return self.get(key.lower(), "unknown")
+    return agent_config_hash(job_config.get("agent_config", {}), exclude=LEDGER_EXCLUDED_KEYS)
 
-    safe_vars = CaseInsensitiveDict(lambda: "unknown")
-    for k, v in template_vars.items():
-        safe_vars[k.lower()] = v
-        safe_vars[k] = v # Keep original just in case
 
-    try:
-        # Use format_map for safe replacement
-        new_name = template.format_map(safe_vars)
-        logger.info(f"Filename generated: {new_name} using template: {template}")
-    except Exception as e:
-        logger.error(f"Error formatting filename with template '{template}': {e}")
-        new_name = f"{template_vars['date']}_{template_vars['keywords']}{ext}"
-    
-    return new_name
+def ledger_key_for(file: Dict[str, Any], job_config: Dict[str, Any], config_hash: str) -> str:
+    """Ledger key (job + config hash + fileId + modifiedTime + md5) of a listed Drive file."""
+    return DatabaseManager.ledger_key(
+        file["id"], file.get("modifiedTime"), file.get("md5Checksum"), job_config.get("id"), config_hash
+    )
 
 
-def rename_file(drive_service, file_id: str, new_name: str):
-    """Rename file in Drive."""
-    drive_service.files().update(
-        fileId=file_id,
-        body={"name": new_name},
-        fields="id, name",
-        supportsAllDrives=True
-    ).execute()
+def ledger_entry_for(
+    file: Dict[str, Any],
+    job_config: Dict[str, Any],
+    new_name: str,
+    config_hash: str
+) -> Dict[str, Any]:
+    """Build a processed-file ledger entry from Drive metadata."""
+    return {
+        "file_id": file["id"],
+        "modified_time": file.get("modifiedTime"),
+        "md5": file.get("md5Checksum"),
+        "job_id": job_config.get("id"),
+        "config_hash": config_hash,
+        "new_name": new_name,
+        "processed_at": datetime.now(timezone.utc).isoformat()
+    }
 
 
 # --- API Endpoints ---
@@ -577,6 +1549,109 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Process-wide metrics: Gemini concurrency limit, Drive quota pacing and LLM cache counters.
+    Métricas del proceso: concurrencia de Gemini, cuota de Drive y caché del LLM.
+    """
+    return {
+        "gemini_concurrency": gemini_limiter.metrics(),
+        "drive_quota": get_quota_governor().metrics(),
+        "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+    }
+
+
+def run_scheduled_jobs(jobs, credentials) -> list:
+    """
+    Run several jobs concurrently, at most JOB_PARALLELISM at a time.
+    Ejecuta varios jobs en paralelo, como máximo JOB_PARALLELISM a la vez.
+
+    Pipeline pools are split between the jobs running at once, so the total
+    Drive/Gemini concurrency stays within PIPELINE_SETTINGS. Results are
+    appended as each job finishes.
+    """
+    if not jobs:
+        return []
+    parallelism = min(JOB_PARALLELISM, len(jobs))
+    logger.info(f"Running {len(jobs)} scheduled jobs ({parallelism} at a time)")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="job") as executor:
+        futures = {
+            executor.submit(process_job, job, None, credentials, parallelism, trigger="scheduled"): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # process_job reports its own errors; this only catches the unexpected
+                logger.error(f"Job '{job.get('name')}' crashed: {e}", exc_info=True)
+                result = {"status": "error", "job_id": job.get("id"), "job_name": job.get("name"), "error": str(e)}
+            logger.info(f"Job '{result.get('job_name')}' finished with status {result.get('status')}")
+            results.append(result)
+    return results
+
+
+def process_job_shard(job_config: Dict[str, Any], task: TaskPayload, credentials, run_state=None) -> Dict[str, Any]:
+    """
+    Process one shard of a sharded run and aggregate the run if it was the last.
+    Procesa un shard de un run y agrega el run si era el último.
+    """
+    logger.info(
+        f"Shard {task.shard_index + 1}/{task.shard_count} of run {task.run_id} "
+        f"({len(task.file_ids)} files)"
+    )
+    result = process_job(
+        job_config, task.folder_id, credentials, file_ids=task.file_ids, run_state=run_state, trigger="scheduled"
+    )
+    result.update({"run_id": task.run_id, "shard_index": task.shard_index, "shard_count": task.shard_count})
+
+    try:
+        shard_tracker.record_shard(task.run_id, task.job_id, task.shard_index, task.shard_count, result)
+        summary = shard_tracker.try_aggregate(task.run_id, task.job_id, task.shard_count)
+    except Exception as e:
+        logger.error(f"Failed to record shard {task.shard_index} of run {task.run_id}: {e}")
+        summary = None
+
+    if summary is not None:
+        # Only a run without failed shards or files may move the incremental starting point;
+        # otherwise the next run lists everything again (the ledger skips finished files)
+        if summary["status"] == "success" and not summary["stats"]["errors"] and task.changes_page_token:
+            save_changes_checkpoint(task.job_id, changes_checkpoint(task.changes_page_token, True, []))
+        result["run_summary"] = summary
+    return result
+
+
+def execute_run(run_state, func, *args, **kwargs) -> Dict[str, Any]:
+    """
+    Run ``func`` for a registered run, recording its status and result.
+    Ejecuta ``func`` para un run registrado, guardando su estado y resultado.
+    """
+    run_state.start()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Run {run_state.run_id} failed: {e}", exc_info=True)
+        run_state.finish(error=str(e))
+        raise
+    run_state.finish(result)
+    return result
+
+
+async def run_in_job_executor(run_state, func, *args, **kwargs) -> Dict[str, Any]:
+    """
+    Await a run on the job executor without blocking the event loop.
+    Espera un run en el executor de jobs sin bloquear el event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        job_executor, lambda: execute_run(run_state, func, *args, **kwargs)
+    )
+
+
 @app.post("/run-task")
 async def run_task(request: Request):
     """
@@ -586,6 +1661,9 @@ async def run_task(request: Request):
     Processes jobs based on payload:
     - If job_id provided: runs that specific job
     - If no job_id: runs all active scheduled jobs
+    
+    The response is only sent when the work is done (Cloud Tasks retries
+    on failure), but the job runs on the job executor, off the event loop.
     """
     logger.info("Task received from Cloud Tasks")
     
@@ -596,54 +1674,108 @@ async def run_task(request: Request):
         logger.error(f"Invalid task payload: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid payload: {e}")
     
-    credentials = get_credentials()
+    credentials = await run_in_threadpool(get_credentials)
+    run_state = await run_in_threadpool(run_registry.create, new_run_id(), task.job_id)
     
     # Process specific job or all active jobs
     if task.job_id:
-        job_config = load_job_config(task.job_id)
+        job_config = await run_in_threadpool(load_job_config, task.job_id)
         if not job_config:
+            await run_in_threadpool(run_state.finish, error="Job not found or inactive")
             raise HTTPException(status_code=404, detail=f"Job '{task.job_id}' not found or inactive")
         
-        result = process_job(job_config, task.folder_id, credentials)
-        return result
+        if task.file_ids is not None:
+            if not task.run_id or task.shard_index is None or not task.shard_count:
+                await run_in_threadpool(run_state.finish, error="Incomplete shard payload")
+                raise HTTPException(status_code=400, detail="Shard tasks need run_id, shard_index and shard_count")
+            result = await run_in_job_executor(run_state, process_job_shard, job_config, task, credentials, run_state)
+            return dict(result, worker_run_id=run_state.run_id)
+        
+        result = await run_in_job_executor(
+            run_state, process_job, job_config, task.folder_id, credentials, run_state=run_state, trigger="scheduled"
+        )
+        return dict(result, run_id=run_state.run_id)
     
     else:
         # Run all active scheduled jobs
-        active_jobs = get_all_active_jobs()
+        active_jobs = await run_in_threadpool(get_all_active_jobs)
         scheduled_jobs = [j for j in active_jobs if j.get("trigger_type") == "scheduled"]
         
-        results = []
-        for job in scheduled_jobs:
-            result = process_job(job, credentials=credentials)
-            results.append(result)
+        results = await run_in_job_executor(run_state, run_scheduled_jobs, scheduled_jobs, credentials)
         
         return {
             "status": "success",
+            "run_id": run_state.run_id,
             "jobs_processed": len(results),
             "results": results
         }
 
 
-
-
-@app.post("/run-job")
+@app.post("/run-job", status_code=202)
 async def run_job(request: JobRunRequest):
     """
-    Run a specific job by ID.
-    Ejecuta un job específico por ID.
+    Start a specific job by ID in the background.
+    Inicia un job específico por ID en segundo plano.
     
-    Useful for testing or manual triggers.
+    Useful for testing or manual triggers. Returns 202 with a run_id;
+    poll ``GET /runs/{run_id}`` for progress and the final result.
     """
     logger.info(f"Manual job run requested: {request.job_id}")
     
-    job_config = load_job_config(request.job_id)
+    if request.mode not in ("run", "plan", "apply"):
+        raise HTTPException(status_code=400, detail=f"Invalid mode '{request.mode}' (run, plan or apply)")
+    if request.mode == "apply" and not request.plan_id:
+        raise HTTPException(status_code=400, detail="mode 'apply' requires plan_id")
+    
+    job_config = await run_in_threadpool(load_job_config, request.job_id)
     if not job_config:
         raise HTTPException(status_code=404, detail=f"Job '{request.job_id}' not found or inactive")
     
-    credentials = get_credentials()
-    result = process_job(job_config, request.folder_id, credentials)
+    credentials = await run_in_threadpool(get_credentials)
+    run_state = await run_in_threadpool(run_registry.create, new_run_id(), request.job_id)
+    job_executor.submit(
+        execute_run, run_state, process_job, job_config, request.folder_id, credentials,
+        run_state=run_state, run_mode=request.mode, plan_id=request.plan_id
+    )
     
-    return result
+    response = {
+        "status": "accepted",
+        "run_id": run_state.run_id,
+        "job_id": request.job_id,
+        "status_url": f"/runs/{run_state.run_id}"
+    }
+    if request.mode != "run":
+        # A new plan is stored under the run ID
+        response["plan_id"] = request.plan_id or run_state.run_id
+        response["plan_url"] = f"/plans/{response['plan_id']}"
+    return response
+
+
+@app.get("/plans/{plan_id}")
+async def get_plan(plan_id: str):
+    """
+    Stored rename plan: proposed renames (old name, new name, analysis) and apply status.
+    Plan de renombrado guardado: cambios propuestos y estado de aplicación.
+    """
+    plan = await run_in_threadpool(plan_store.load, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"Plan '{plan_id}' not found")
+    return plan.to_dict()
+
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """
+    Live status of a run: progress counters and per-stage timings.
+    Estado en vivo de un run: contadores de progreso y tiempos por etapa.
+
+    Runs started on another instance are read from the run store (progress
+    as of their last finished folder).
+    """
+    snapshot = await run_in_threadpool(run_registry.snapshot, run_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Run '{run_id}' not found")
+    return snapshot
 
 
 if __name__ == "__main__":
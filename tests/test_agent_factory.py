@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+pytest.importorskip("agno")
+
+from core_renombrador.agent_factory import AgentFactory
+
+JOB = {"id": "job", "agent_config": {"instructions": "x"}}
+
+
+@pytest.fixture
+def factory():
+    factory = AgentFactory(max_cached_agents=4)
+    factory.built = []
+
+    def build(job_config, db, tools, output_schema):
+        agent = type("Agent", (), {"name": job_config.get("name")})()
+        factory.built.append(agent)
+        return agent
+
+    factory._build_agent = build
+    return factory
+
+
+def test_sequential_leases_reuse_the_pooled_agent(factory):
+    with factory.lease_agent(JOB) as first:
+        pass
+    with factory.lease_agent(JOB) as second:
+        pass
+
+    assert first is second
+    assert len(factory.built) == 1
+
+
+def test_concurrent_leases_never_share_an_agent(factory):
+    leased = []
+    inside = threading.Barrier(3)
+
+    def worker():
+        with factory.lease_agent(JOB) as agent:
+            leased.append(agent)
+            inside.wait(timeout=5)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(agent) for agent in leased}) == 3
+    # Released agents are reused by later leases from any thread
+    with factory.lease_agent(JOB) as agent:
+        assert agent in leased
+    assert len(factory.built) == 3
+
+
+def test_changed_config_drops_the_pooled_agents(factory):
+    with factory.lease_agent(JOB) as first:
+        pass
+    with factory.lease_agent(dict(JOB, agent_config={"instructions": "y"})) as second:
+        pass
+
+    assert first is not second
+    assert len(factory._agents) == 1
+
+
+def test_agent_leased_during_invalidate_is_not_pooled(factory):
+    with factory.lease_agent(JOB):
+        factory.invalidate("job")
+
+    assert not factory._agents
+
+
+def test_pool_keeps_at_most_max_cached_agents(factory):
+    for n in range(6):
+        with factory.lease_agent({"id": f"job-{n}", "agent_config": {"instructions": str(n)}}):
+            pass
+
+    assert sum(len(agents) for agents in factory._agents.values()) == 4
+
+
+def test_create_agent_from_job_config_builds_a_new_agent(factory):
+    assert factory.create_agent_from_job_config(JOB) is not factory.create_agent_from_job_config(JOB)
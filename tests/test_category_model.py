@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.category_model import CategoryModel
+
+SAMPLES = [
+    ("Factura A CAE punto de venta total IVA proveedor", "Factura"),
+    ("Factura B CAE total consumidor final punto de venta", "Factura"),
+    ("Factura C monotributo CAE total punto de venta", "Factura"),
+    ("Resumen de cuenta saldo CBU caja de ahorro movimientos", "Resumen"),
+    ("Extracto bancario saldo cuenta corriente movimientos CBU", "Resumen"),
+    ("Resumen de cuenta saldo movimientos cuenta corriente", "Resumen"),
+]
+
+
+@pytest.fixture(scope="module")
+def model():
+    return CategoryModel.train(SAMPLES, epochs=30)
+
+
+def test_predicts_the_category_with_confidence(model):
+    category, confidence, terms = model.predict("Factura A punto de venta CAE total")
+
+    assert category == "Factura"
+    assert confidence > 0.5
+    assert terms
+
+
+def test_unknown_vocabulary_has_no_prediction(model):
+    assert model.predict("zzz qqq") == (None, 0.0, [])
+
+
+def test_training_requires_samples():
+    with pytest.raises(ValueError):
+        CategoryModel.train([("", "Factura")])
+
+
+def test_saved_model_predicts_the_same(model, tmp_path):
+    path = tmp_path / "category_model.json"
+    model.save(path)
+
+    text = "Resumen de cuenta saldo CBU"
+    assert CategoryModel.load(path).predict(text) == model.predict(text)
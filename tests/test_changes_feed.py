@@ -0,0 +1,83 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.drive_lister import changes_checkpoint, find_target_folders, iter_change_pages
+
+
+class Request:
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+
+    def execute(self):
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class FakeDrive:
+    """Minimal Drive v3 stub: ``files().list`` and ``changes().list`` from canned pages."""
+
+    def __init__(self, file_pages=None, change_pages=None, error=None):
+        self.file_pages = list(file_pages or [])
+        self.change_pages = list(change_pages or [])
+        self.error = error
+
+    def files(self):
+        return self
+
+    def changes(self):
+        return self
+
+    def list(self, **kwargs):
+        if self.error is not None:
+            return Request(error=self.error)
+        if "q" in kwargs:
+            return Request(self.file_pages.pop(0))
+        return Request(self.change_pages.pop(0))
+
+
+def test_checkpoint_advances_token_and_keeps_failed_files_for_replay():
+    checkpoint = changes_checkpoint("token-2", True, ["b", "a", "b"])
+
+    assert checkpoint == {"changes_page_token": "token-2", "changes_retry_file_ids": ["a", "b"]}
+
+
+def test_checkpoint_without_errors_has_nothing_to_replay():
+    assert changes_checkpoint("token-2", True, []) == {"changes_page_token": "token-2", "changes_retry_file_ids": []}
+
+
+@pytest.mark.parametrize("token, listing_complete", [(None, True), ("token-2", False)])
+def test_incomplete_feed_or_listing_resets_the_token(token, listing_complete):
+    assert changes_checkpoint(token, listing_complete, ["a"]) == {
+        "changes_page_token": None,
+        "changes_retry_file_ids": [],
+    }
+
+
+def test_folder_lookup_errors_are_raised_not_reported_as_no_folders():
+    drive = FakeDrive(error=RuntimeError("403 forbidden"))
+
+    with pytest.raises(RuntimeError):
+        find_target_folders(drive, "root", ["Facturas"])
+
+
+def test_folder_lookup_returns_matching_subfolders():
+    drive = FakeDrive(file_pages=[{"files": [{"id": "1", "name": "Facturas"}, {"id": "2", "name": "Otros"}]}])
+
+    assert find_target_folders(drive, "root", ["Facturas"]) == ["1"]
+
+
+def test_new_start_token_only_comes_with_the_last_page():
+    drive = FakeDrive(change_pages=[
+        {"changes": [{"fileId": "a"}], "nextPageToken": "p2"},
+        {"changes": [{"fileId": "b"}], "newStartPageToken": "token-2"},
+    ])
+
+    pages = list(iter_change_pages(drive, "token-1"))
+
+    assert [token for _, token in pages] == [None, "token-2"]
@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+from core_renombrador.content_budget import GAP_MARKER, ContentBudgeter, estimate_tokens, normalize_content
+
+
+def test_normalize_drops_padding_noise_and_repeated_lines():
+    text = "  Factura   A  \n\nFactura A\n----|----\nTotal: $ 1.000,00\n"
+
+    assert normalize_content(text) == "Factura A\nTotal: $ 1.000,00"
+
+
+def test_normalize_keeps_literal_backslash_n_in_content():
+    assert normalize_content("C:\\nuevo\\factura.pdf") == "C:\\nuevo\\factura.pdf"
+
+
+def test_short_content_is_only_normalized():
+    text, report = ContentBudgeter(max_tokens=100).fit("Factura B\n\nFactura B\nCUIT 30-12345678-9")
+
+    assert text == "Factura B\nCUIT 30-12345678-9"
+    assert report["tokens"] == estimate_tokens(text)
+    assert report["tokens_saved"] == report["original_tokens"] - report["tokens"]
+
+
+def test_long_content_fits_the_budget_and_keeps_the_head():
+    filler = "\n".join(f"linea de relleno numero {n} sin datos utiles" for n in range(400))
+    content = "FACTURA A Proveedor SA\n" + filler + "\nTotal $ 12.345,67 vence 10/03/2026"
+
+    text, report = ContentBudgeter(max_tokens=200).fit(content)
+
+    assert report["tokens"] <= 200
+    assert text.startswith("FACTURA A Proveedor SA")
+    assert GAP_MARKER.strip() in text
+    assert "12.345,67" in text
@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+for module in ("pypdf", "docx", "openpyxl", "pdf2image", "PIL", "google.cloud.vision", "googleapiclient"):
+    pytest.importorskip(module)
+
+from core_renombrador import content_extractor
+from core_renombrador.content_extractor import ContentExtractor
+from core_renombrador.drive_download import NamedSpooledTemporaryFile
+
+
+class RecordingPool(ThreadPoolExecutor):
+    """Thread pool that records the in-flight count and arguments of each submit."""
+
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.calls = []
+        self.in_flight = []
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self._lock:
+            self._active += 1
+            self.in_flight.append(self._active)
+            self.calls.append(args)
+
+        def run():
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        return super().submit(run)
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    seen_paths = []
+
+    def fake_extract(pdf_path, start, stop):
+        seen_paths.append(pdf_path)
+        assert os.path.exists(pdf_path)
+        return ["x" * 100 for _ in range(start, stop)]
+
+    monkeypatch.setattr(content_extractor, "extract_pdf_pages", fake_extract)
+    return seen_paths
+
+
+def extractor(pool):
+    return ContentExtractor(enable_ocr=False, page_pool=pool, page_workers=4, pages_per_task=2)
+
+
+def test_workers_get_a_temp_path_that_is_removed_afterwards(pages):
+    with RecordingPool() as pool:
+        text = extractor(pool)._extract_pages_parallel(b"%PDF-1.4 fake", 8, None)
+
+    assert len(text) == 8
+    assert len(set(pages)) == 1
+    assert not os.path.exists(pages[0])
+    assert all(isinstance(args[0], str) for args in pool.calls)
+
+
+def test_small_budget_keeps_a_single_range_in_flight(pages):
+    with RecordingPool() as pool:
+        text = extractor(pool)._extract_pages_parallel(b"%PDF-1.4 fake", 40, 350)
+
+    assert len(text) == 4
+    assert len(pool.calls) <= 3
+    assert pool.in_flight[0] == 1
+
+
+class FakeImage:
+    def save(self, stream, format):
+        stream.write(b"png")
+
+
+def spilled_pdf():
+    buffer = NamedSpooledTemporaryFile(max_size=16)
+    buffer.write(b"%PDF-1.4 " + b"x" * 100)
+    assert buffer._rolled
+    return buffer
+
+
+def test_ocr_rasterizes_a_spilled_pdf_from_its_path(monkeypatch):
+    rendered = []
+    monkeypatch.setattr(content_extractor, "convert_from_path",
+                        lambda path, **kwargs: rendered.append((path, kwargs["first_page"])) or [FakeImage()])
+    monkeypatch.setattr(content_extractor, "convert_from_bytes",
+                        lambda *args, **kwargs: pytest.fail("spilled PDF was copied into memory"))
+    monkeypatch.setattr(content_extractor, "_as_bytes",
+                        lambda source: pytest.fail("spilled PDF was read into bytes"))
+    extractor = ContentExtractor(enable_ocr=False, ocr_max_pages=2)
+    extractor.vision_client = object()
+    monkeypatch.setattr(extractor, "_ocr_image_bytes", lambda image: "texto de la pagina")
+
+    with spilled_pdf() as buffer:
+        text = extractor._ocr_pdf(buffer, None, 5)
+
+        assert rendered == [(buffer.path, 1), (buffer.path, 2)]
+    assert text == "texto de la pagina\ntexto de la pagina"
+
+
+def test_spilled_pdf_is_read_in_place_without_a_copy(pages, monkeypatch):
+    buffer = spilled_pdf()
+    monkeypatch.setattr(content_extractor.tempfile, "NamedTemporaryFile",
+                        lambda *args, **kwargs: pytest.fail("spilled PDF was copied to a new temp file"))
+
+    with buffer, RecordingPool() as pool:
+        text = extractor(pool)._extract_pages_parallel(buffer, 8, None)
+
+        assert len(text) == 8
+        assert set(pages) == {buffer.path}
+        # The spill file belongs to the buffer: it is not removed by the extractor
+        assert os.path.exists(buffer.path)
@@ -0,0 +1,95 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from googleapiclient.errors import HttpError
+
+from core_renombrador.drive_batch import DriveBatcher
+
+
+class Response(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = "error"
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batches.append([request_id for request_id, _ in self.requests])
+        for request_id, request in self.requests:
+            outcome = self.service.outcome(request)
+            if isinstance(outcome, Exception):
+                self.callback(request_id, None, outcome)
+            else:
+                self.callback(request_id, outcome, None)
+
+
+class FakeDrive:
+    """Drive stub whose update/get requests are resolved when their batch executes."""
+
+    def __init__(self, failures=None):
+        self.batches = []
+        self.failures = dict(failures or {})   # file_id -> list of statuses to fail with, in order
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def files(self):
+        return self
+
+    def update(self, fileId, body, fields, supportsAllDrives):
+        return ("update", fileId, body["name"])
+
+    def get(self, fileId, fields, supportsAllDrives):
+        return ("get", fileId, None)
+
+    def outcome(self, request):
+        _, file_id, name = request
+        statuses = self.failures.get(file_id)
+        if statuses:
+            return HttpError(Response(statuses.pop(0)), b"{}")
+        return {"id": file_id, "name": name or f"name-{file_id}"}
+
+
+def test_renames_are_split_into_batches_of_at_most_100():
+    drive = FakeDrive()
+    renames = [{"file_id": f"f{n}", "new_name": f"n{n}.pdf", "current_name": f"o{n}.pdf"} for n in range(250)]
+
+    results, errors, skipped = DriveBatcher(drive).rename(renames)
+
+    assert [len(batch) for batch in drive.batches] == [100, 100, 50]
+    assert len(results) == 250 and not errors and not skipped
+    assert results["f7"]["name"] == "n7.pdf"
+
+
+def test_noop_renames_are_skipped_without_requests():
+    drive = FakeDrive()
+
+    results, errors, skipped = DriveBatcher(drive).rename([{"file_id": "a", "new_name": "x", "current_name": "x"}])
+
+    assert skipped == ["a"] and not results and not errors
+    assert drive.batches == []
+
+
+def test_retryable_errors_are_retried_and_others_reported():
+    drive = FakeDrive(failures={"a": [503], "b": [404]})
+
+    results, errors = DriveBatcher(drive, base_delay=0).get_metadata(["a", "b", "c"])
+
+    assert set(results) == {"a", "c"}
+    assert set(errors) == {"b"}
+    assert drive.batches == [["a", "b", "c"], ["a"]]
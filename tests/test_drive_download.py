@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from core_renombrador.drive_download import NamedSpooledTemporaryFile
+
+
+def test_small_content_stays_in_memory():
+    with NamedSpooledTemporaryFile(max_size=1024) as buffer:
+        buffer.write(b"%PDF-1.4 small")
+
+        assert not buffer._rolled
+        assert buffer.path is None
+
+
+def test_rollover_spills_into_a_named_file_that_is_removed_on_close():
+    buffer = NamedSpooledTemporaryFile(max_size=16)
+    buffer.write(b"a" * 10)
+    buffer.write(b"b" * 90)
+
+    assert buffer._rolled
+    path = buffer.path
+    assert isinstance(path, str)
+    with open(path, "rb") as spill:
+        assert spill.read() == b"a" * 10 + b"b" * 90
+
+    buffer.seek(5)
+    assert buffer.read(10) == b"aaaaabbbbb"
+
+    buffer.close()
+    assert not os.path.exists(path)
+
+
+def test_explicit_rollover_keeps_the_position():
+    with NamedSpooledTemporaryFile(max_size=1024) as buffer:
+        buffer.write(b"0123456789")
+        buffer.seek(4)
+        buffer.rollover()
+
+        assert buffer.tell() == 4
+        assert buffer.read() == b"456789"
+        assert os.path.exists(buffer.path)
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.filename_template import FolderNameIndex, compile_template
+
+ANALYSIS = {"date": "2026-03-15", "keywords": ["Factura A", "Proveedor SA", "0003-00001234"], "category": "Factura"}
+
+
+def test_template_renders_keywords_and_extension():
+    name = compile_template("{date}_{type}_{issuer}{ext}").render("scan.PDF", ANALYSIS)
+
+    assert name == "2026-03-15_Factura A_Proveedor SA.PDF"
+
+
+def test_listed_name_is_not_taken_by_a_rename():
+    index = FolderNameIndex()
+    index.add("folder", "new-file-123456", "scan.pdf")
+    index.add("folder", "old-file-abcdef", "2026-03-15_factura.pdf")
+
+    name = index.claim("folder", "new-file-123456", "2026-03-15_Factura.pdf", "scan.pdf")
+
+    assert name == "2026-03-15_Factura_123456.pdf"
+
+
+def test_claim_result_does_not_depend_on_claim_order():
+    listing = [("a-111111", "1.pdf"), ("b-222222", "2.pdf"), ("c-333333", "factura.pdf")]
+
+    def claims(order):
+        index = FolderNameIndex()
+        for file_id, name in listing:
+            index.add("folder", file_id, name)
+        return {file_id: index.claim("folder", file_id, "factura.pdf", current) for file_id, current in order}
+
+    forward = claims(listing[:2])
+    backward = claims(listing[1::-1])
+
+    assert forward == backward == {"a-111111": "factura_111111.pdf", "b-222222": "factura_222222.pdf"}
+
+
+def test_rerun_keeps_the_name_a_file_already_holds():
+    index = FolderNameIndex()
+    index.add("folder", "c-333333", "factura.pdf")
+
+    assert index.claim("folder", "c-333333", "factura.pdf", "factura.pdf") == "factura.pdf"
+
+
+def test_freed_name_can_be_claimed_by_another_file():
+    index = FolderNameIndex()
+    index.add("folder", "a-111111", "factura.pdf")
+    index.add("folder", "b-222222", "scan.pdf")
+
+    assert index.claim("folder", "a-111111", "otra.pdf", "factura.pdf") == "otra.pdf"
+    assert index.claim("folder", "b-222222", "factura.pdf", "scan.pdf") == "factura.pdf"
+
+
+def test_loader_indexes_siblings_outside_the_work_pages():
+    # Incremental/shard runs only see changed files; the loader lists the whole folder
+    calls = []
+
+    def loader(folder_id):
+        calls.append(folder_id)
+        return [("sibling-999999", "factura.pdf"), ("changed-123456", "scan.pdf")]
+
+    index = FolderNameIndex(loader=loader)
+
+    assert index.claim("folder", "changed-123456", "factura.pdf", "scan.pdf") == "factura_123456.pdf"
+    assert index.claim("folder", "other-654321", "nuevo.pdf", "x.pdf") == "nuevo.pdf"
+    assert calls == ["folder"]
+
+
+def test_concurrent_first_claims_load_a_folder_once():
+    calls = []
+    release = threading.Event()
+
+    def loader(folder_id):
+        calls.append(folder_id)
+        release.wait(timeout=5)
+        return [("holder-000000", "factura.pdf")]
+
+    index = FolderNameIndex(loader=loader)
+    names = {}
+    threads = [
+        threading.Thread(target=lambda n=n: names.update({n: index.claim("folder", f"f{n}-11111{n}", "factura.pdf")}))
+        for n in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["folder"]
+    assert "factura.pdf" not in names.values()
+
+
+def test_loader_errors_prevent_the_claim():
+    def loader(folder_id):
+        raise RuntimeError("403 rate limit")
+
+    index = FolderNameIndex(loader=loader)
+
+    with pytest.raises(RuntimeError):
+        index.claim("folder", "f1", "factura.pdf")
@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.database_manager import DatabaseManager
+from core_renombrador.file_manager import FileManager
+from core_renombrador.job_sharding import ShardTracker, aggregate_shard_results
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    file_manager = FileManager(tmp_path)
+    return ShardTracker(
+        DatabaseManager(file_manager=file_manager, db_path=tmp_path / "job_shards.json"),
+        DatabaseManager(file_manager=file_manager, db_path=tmp_path / "job_runs.json")
+    )
+
+
+def shard_result(renamed=1, errors=0, status="success"):
+    return {"status": status, "stats": {"files_processed": 2, "files_renamed": renamed, "errors": errors,
+                                        "rule_hits": 1, "cache_misses": 1, "stages": {}}}
+
+
+def test_aggregate_sums_stats_and_flags_failed_shards():
+    summary = aggregate_shard_results([
+        dict(shard_result(), shard_index=0),
+        dict(shard_result(renamed=0, errors=2, status="error"), shard_index=1),
+    ])
+
+    assert summary["status"] == "partial"
+    assert summary["shards_failed"] == [1]
+    assert summary["stats"]["files_renamed"] == 1
+    assert summary["stats"]["errors"] == 2
+    assert summary["stats"]["rule_hit_rate"] == 0.5
+
+
+def test_run_aggregates_once_every_shard_reported(tracker):
+    tracker.record_shard("run-1", "job", 0, 2, shard_result())
+    assert tracker.try_aggregate("run-1", "job", 2) is None
+
+    tracker.record_shard("run-1", "job", 1, 2, shard_result())
+    summary = tracker.try_aggregate("run-1", "job", 2)
+
+    assert summary["status"] == "success"
+    assert summary["stats"]["files_renamed"] == 2
+    assert len(tracker.runs_db.find("id", "run-1")) == 1
+
+
+def test_partly_dispatched_run_aggregates_as_partial(tracker):
+    tracker.record_shard("run-2", "job", 0, 3, shard_result())
+    assert tracker.try_aggregate("run-2", "job", 3) is None
+
+    # Task creation failed after 2 of 3 shards
+    assert tracker.record_dispatch_failure("run-2", "job", 3, 2, "quota exceeded") is None
+    tracker.record_shard("run-2", "job", 1, 3, shard_result())
+    summary = tracker.try_aggregate("run-2", "job", 3)
+
+    assert summary["status"] == "partial"
+    assert summary["shards_dispatched"] == 2
+    assert summary["stats"]["files_renamed"] == 2
+    runs = tracker.runs_db.find("id", "run-2")
+    assert len(runs) == 1 and runs[0]["status"] == "partial"
+
+
+def test_dispatch_failure_after_every_enqueued_shard_finished_aggregates_immediately(tracker):
+    tracker.record_shard("run-3", "job", 0, 4, shard_result())
+
+    summary = tracker.record_dispatch_failure("run-3", "job", 4, 1, "boom")
+
+    assert summary is not None and summary["status"] == "partial"
@@ -0,0 +1,69 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+from core_renombrador.llm_cache import LLMResponseCache
+
+
+class Blob:
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def exists(self):
+        return self.name in self.store
+
+    def download_as_text(self):
+        return self.store[self.name]
+
+    def upload_from_string(self, data, content_type=None):
+        self.store[self.name] = data
+
+
+class Bucket:
+    def __init__(self):
+        self.blobs = {}
+
+    def blob(self, name):
+        return Blob(self.blobs, name)
+
+
+class StorageClient:
+    def __init__(self):
+        self.shared = Bucket()
+
+    def bucket(self, name):
+        return self.shared
+
+
+def test_disk_tier_round_trip(tmp_path):
+    cache = LLMResponseCache(cache_dir=tmp_path)
+
+    assert cache.get("k1") is None
+    assert cache.put("k1", {"document_type": "Factura"})
+    assert cache.get("k1") == {"document_type": "Factura"}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_zero_disk_budget_keeps_only_the_gcs_tier(tmp_path):
+    client = StorageClient()
+    cache = LLMResponseCache(cache_dir=tmp_path / "llm", max_disk_bytes=0, gcs_bucket_name="b",
+                             storage_client=client)
+
+    cache.put("k1", {"document_type": "Factura"})
+
+    assert cache.get("k1") == {"document_type": "Factura"}
+    assert cache.stats()["gcs_hits"] == 1
+    assert not (tmp_path / "llm").exists()
+    assert list(client.shared.blobs) == ["cache/llm/k1.json"]
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = LLMResponseCache(cache_dir=tmp_path, max_disk_bytes=300)
+    for n in range(10):
+        cache.put(f"k{n}", {"detail": "x" * 40})
+
+    assert cache.stats()["evictions"] > 0
+    assert cache.stats()["disk_bytes"] <= 300
+    assert cache.get("k9") is not None
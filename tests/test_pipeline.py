@@ -0,0 +1,109 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.pipeline import PipelineStage, StagedPipeline, merge_stage_stats
+
+
+def test_items_flow_through_every_stage():
+    results = []
+    pipeline = StagedPipeline(
+        [
+            PipelineStage("double", lambda item: item * 2, workers=3),
+            PipelineStage("collect", lambda item: results.append(item) or item, workers=1),
+        ],
+        source_name="list"
+    )
+    stats = pipeline.run(range(20))
+
+    assert sorted(results) == [n * 2 for n in range(20)]
+    assert stats["stages"]["list"]["succeeded"] == 20
+    assert stats["stages"]["double"]["succeeded"] == 20
+    assert stats["stages"]["collect"]["processed"] == 20
+    assert not stats["running"]
+
+
+def test_none_skips_and_exceptions_fail_single_items():
+    errors = []
+
+    def handler(item):
+        if item == 3:
+            raise RuntimeError("boom")
+        return None if item % 2 else item
+
+    pipeline = StagedPipeline(
+        [PipelineStage("work", handler, workers=2)],
+        on_error=lambda stage, item, error: errors.append((stage, item, str(error)))
+    )
+    stats = pipeline.run(range(6))
+
+    assert stats["stages"]["work"]["failed"] == 1
+    assert stats["stages"]["work"]["skipped"] == 2
+    assert stats["stages"]["work"]["succeeded"] == 3
+    assert errors == [("work", 3, "boom")]
+    assert pipeline.failed == 1
+
+
+def test_source_error_stops_listing_and_is_counted():
+    def source():
+        yield 1
+        raise RuntimeError("listing failed")
+
+    pipeline = StagedPipeline([PipelineStage("work", lambda item: item)], source_name="list", on_error=lambda *a: None)
+    stats = pipeline.run(source())
+
+    assert stats["stages"]["list"]["succeeded"] == 1
+    assert stats["stages"]["list"]["failed"] == 1
+    assert pipeline.failed == 1
+
+
+def test_batch_stage_respects_size_and_budget():
+    batches = []
+
+    def batch_handler(items):
+        batches.append(list(items))
+        return [item if item != 7 else ValueError("bad item") for item in items]
+
+    pipeline = StagedPipeline(
+        [PipelineStage("batch", batch_handler, batch_size=4, batch_budget=10, batch_weight=lambda item: item,
+                       batch_wait=0.2)],
+        on_error=lambda *a: None
+    )
+    stats = pipeline.run([1, 2, 3, 4, 5, 6, 7, 20])
+
+    assert sorted(item for batch in batches for item in batch) == [1, 2, 3, 4, 5, 6, 7, 20]
+    for batch in batches:
+        assert len(batch) <= 4
+        assert len(batch) == 1 or sum(batch) <= 10
+    assert stats["stages"]["batch"]["failed"] == 1
+    assert stats["stages"]["batch"]["succeeded"] == 7
+
+
+def test_batch_handler_with_wrong_result_count_fails_the_batch():
+    pipeline = StagedPipeline(
+        [PipelineStage("batch", lambda items: items[:-1], batch_size=5, batch_wait=0.2)],
+        on_error=lambda *a: None
+    )
+    stats = pipeline.run([1, 2, 3])
+
+    assert stats["stages"]["batch"]["failed"] == 3
+    assert stats["stages"]["batch"]["succeeded"] == 0
+
+
+def test_pipeline_requires_stages():
+    with pytest.raises(ValueError):
+        StagedPipeline([])
+
+
+def test_merge_stage_stats_sums_counters_and_keeps_max_workers():
+    target = {"download": {"workers": 4, "processed": 2, "busy_seconds": 1.5}}
+    merge_stage_stats(target, {
+        "download": {"workers": 8, "processed": 3, "busy_seconds": 0.25},
+        "rename": {"workers": 2, "processed": 1},
+    })
+
+    assert target["download"] == {"workers": 8, "processed": 5, "busy_seconds": 1.75}
+    assert target["rename"] == {"workers": 2, "processed": 1}
@@ -0,0 +1,199 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.analysis_cache import agent_config_hash
+from core_renombrador.database_manager import DatabaseManager
+from core_renombrador.file_manager import FileManager
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return DatabaseManager(file_manager=FileManager(tmp_path), db_path=tmp_path / "processed_files.json")
+
+
+def entry(file_id="f1", job_id="job-a", config_hash="h1", modified_time="2026-01-01T00:00:00Z", md5="abc"):
+    return {"file_id": file_id, "modified_time": modified_time, "md5": md5, "job_id": job_id,
+            "config_hash": config_hash, "new_name": "x.pdf"}
+
+
+def key(file_id="f1", job_id="job-a", config_hash="h1", modified_time="2026-01-01T00:00:00Z", md5="abc"):
+    return DatabaseManager.ledger_key(file_id, modified_time, md5, job_id, config_hash)
+
+
+def test_ledger_key_is_scoped_by_job_and_config():
+    assert key() != key(job_id="job-b")
+    assert key() != key(config_hash="h2")
+    assert key() != key(md5="other")
+    assert key() == key()
+
+
+def test_other_job_or_changed_config_is_not_processed(ledger):
+    ledger.record_processed([entry()])
+
+    assert ledger.get_processed_keys([key()]) == {key()}
+    assert ledger.get_processed_keys([key(job_id="job-b")]) == set()
+    assert ledger.get_processed_keys([key(config_hash="h2")]) == set()
+
+
+def test_filename_format_changes_the_ledger_scope():
+    base = {"instructions": "x", "filename_format": "{date}_{keywords}{ext}"}
+    changed = dict(base, filename_format="{issuer}_{date}{ext}")
+    exclude = ("llm_cache",)
+
+    assert agent_config_hash(base, exclude=exclude) != agent_config_hash(changed, exclude=exclude)
+    assert agent_config_hash(base, exclude=exclude) == agent_config_hash(
+        dict(base, llm_cache={"bypass": True}), exclude=exclude
+    )
+
+
+def test_recording_the_same_entry_twice_keeps_one_record(ledger):
+    ledger.record_processed([entry()])
+    ledger.record_processed([entry(), dict(entry(), new_name="y.pdf")])
+
+    records = ledger.find_all()
+    assert len(records) == 1
+    assert records[0]["new_name"] == "y.pdf"
+
+
+def test_supabase_upsert_uses_the_ledger_key():
+    calls = {}
+
+    class Table:
+        def upsert(self, records, on_conflict=None):
+            calls["records"] = records
+            calls["on_conflict"] = on_conflict
+            return self
+
+        def execute(self):
+            return None
+
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.use_supabase = True
+    manager.table_name = "processed_files"
+    manager.supabase_client = type("Client", (), {"table": lambda self, name: Table()})()
+
+    manager.record_processed([entry(), entry()])
+
+    assert calls["on_conflict"] == "ledger_key"
+    assert len(calls["records"]) == 1
+
+
+def test_find_in_raises_on_supabase_errors():
+    class Table:
+        def select(self, *args):
+            return self
+
+        def in_(self, *args):
+            return self
+
+        def execute(self):
+            raise RuntimeError("supabase down")
+
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.use_supabase = True
+    manager.table_name = "processed_files"
+    manager.supabase_client = type("Client", (), {"table": lambda self, name: Table()})()
+
+    with pytest.raises(RuntimeError):
+        manager.get_processed_keys([key()])
+
+
+class PreconditionFailed(Exception):
+    code = 412
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.generation = bucket.generations.get(name)
+
+    def download_as_text(self, if_generation_match=None):
+        self.bucket.downloads += 1
+        if self.bucket.read_error is not None:
+            raise self.bucket.read_error
+        assert if_generation_match == self.bucket.generations[self.name]
+        return self.bucket.contents[self.name]
+
+    def upload_from_string(self, content, content_type=None, if_generation_match=None):
+        if self.bucket.before_upload is not None:
+            hook, self.bucket.before_upload = self.bucket.before_upload, None
+            hook()
+        if if_generation_match != self.bucket.generations.get(self.name, 0):
+            raise PreconditionFailed("generation mismatch")
+        self.bucket.contents[self.name] = content
+        self.bucket.generations[self.name] = self.bucket.generations.get(self.name, 0) + 1
+        self.generation = self.bucket.generations[self.name]
+
+
+class FakeBucket:
+    """In-memory GCS bucket honoring generation preconditions."""
+
+    def __init__(self):
+        self.contents = {}
+        self.generations = {}
+        self.downloads = 0
+        self.read_error = None
+        self.before_upload = None
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.contents else None
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+def gcs_ledger(bucket):
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.use_supabase = False
+    manager.use_gcs = True
+    manager.table_name = "processed_files"
+    manager.bucket = bucket
+    manager.bucket_name = "bucket"
+    manager.blob_name = "data/processed_files.json"
+    manager._gcs_cache = None
+    manager._gcs_lock = threading.Lock()
+    return manager
+
+
+def test_failed_gcs_read_never_overwrites_the_ledger():
+    bucket = FakeBucket()
+    ledger = gcs_ledger(bucket)
+    ledger.record_processed([entry(file_id="f1"), entry(file_id="f2")])
+    stored = bucket.contents["data/processed_files.json"]
+
+    bucket.read_error = RuntimeError("503 backend error")
+    other = gcs_ledger(bucket)
+    with pytest.raises(RuntimeError):
+        other.record_processed([entry(file_id="f3")])
+    with pytest.raises(RuntimeError):
+        other.get_processed_keys([key(file_id="f1")])
+
+    assert bucket.contents["data/processed_files.json"] == stored
+
+
+def test_concurrent_gcs_writers_keep_each_others_records():
+    bucket = FakeBucket()
+    first, second = gcs_ledger(bucket), gcs_ledger(bucket)
+    first.record_processed([entry(file_id="f1")])
+
+    # Another instance writes between this instance's read and its upload
+    bucket.before_upload = lambda: second.record_processed([entry(file_id="f2")])
+    first.record_processed([entry(file_id="f3")])
+
+    assert {record["file_id"] for record in first.find_all()} == {"f1", "f2", "f3"}
+
+
+def test_unchanged_gcs_blob_is_not_downloaded_again():
+    bucket = FakeBucket()
+    ledger = gcs_ledger(bucket)
+    ledger.record_processed([entry()])
+
+    for _ in range(3):
+        assert ledger.get_processed_keys([key()]) == {key()}
+    assert bucket.downloads == 0
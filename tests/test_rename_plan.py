@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.rename_plan import RenamePlan, RenamePlanStore
+
+
+def listed(file_id, name="scan.pdf"):
+    return {"id": file_id, "name": name, "md5Checksum": f"md5-{file_id}", "modifiedTime": "2026-01-01T00:00:00.000Z"}
+
+
+@pytest.fixture
+def plan():
+    plan = RenamePlan("plan-1", "job")
+    for file_id in ("a", "b", "c"):
+        plan.add(listed(file_id), "folder", f"{file_id}.pdf", {"category": "Factura"})
+    plan.add(listed("d", name="d.pdf"), "folder", "d.pdf", {"category": "Factura"})
+    return plan
+
+
+def test_noop_renames_are_only_counted(plan):
+    assert [entry["file_id"] for entry in plan.pending_entries()] == ["a", "b", "c"]
+    assert plan.unchanged == 1
+
+
+def test_partial_plan_only_retries_failed_files(plan):
+    plan.record_apply(1, failed_file_ids=["b"], stale_file_ids=["c"])
+
+    assert plan.status == "partial"
+    assert [entry["file_id"] for entry in plan.pending_entries()] == ["b"]
+
+    plan.record_apply(1, failed_file_ids=[], stale_file_ids=[])
+
+    assert plan.status == "applied"
+    assert plan.applied["files_renamed"] == 2
+    assert plan.applied["stale_file_ids"] == ["c"]
+
+
+def test_applied_plan_is_refused(plan):
+    plan.record_apply(3, failed_file_ids=[], stale_file_ids=[])
+
+    with pytest.raises(ValueError):
+        plan.pending_entries()
+
+
+@pytest.mark.parametrize("change", [
+    {"name": "renamed-by-someone.pdf"},
+    {"md5Checksum": "other"},
+    {"modifiedTime": "2026-02-01T00:00:00.000Z"},
+    {"trashed": True},
+])
+def test_changed_files_are_stale(plan, change):
+    entry = plan.entries[0]
+
+    assert RenamePlan.is_current(entry, listed("a"))
+    assert not RenamePlan.is_current(entry, dict(listed("a"), **change))
+    assert not RenamePlan.is_current(entry, None)
+
+
+def test_store_round_trip(plan, tmp_path):
+    store = RenamePlanStore(directory=tmp_path)
+    plan.record_apply(1, failed_file_ids=["b"], stale_file_ids=[])
+    store.save(plan)
+
+    loaded = store.load("plan-1")
+
+    assert loaded.status == "partial"
+    assert loaded.to_dict() == plan.to_dict()
+    assert store.load("missing") is None
@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.rule_classifier import RuleClassifier, parse_date
+
+INVOICE = """{header}
+Razón Social: Proveedor SA
+Punto de Venta: 0003 Comp. Nro: 00001234
+Fecha de Emisión: 15/03/2026
+CUIT: 30-12345678-9
+Total: $ 1.000,00
+CAE N°: 12345678901234
+"""
+
+
+@pytest.fixture
+def classifier():
+    return RuleClassifier.from_config({"enabled": True})
+
+
+@pytest.mark.parametrize("header, rule", [
+    ("FACTURA\nA\nCOD. 01", "factura_a"),
+    ("FACTURA B", "factura_b"),
+    ("Factura C", "factura_c"),
+])
+def test_invoice_letter_selects_the_rule(classifier, header, rule):
+    match = classifier.classify(INVOICE.format(header=header))
+
+    assert match["rule"] == rule
+    assert match["analysis"]["date"] == "2026-03-15"
+    assert match["analysis"]["keywords"][1] == "Proveedor SA"
+
+
+def test_lowercase_article_is_not_an_invoice_letter(classifier):
+    text = INVOICE.format(header="Emitir la factura a nombre de Proveedor SA\nFACTURA B")
+
+    assert classifier.classify(text)["rule"] == "factura_b"
+
+
+def test_text_without_invoice_letter_falls_through(classifier):
+    assert classifier.classify("Por favor enviar la factura a nombre de la empresa.\nTotal 100") is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("vence el 31/02/2024", None),
+    ("30/02/2024 o 01/03/2024", "2024-03-01"),
+    ("29/02/2024", "2024-02-29"),
+    ("2026-01-05", "2026-01-05"),
+    ("periodo 03/2025", "2025-03-01"),
+    ("13/13/2024", None),
+])
+def test_parse_date_only_returns_real_dates(text, expected):
+    assert parse_date(text) == expected
@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath("packages/core-renombrador/src"))
+
+import pytest
+
+from core_renombrador.database_manager import DatabaseManager
+from core_renombrador.file_manager import FileManager
+from core_renombrador.run_registry import RunRegistry
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DatabaseManager(file_manager=FileManager(tmp_path), db_path=tmp_path / "worker_runs.json")
+
+
+def test_progress_accumulates_finished_folders():
+    registry = RunRegistry()
+    state = registry.create("run-1", "job")
+    state.start()
+    state.complete_folder({"files_processed": 3, "files_renamed": 2, "stages": {"rename": {"processed": 2}}})
+    state.complete_folder({"files_processed": 1, "files_renamed": 1, "stages": {"rename": {"processed": 1}}})
+
+    snapshot = registry.snapshot("run-1")
+    assert snapshot["status"] == "running"
+    assert snapshot["progress"]["files_processed"] == 4
+    assert snapshot["progress"]["stages"]["rename"]["processed"] == 3
+
+
+def test_runs_are_visible_from_another_instance(store):
+    first = RunRegistry(store=store)
+    state = first.create("run-2", "job")
+    state.start()
+    state.complete_folder({"files_processed": 5, "files_renamed": 4, "stages": {}})
+    state.finish({"status": "success", "stats": {"files_renamed": 4}})
+
+    other = RunRegistry(store=store)
+    snapshot = other.snapshot("run-2")
+
+    assert other.get("run-2") is None
+    assert snapshot["status"] == "success"
+    assert snapshot["progress"]["files_renamed"] == 4
+    assert snapshot["result"]["stats"]["files_renamed"] == 4
+    assert len(store.find_all()) == 1
+
+
+def test_unknown_run_returns_none(store):
+    assert RunRegistry(store=store).snapshot("missing") is None
+    assert RunRegistry().snapshot("missing") is None
+
+
+def test_store_errors_do_not_fail_the_run():
+    class BrokenStore:
+        def upsert_many(self, records, key):
+            raise RuntimeError("store down")
+
+    state = RunRegistry(store=BrokenStore()).create("run-3", "job")
+    state.start()
+    state.finish(error="boom")
+
+    assert state.status == "error"